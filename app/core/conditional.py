@@ -0,0 +1,81 @@
+"""
+条件付き GET（ETag / Last-Modified → 304）と Cache-Control の付与。
+
+django.views.decorators.http.condition は検証値の関数を同期で呼ぶため、
+async ビューの中で ORM を使えない。ここでは検証値の関数を async でも書けるようにし、
+レスポンス本体を組み立てる前に 304 を返せるようにする。
+
+    @conditional(_validators, cache_control={"private": True, "max_age": 0, "must_revalidate": True})
+    async def summary(request): ...
+
+検証値の関数は (etag, last_modified) を返す。どちらも None なら検証なしで通す。
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts, weak=True):
+    """parts から ETag を作る（JSON の表現は同値でもバイト列が変わりうるので既定は弱い ETag）"""
+    digest = hashlib.md5(":".join(str(p) for p in parts).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def _timestamp(dt):
+    if dt is None:
+        return None
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return int(dt.timestamp())
+
+
+def not_modified(request, etag=None, last_modified=None):
+    """条件に合えば 304（または 412）のレスポンス、合わなければ None"""
+    if request.method not in ("GET", "HEAD"):
+        return None
+    return get_conditional_response(
+        request,
+        etag=quote_etag(etag) if etag else None,
+        last_modified=_timestamp(last_modified),
+    )
+
+
+def apply(response, etag=None, last_modified=None, cache_control=None):
+    """検証値と Cache-Control をレスポンスに付ける（200 / 304 のときだけ）"""
+    if response.status_code not in (200, 304):
+        return response
+    if etag:
+        response.headers.setdefault("ETag", quote_etag(etag))
+    if last_modified is not None and not response.has_header("Last-Modified"):
+        response.headers["Last-Modified"] = http_date(_timestamp(last_modified))
+    if cache_control:
+        patch_cache_control(response, **cache_control)
+    return response
+
+
+def conditional(validators, *, cache_control=None):
+    """validators(request, *args, **kwargs) -> (etag, last_modified)。sync / async どちらでもよい"""
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                if iscoroutinefunction(validators):
+                    etag, last_modified = await validators(request, *args, **kwargs)
+                else:
+                    etag, last_modified = validators(request, *args, **kwargs)
+                response = not_modified(request, etag, last_modified) or await view(request, *args, **kwargs)
+                return apply(response, etag, last_modified, cache_control)
+        else:
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                etag, last_modified = validators(request, *args, **kwargs)
+                response = not_modified(request, etag, last_modified) or view(request, *args, **kwargs)
+                return apply(response, etag, last_modified, cache_control)
+        return inner
+
+    return decorator
@@ -0,0 +1,82 @@
+"""
+Prometheus 形式のメトリクス（/metrics、health.views.metrics で出力）。
+
+gunicorn は複数ワーカープロセスで動くので、prometheus_client のマルチプロセスモードを使う。
+PROMETHEUS_MULTIPROC_DIR（gunicorn.conf.py が用意する）が設定されていれば、各ワーカーは値を
+そのディレクトリの mmap ファイルに書き、/metrics はどのワーカーが受けても全ワーカー分を合算して返す。
+未設定（runserver など）ならプロセス内の値だけを返す。
+
+記録はカウンタの加算だけなので、リクエストあたりのオーバーヘッドは数マイクロ秒。
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+# 秒。クイズのプレイ・ダッシュボードの SLO（数十〜数百 ms）付近を細かめに
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+REQUESTS = Counter(
+    "iterms_http_requests_total", "HTTP requests", ["view", "method", "status"],
+)
+LATENCY = Histogram(
+    "iterms_http_request_duration_seconds", "HTTP request latency", ["view", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    "iterms_db_queries_per_request", "DB queries per request", ["view"],
+    buckets=QUERY_BUCKETS,
+)
+DB_TIME = Counter(
+    "iterms_db_query_seconds_total", "Time spent in DB queries", ["view"],
+)
+CACHE = Counter(
+    "iterms_cache_requests_total", "Cache lookups", ["cache", "result"],
+)
+# ワーカーの埋まり具合: inflight / capacity（どちらも生きているワーカーの合計）
+INFLIGHT = Gauge(
+    "iterms_inflight_requests", "Requests being processed", multiprocess_mode="livesum",
+)
+CAPACITY = Gauge(
+    "iterms_worker_capacity", "Concurrent requests the live workers can handle", multiprocess_mode="livesum",
+)
+
+
+def multiprocess_enabled():
+    return bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def set_capacity(n):
+    """ワーカー起動時に呼ぶ（gunicorn.conf.py の post_worker_init）"""
+    CAPACITY.set(n)
+
+
+def cache_result(cache, hit):
+    CACHE.labels(cache, "hit" if hit else "miss").inc()
+
+
+def observe(view, method, status, seconds, queries, db_seconds):
+    REQUESTS.labels(view, method, str(status)).inc()
+    LATENCY.labels(view, method).observe(seconds)
+    DB_QUERIES.labels(view).observe(queries)
+    if db_seconds:
+        DB_TIME.labels(view).inc(db_seconds)
+
+
+def render():
+    """(本文, Content-Type)"""
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,13 +1,159 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
 from django.http import HttpResponsePermanentRedirect
 
 class SSLRedirectExemptMiddleware:
+    # ASGI でもスレッド切り替えなしで通せるよう sync/async 両対応にしている
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
-    def __call__(self, request):
+    def _redirect(self, request):
         if getattr(settings, "SECURE_SSL_REDIRECT", False):
             if not request.path.startswith("/health"):
                 if not request.is_secure():
                     return HttpResponsePermanentRedirect("https://" + request.get_host() + request.get_full_path())
-        return self.get_response(request)
\ No newline at end of file
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._redirect(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self._redirect(request) or await self.get_response(request)
+
+
+class QueryProfilingMiddleware:
+    """
+    リクエストごとのクエリ数・DB 時間・処理時間を計測する（QUERY_PROFILING=True のときだけ有効）。
+    遅いリクエストと N+1 の疑いはログに出し、ルートごとの集計は core.profiling に貯める。
+    レスポンスには X-Query-Count と Server-Timing を付ける。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        from django.core.exceptions import MiddlewareNotUsed
+        from . import profiling
+
+        if not getattr(settings, "QUERY_PROFILING", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.profiling = profiling
+        self.slow_ms = getattr(settings, "QUERY_PROFILING_SLOW_MS", 500)
+        self.repeat_threshold = getattr(settings, "QUERY_PROFILING_REPEAT_THRESHOLD", 10)
+        profiling.install()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _route(self, request):
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return "<unresolved>"
+        return f"{request.method} /{match.route}"
+
+    def _finish(self, request, response, profile, token):
+        self.profiling.stop(token)
+        self.profiling.record(
+            self._route(request), profile,
+            slow_ms=self.slow_ms, repeat_threshold=self.repeat_threshold,
+        )
+        response.headers["X-Query-Count"] = str(profile.queries)
+        response.headers["Server-Timing"] = (
+            f"db;dur={profile.db_time * 1000:.1f}, app;dur={profile.wall_time * 1000:.1f}"
+        )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile, token = self.profiling.start()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            self.profiling.stop(token)
+            raise
+        return self._finish(request, response, profile, token)
+
+    async def __acall__(self, request):
+        profile, token = self.profiling.start()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            self.profiling.stop(token)
+            raise
+        return self._finish(request, response, profile, token)
+
+
+class MetricsMiddleware:
+    """
+    ビューごとのリクエスト数・レイテンシ・クエリ数を core.metrics に記録する（METRICS_ENABLED）。
+    QueryProfilingMiddleware が外側にあればその計測を使い、無ければ自分で数える。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        from django.core.exceptions import MiddlewareNotUsed
+        from . import metrics, profiling
+
+        if not getattr(settings, "METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.metrics = metrics
+        self.profiling = profiling
+        profiling.install()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _start(self):
+        self.metrics.INFLIGHT.inc()
+        profile = self.profiling.current()
+        if profile is not None:
+            return profile, None, profile.queries, profile.db_time
+        profile, token = self.profiling.start(track_shapes=False)
+        return profile, token, 0, 0.0
+
+    def _finish(self, request, status, state):
+        profile, token, queries0, db0 = state
+        if token is not None:
+            self.profiling.stop(token)
+        self.metrics.INFLIGHT.dec()
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            view = "<unresolved>"
+        elif match.route == "metrics":
+            return
+        else:
+            view = match.view_name or match.route
+        self.metrics.observe(
+            view, request.method, status, profile.wall_time,
+            profile.queries - queries0, profile.db_time - db0,
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self._start()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            self._finish(request, 500, state)
+            raise
+        self._finish(request, response.status_code, state)
+        return response
+
+    async def __acall__(self, request):
+        state = self._start()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            self._finish(request, 500, state)
+            raise
+        self._finish(request, response.status_code, state)
+        return response
@@ -0,0 +1,171 @@
+"""
+リクエスト単位のクエリ計測（QueryProfilingMiddleware / MetricsMiddleware から使う）。
+
+- 全 DB 接続に execute_wrapper を付け、実行中のリクエスト（ContextVar）にクエリ数・DB 時間を積む。
+  ContextVar は sync_to_async にも引き継がれるので、async ビューの ORM 呼び出しも数えられる
+- 同じ形の SQL（パラメータ違い）が閾値回以上出たら N+1 の疑いとして記録する
+- ルート（URL パターン）ごとの集計をプロセス内に持ち、/admin/query-stats/ で返す
+  （ワーカープロセスごとの値。全体を見るときは各ワーカーの値を足す）
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger("core.profiling")
+
+_current = ContextVar("query_profile", default=None)
+
+# 値・IN リストを潰して「SQL の形」にする
+_IN_LIST = re.compile(r"\bIN \((?:%s|\?)(?:, ?(?:%s|\?))*\)", re.IGNORECASE)
+_NUMBER = re.compile(r"\b\d+\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+
+def sql_shape(sql):
+    sql = _STRING.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _NUMBER.sub("?", sql)
+
+
+class RequestProfile:
+    __slots__ = ("started", "queries", "db_time", "shapes")
+
+    def __init__(self, track_shapes=True):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        # 件数と時間だけでよいとき（メトリクス）は SQL の正規化を省く
+        self.shapes = Counter() if track_shapes else None
+
+    @property
+    def wall_time(self):
+        return time.perf_counter() - self.started
+
+    def repeated(self, threshold):
+        """threshold 回以上出た SQL の形（N+1 の疑い）"""
+        if self.shapes is None:
+            return []
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+def _wrapper(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.db_time += time.perf_counter() - started
+        profile.queries += 1
+        if profile.shapes is not None:
+            profile.shapes[sql_shape(sql)] += 1
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    if _wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_wrapper)
+
+
+def install():
+    """以降に作られる DB 接続に計測フックを付ける（既に開いている接続にも付ける）"""
+    from django.db import connections
+
+    connection_created.connect(_on_connection_created, dispatch_uid="core-profiling")
+    for conn in connections.all(initialized_only=True):
+        _on_connection_created(None, conn)
+
+
+def current():
+    """計測中のリクエストの RequestProfile（無ければ None）"""
+    return _current.get()
+
+
+def start(track_shapes=True):
+    profile = RequestProfile(track_shapes)
+    return profile, _current.set(profile)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+# ---- ルートごとの集計 ----
+class RouteStats:
+    __slots__ = ("requests", "wall_time", "db_time", "queries", "max_queries", "slow", "n_plus_one", "last_repeated")
+
+    def __init__(self):
+        self.requests = 0
+        self.wall_time = 0.0
+        self.db_time = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.slow = 0
+        self.n_plus_one = 0
+        self.last_repeated = None
+
+    def as_dict(self):
+        n = self.requests or 1
+        return {
+            "requests": self.requests,
+            "avg_ms": round(self.wall_time / n * 1000, 2),
+            "avg_db_ms": round(self.db_time / n * 1000, 2),
+            "avg_queries": round(self.queries / n, 2),
+            "max_queries": self.max_queries,
+            "slow": self.slow,
+            "n_plus_one": self.n_plus_one,
+            "last_repeated": self.last_repeated,
+        }
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def record(route, profile, *, slow_ms, repeat_threshold):
+    """1リクエスト分を集計に足し、遅い・N+1 の疑いがあればログに出す"""
+    wall = profile.wall_time
+    repeated = profile.repeated(repeat_threshold)
+    is_slow = wall * 1000 >= slow_ms
+    with _stats_lock:
+        stats = _stats.get(route)
+        if stats is None:
+            stats = _stats[route] = RouteStats()
+        stats.requests += 1
+        stats.wall_time += wall
+        stats.db_time += profile.db_time
+        stats.queries += profile.queries
+        stats.max_queries = max(stats.max_queries, profile.queries)
+        if is_slow:
+            stats.slow += 1
+        if repeated:
+            stats.n_plus_one += 1
+            stats.last_repeated = {"sql": repeated[0][0][:500], "count": repeated[0][1]}
+
+    if is_slow:
+        logger.warning(
+            "slow request %s: %.1fms, %d queries, db %.1fms",
+            route, wall * 1000, profile.queries, profile.db_time * 1000,
+        )
+    if repeated:
+        shape, n = repeated[0]
+        logger.warning("possible N+1 in %s: same query x%d: %s", route, n, shape[:300])
+
+
+def snapshot(sort="db_time"):
+    """ルートごとの集計（sort: db_time|wall_time|queries|requests の合計で降順）"""
+    with _stats_lock:
+        items = [(route, s, s.as_dict()) for route, s in _stats.items()]
+    items.sort(key=lambda x: getattr(x[1], sort, 0), reverse=True)
+    return {"pid": os.getpid(), "routes": {route: data for route, _, data in items}}
+
+
+def reset():
+    with _stats_lock:
+        _stats.clear()
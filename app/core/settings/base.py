@@ -18,6 +18,7 @@ INSTALLED_APPS = [
     'quizzes',
     'dashboard',
     'sharing',
+    'health',
 ]
 
 MIDDLEWARE = [
@@ -31,6 +32,18 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# リクエストごとのクエリ計測（core.middleware.QueryProfilingMiddleware）。既定は無効
+# 先頭に置いてセッション・認証のクエリも含めて数える
+QUERY_PROFILING = os.getenv("QUERY_PROFILING", "False").lower() in ("true", "1", "yes")
+QUERY_PROFILING_SLOW_MS = int(os.getenv("QUERY_PROFILING_SLOW_MS", "500"))
+QUERY_PROFILING_REPEAT_THRESHOLD = int(os.getenv("QUERY_PROFILING_REPEAT_THRESHOLD", "10"))
+if QUERY_PROFILING:
+    MIDDLEWARE.insert(0, "core.middleware.QueryProfilingMiddleware")
+
+# /metrics（Prometheus 形式）用の計測（core.middleware.MetricsMiddleware）
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() in ("true", "1", "yes")
+MIDDLEWARE.insert(1 if QUERY_PROFILING else 0, "core.middleware.MetricsMiddleware")
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -77,4 +90,56 @@ USE_TZ = True
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-AUTH_USER_MODEL = 'accounts.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'accounts.User'
+
+# キャッシュ（CACHE_BACKEND=locmem|file|redis）
+# redis は Redis 互換サーバ（ElastiCache / Valkey など）なら可。CACHE_LOCATION に redis://host:6379/0
+_CACHE_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", "iterms"),
+    "file": ("django.core.cache.backends.filebased.FileBasedCache", "/tmp/iterms-cache"),
+    "redis": ("django.core.cache.backends.redis.RedisCache", "redis://localhost:6379/0"),
+}
+_cache_backend, _cache_location = _CACHE_BACKENDS[os.getenv("CACHE_BACKEND", "locmem")]
+
+CACHES = {
+    "default": {
+        "BACKEND": _cache_backend,
+        "LOCATION": os.getenv("CACHE_LOCATION", _cache_location),
+        "TIMEOUT": int(os.getenv("CACHE_TIMEOUT", "300")),
+        "KEY_PREFIX": "iterms",
+    }
+}
+
+# 共有リンクの解決結果キャッシュ（sharing/cache.py）
+SHARE_CACHE_ALIAS = "default"
+SHARE_CACHE_TIMEOUT = int(os.getenv("SHARE_CACHE_TIMEOUT", "300"))
+SHARE_CACHE_MISSING_TIMEOUT = int(os.getenv("SHARE_CACHE_MISSING_TIMEOUT", "30"))
+
+# タグクラウド（terms/tags.py）のキャッシュ。タグの付け外しでも消える
+TAG_CLOUD_CACHE_ALIAS = "default"
+TAG_CLOUD_CACHE_TIMEOUT = int(os.getenv("TAG_CLOUD_CACHE_TIMEOUT", "300"))
+TAG_CLOUD_MAX_SIZE = 200
+
+# 共有リンクのアクセス記録をまとめて書き込む間隔（秒、0 で毎回即時）
+SHARE_ACCESS_FLUSH_INTERVAL = int(os.getenv("SHARE_ACCESS_FLUSH_INTERVAL", "10"))
+
+# 用語の全文検索（auto: MySQL なら FULLTEXT、それ以外はプロセス内の転置インデックス）
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+# プロセス内の転置インデックスを使ってよいか。ワーカー間で更新が共有されないので開発・テスト用（dev.py で有効）
+SEARCH_PYTHON_INDEX = False
+
+# セッション（SESSION_BACKEND=db|cached_db|cache|signed_cookies）
+# cached_db は読み込みをキャッシュから、signed_cookies はセッションテーブルを使わない
+_SESSION_ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+SESSION_ENGINE = _SESSION_ENGINES[os.getenv("SESSION_BACKEND", "db")]
+
+# クイズ回答結果の受け渡し（署名付きトークンの有効期限、秒）
+QUIZ_RESULT_MAX_AGE = int(os.getenv("QUIZ_RESULT_MAX_AGE", "300"))
+
+# readiness（/health/ready/）の DB 確認の間隔（秒）。この間はプロセス内の前回結果を返す
+HEALTH_DB_CHECK_INTERVAL = int(os.getenv("HEALTH_DB_CHECK_INTERVAL", "5"))
@@ -9,6 +9,9 @@ SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key")
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1']
 
+# SQLite などで動かすときの全文検索（terms/search.py のプロセス内インデックス）を許可する
+SEARCH_PYTHON_INDEX = True
+
 STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [
@@ -23,5 +26,8 @@ DATABASES = {
         'PASSWORD': os.getenv("DB_PASSWORD"),
         'HOST': os.getenv("DB_HOST"),
         'PORT': os.getenv("DB_PORT", "3306"),
+        # 接続の使い回し（秒、0 でリクエストごとに接続）。使い回す前に死活確認する
+        'CONN_MAX_AGE': int(os.getenv("DB_CONN_MAX_AGE", "0")),
+        'CONN_HEALTH_CHECKS': os.getenv("DB_CONN_HEALTH_CHECKS", "True").lower() in ("true", "1", "yes"),
     }
 }
\ No newline at end of file
@@ -33,6 +33,11 @@ USE_X_FORWARDED_HOST = True
 
 # RDS/MySQLなど本番DB設定
 
+# ASGI（uvicorn ワーカー）では同期の ORM 処理がリクエストごとに別スレッドで動くため、
+# 永続接続は使い回されずにスレッドごとに残り、max_connections を食いつぶす（Django #33497）。
+# 永続接続は同期ワーカー（APP_SERVER=wsgi）だけにする
+ASGI_SERVER = os.getenv("APP_SERVER", "wsgi").lower() == "asgi"
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.mysql',
@@ -41,6 +46,9 @@ DATABASES = {
         'PASSWORD': os.getenv("DB_PASSWORD"),
         'HOST': os.getenv("DB_HOST"),
         'PORT': os.getenv("DB_PORT", "3306"),
+        # 接続の使い回し（秒、0 でリクエストごとに接続）。使い回す前に死活確認する。ASGI では常に 0
+        'CONN_MAX_AGE': 0 if ASGI_SERVER else int(os.getenv("DB_CONN_MAX_AGE", "60")),
+        'CONN_HEALTH_CHECKS': os.getenv("DB_CONN_HEALTH_CHECKS", "True").lower() in ("true", "1", "yes"),
     }
 }
 
@@ -1,13 +1,18 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from health.views import metrics
+from . import views
+
 urlpatterns = [
+    path('admin/query-stats/', views.query_stats, name='query_stats'),  # 管理者のみ。QUERY_PROFILING=True のとき
     path('admin/', admin.site.urls),
     path('dashboard/', include('dashboard.urls')),
     path('terms/', include('terms.urls')),
     path('vocabularies/', include('vocabularies.urls')),
     path('quizzes/', include('quizzes.urls')),
     path("health/", include("health.urls")),
+    path("metrics", metrics, name="metrics"),
     path('quizzes/api/dashboard/', include('dashboard.urls')), 
     path('sharing/', include('sharing.urls', namespace='sharing')),
     path('accounts/', include('accounts.urls', namespace='accounts')),
@@ -0,0 +1,21 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from . import profiling
+
+
+@staff_member_required
+@require_GET
+def query_stats(request):
+    """
+    QueryProfilingMiddleware のルート別集計（このワーカープロセスの分）。
+    ?sort=db_time|wall_time|queries|requests&reset=1
+    """
+    sort = request.GET.get("sort", "db_time")
+    if sort not in ("db_time", "wall_time", "queries", "requests"):
+        sort = "db_time"
+    data = profiling.snapshot(sort=sort)
+    if request.GET.get("reset") == "1":
+        profiling.reset()
+    return JsonResponse(data)
@@ -1,3 +1,18 @@
 from django.contrib import admin
+from .models import DailyStat, VocabularyDailyStat
 
-# Register your models here.
+
+@admin.register(DailyStat)
+class DailyStatAdmin(admin.ModelAdmin):
+    list_display = ('user', 'day', 'answers', 'corrects')
+    list_filter = ('day',)
+    raw_id_fields = ('user',)
+    ordering = ('-day',)
+
+
+@admin.register(VocabularyDailyStat)
+class VocabularyDailyStatAdmin(admin.ModelAdmin):
+    list_display = ('user', 'vocabulary', 'day', 'answers', 'corrects')
+    list_filter = ('day',)
+    raw_id_fields = ('user', 'vocabulary')
+    ordering = ('-day',)
@@ -0,0 +1,31 @@
+"""
+DailyStat・VocabularyDailyStat を QuizHistory から作り直す（初回バックフィル・不整合・用語集の入れ替えの反映用）。
+
+    python manage.py rebuild_daily_stats
+    python manage.py rebuild_daily_stats --user 42
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import rollup
+
+
+class Command(BaseCommand):
+    help = "QuizHistory から日別・用語集別の集計テーブル（DailyStat / VocabularyDailyStat）を再構築する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="対象ユーザーID（省略時は全ユーザー）")
+        parser.add_argument("--batch", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        user = None
+        if opts["user"] is not None:
+            user = get_user_model().objects.filter(pk=opts["user"]).first()
+            if user is None:
+                raise CommandError(f"user {opts['user']} not found")
+        started = time.perf_counter()
+        created = rollup.rebuild(user=user, batch_size=opts["batch"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"rebuilt {created} rows in {elapsed:.1f}s"))
@@ -0,0 +1,299 @@
+"""
+本番規模のダミーデータを一括生成する（ローカルでの性能確認・負荷テスト用）。
+
+    python manage.py seed_scale                                  # 既定の規模（数十万行）
+    python manage.py seed_scale --users 1000 --terms 20000 --histories 2000000 --days 180
+    python manage.py seed_scale --sessions 64 --manifest /tmp/seed.json
+        # → python infra/loadtest/journey.py --manifest /tmp/seed.json
+
+ユーザー・タグ（階層つき）・用語・用語集・用語集エントリ・お気に入り・クイズ・回答履歴・共有リンクを
+全て bulk_create で作る。シグナルを通らないので、非正規化カウンタ・タグの閉包・日別集計・
+復習スケジュールは最後にまとめて作り直す（日別集計と復習スケジュールは全ユーザー分）。
+
+--manifest には負荷テストで使うログイン済みセッション・用語 ID・共有トークンを JSON で書き出す。
+DEBUG=False の環境では --force が無いと実行しない。
+"""
+import json
+import random
+import time
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from dashboard import rollup
+from quizzes import review
+from quizzes.models import Quiz, QuizChoice, QuizHistory
+from sharing.models import ShareLink
+from terms import hierarchy
+from terms import tags as term_tags
+from terms.models import Tag, Term
+from vocabularies import ordering, popularity
+from vocabularies.models import Term as VocabTerm, UserFavoriteVocabulary, Vocabulary, VocabularyTerm
+
+WORDS = (
+    "network protocol packet router switch firewall cache index query transaction lock replica shard "
+    "thread process kernel memory heap stack pointer compiler linker runtime container cluster queue "
+    "stream buffer socket session token cipher hash signature certificate latency throughput bandwidth"
+).split()
+
+
+class Command(BaseCommand):
+    help = "負荷テスト用のダミーデータを指定の規模で一括生成する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--tags", type=int, default=300)
+        parser.add_argument("--tag-depth", type=int, default=3, help="タグ階層の深さ")
+        parser.add_argument("--terms", type=int, default=5000)
+        parser.add_argument("--vocabularies", type=int, default=3, help="1ユーザーあたりの用語集数")
+        parser.add_argument("--entries", type=int, default=50, help="1用語集あたりのエントリ数")
+        parser.add_argument("--public-ratio", type=float, default=0.3, help="公開する用語集の割合")
+        parser.add_argument("--favorites", type=int, default=10, help="1ユーザーあたりのお気に入り数")
+        parser.add_argument("--histories", type=int, default=200000, help="回答履歴の総数")
+        parser.add_argument("--days", type=int, default=90, help="回答履歴を散らす日数")
+        parser.add_argument("--shares", type=int, default=1000, help="共有リンク数")
+        parser.add_argument("--sessions", type=int, default=0, help="ログイン済みセッションを作るユーザー数")
+        parser.add_argument("--manifest", help="負荷テスト用の JSON の出力先")
+        parser.add_argument("--prefix", default="seed", help="ユーザー名・タグ名などの接頭辞")
+        parser.add_argument("--password", default="seed-pass", help="生成ユーザーのパスワード")
+        parser.add_argument("--seed", type=int, default=None, help="乱数シード（同じ値なら同じデータ）")
+        parser.add_argument("--batch", type=int, default=5000, help="bulk_create 1回あたりの行数")
+        parser.add_argument("--force", action="store_true", help="DEBUG=False でも実行する")
+
+    def handle(self, *args, **opts):
+        if not settings.DEBUG and not opts["force"]:
+            raise CommandError("DEBUG=False の環境です。本当に実行するなら --force を付けてください")
+        self.User = get_user_model()
+        self.prefix = opts["prefix"]
+        if self.User.objects.filter(username__startswith=f"{self.prefix}-").exists():
+            raise CommandError(f"prefix '{self.prefix}' のデータは既にあります。--prefix を変えてください")
+        self.rng = random.Random(opts["seed"])
+        self.batch = opts["batch"]
+        self.now = timezone.now()
+
+        started = time.perf_counter()
+        users = self._step("users", self._users, opts["users"], opts["password"])
+        tags = self._step("tags", self._tags, opts["tags"], opts["tag_depth"])
+        terms = self._step("terms", self._terms, opts["terms"], tags)
+        vocabularies = self._step("vocabularies", self._vocabularies, users, opts["vocabularies"], opts["public_ratio"])
+        self._step("entries", self._entries, vocabularies, terms, opts["entries"])
+        public = [v for v in vocabularies if v[2]]
+        self._step("favorites", self._favorites, users, public, opts["favorites"], opts["days"])
+        quizzes = self._step("quizzes", self._quizzes, terms)
+        self._step("histories", self._histories, users, quizzes, opts["histories"], opts["days"])
+        tokens = self._step("shares", self._shares, public, opts["shares"])
+        self._step("rollups", self._rollups)
+
+        if opts["manifest"]:
+            manifest = {
+                "session_cookie_name": settings.SESSION_COOKIE_NAME,
+                "csrf_cookie_name": settings.CSRF_COOKIE_NAME,
+                "sessions": self._sessions(users[:opts["sessions"]]),
+                "term_ids": self._sample(sorted({term_id for term_id, _, _ in quizzes.values()}), 1000),
+                "share_tokens": tokens[:1000],
+            }
+            with open(opts["manifest"], "w") as f:
+                json.dump(manifest, f)
+            self.stdout.write(f"manifest: {opts['manifest']} ({len(manifest['sessions'])} sessions)")
+        self.stdout.write(self.style.SUCCESS(f"done in {time.perf_counter() - started:.1f}s"))
+
+    def _sample(self, values, k):
+        return self.rng.sample(values, min(k, len(values)))
+
+    def _step(self, name, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        rows = len(result) if isinstance(result, (list, dict)) else result
+        self.stdout.write(f"{name:<13} {rows if rows is not None else '-':>9}  {time.perf_counter() - started:6.1f}s")
+        return result
+
+    def _create(self, model, objs):
+        model.objects.bulk_create(objs, batch_size=self.batch)
+
+    def _spread(self, model, field, ids, days):
+        """ids を時間帯ごとにまとめて field を過去 days 日に散らす（auto_now_add の上書き用、1時間に1 UPDATE）"""
+        ids = sorted(ids)
+        buckets = max(1, min(len(ids), days * 24))
+        size = -(-len(ids) // buckets)
+        for i in range(buckets):
+            chunk = ids[i * size:(i + 1) * size]
+            if not chunk:
+                break
+            at = self.now - timedelta(hours=buckets - i, seconds=self.rng.randrange(3600))
+            model.objects.filter(pk__gte=chunk[0], pk__lte=chunk[-1]).update(**{field: at})
+
+    # ---- 生成 ----
+    def _users(self, n, password):
+        hashed = make_password(password)  # ハッシュは重いので1回だけ
+        self._create(self.User, [
+            self.User(username=f"{self.prefix}-user-{i:06d}", email=f"{self.prefix}-{i}@example.com", password=hashed)
+            for i in range(n)
+        ])
+        return list(self.User.objects.filter(username__startswith=f"{self.prefix}-user-").order_by("pk"))
+
+    def _tags(self, n, depth):
+        # 深さごとに作る（親の pk が要るので）。ルートは全体の 1/10
+        levels, made = [], 0
+        per_level = [max(1, n // 10)] + [0] * max(0, depth - 1)
+        for d in range(1, len(per_level)):
+            per_level[d] = (n - per_level[0]) // (len(per_level) - 1)
+        for d, count in enumerate(per_level):
+            parents = next((level for level in reversed(levels) if level), [None])
+            names = [f"{self.prefix}-tag-{made + i}" for i in range(count)]
+            made += count
+            self._create(Tag, [Tag(name=name, parent_id=self.rng.choice(parents)) for name in names])
+            levels.append(list(Tag.objects.filter(name__in=names).values_list("pk", flat=True)))
+        hierarchy.rebuild()
+        return [pk for level in levels for pk in level]
+
+    def _terms(self, n, tags):
+        names = [f"{self.rng.choice(WORDS)} {self.rng.choice(WORDS)} {self.prefix}{i}" for i in range(n)]
+        self._create(Term, [
+            Term(term=name, definition=" ".join(self.rng.choices(WORDS, k=self.rng.randint(8, 24))))
+            for name in names
+        ])
+        terms = self._new_rows(Term, "term", names)
+        through = Term.tags.through
+        links = {(pk, tag) for pk, _ in terms for tag in self._sample(tags, self.rng.randint(1, 3))}
+        through.objects.bulk_create(
+            [through(term_id=t, tag_id=g) for t, g in links], ignore_conflicts=True, batch_size=self.batch,
+        )
+        term_tags.recount(tags)
+        return terms
+
+    def _new_rows(self, model, field, values):
+        """大量の values で作った行の (pk, field) を、IN 句を分けて引く"""
+        rows = []
+        for i in range(0, len(values), 1000):
+            rows += model.objects.filter(**{f"{field}__in": values[i:i + 1000]}).values_list("pk", field)
+        return rows
+
+    def _vocabularies(self, users, per_user, public_ratio):
+        objs = [
+            Vocabulary(user=u, title=f"{self.rng.choice(WORDS).title()} 用語集 {u.pk}-{i}",
+                       is_public=self.rng.random() < public_ratio)
+            for u in users for i in range(per_user)
+        ]
+        self._create(Vocabulary, objs)
+        return list(
+            Vocabulary.objects.filter(user__in=users).order_by("pk").values_list("pk", "user_id", "is_public")
+        )
+
+    def _entries(self, vocabularies, terms, per_vocabulary):
+        by_user = {}
+        for v in vocabularies:
+            by_user.setdefault(v[1], []).append(v)
+        user_ids = list(by_user)
+        total = 0
+        # ユーザー単位で区切る（同じユーザーの用語を別のチャンクで作り直さないように）
+        for i in range(0, len(user_ids), 100):
+            chunk = [v for user_id in user_ids[i:i + 100] for v in by_user[user_id]]
+            picks = {v: self._sample(terms, per_vocabulary) for v in chunk}
+            # vocabularies.Term はユーザーごとに作り、出題用の terms.Term へ quiz_term で紐付ける
+            wanted = {(v[1], pk): name for v, picked in picks.items() for pk, name in picked}
+            self._create(VocabTerm, [
+                VocabTerm(user_id=user_id, term_name=name, quiz_term_id=pk)
+                for (user_id, pk), name in wanted.items()
+            ])
+            term_ids = {
+                (user_id, quiz_term_id): pk for pk, user_id, quiz_term_id in
+                VocabTerm.objects.filter(user_id__in={u for u, _ in wanted})
+                .values_list("pk", "user_id", "quiz_term_id")
+            }
+            entries = [
+                VocabularyTerm(user_id=v[1], vocabulary_id=v[0], term_id=term_ids[(v[1], pk)],
+                               order_index=(n + 1) * ordering.STEP)
+                for v, picked in picks.items() for n, (pk, _) in enumerate(picked)
+            ]
+            self._create(VocabularyTerm, entries)
+            total += len(entries)
+        return total
+
+    def _favorites(self, users, public, per_user, days):
+        if not public:
+            return 0
+        favorites = [
+            UserFavoriteVocabulary(user=u, vocabulary_id=v[0])
+            for u in users for v in self._sample(public, per_user)
+        ]
+        UserFavoriteVocabulary.objects.bulk_create(favorites, ignore_conflicts=True, batch_size=self.batch)
+        ids = list(UserFavoriteVocabulary.objects.filter(user__in=users).values_list("pk", flat=True))
+        # トレンドスコアに差が出るように追加日時を散らす
+        self._spread(UserFavoriteVocabulary, "added_at", ids, days)
+        popularity.recount(Vocabulary.objects.filter(user__in=users))
+        popularity.refresh_trending()
+        return len(ids)
+
+    def _quizzes(self, terms):
+        """{quiz_id: (term_id, 正解の choice_id, [不正解の choice_id, ...])}（全出題形式）"""
+        ids = [pk for pk, _ in terms]
+        quizzes = {}
+        for i in range(0, len(ids), 1000):
+            Quiz.make_from_terms(ids[i:i + 1000])
+            rows = QuizChoice.objects.filter(quiz__term_id__in=ids[i:i + 1000]).values_list(
+                "quiz_id", "quiz__term_id", "pk", "is_correct",
+            )
+            for quiz_id, term_id, pk, is_correct in rows:
+                quiz = quizzes.setdefault(quiz_id, [term_id, None, []])
+                if is_correct:
+                    quiz[1] = pk
+                else:
+                    quiz[2].append(pk)
+        return quizzes
+
+    def _histories(self, users, quizzes, n, days):
+        if not quizzes or not users:
+            return 0
+        items = list(quizzes.items())
+        first = QuizHistory.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+        made = 0
+        while made < n:
+            batch = []
+            for _ in range(min(self.batch, n - made)):
+                quiz_id, (_, correct_id, wrong_ids) = self.rng.choice(items)
+                # 7割くらい正解
+                is_correct = self.rng.random() < 0.7 or not wrong_ids
+                batch.append(QuizHistory(
+                    user=self.rng.choice(users), quiz_id=quiz_id, is_correct=is_correct,
+                    selected_choice_id=correct_id if is_correct else self.rng.choice(wrong_ids),
+                ))
+            QuizHistory.objects.bulk_create(batch)
+            made += len(batch)
+        ids = list(QuizHistory.objects.filter(pk__gt=first).values_list("pk", flat=True))
+        self._spread(QuizHistory, "answered_at", ids, days)
+        return made
+
+    def _shares(self, public, n):
+        if not public:
+            return []
+        content_type = ContentType.objects.get_for_model(Vocabulary)
+        links = [
+            ShareLink(content_type=content_type, object_id=v[0], creator_id=v[1])
+            for v in (self.rng.choice(public) for _ in range(n))
+        ]
+        self._create(ShareLink, links)
+        return [link.token for link in links]
+
+    def _rollups(self):
+        # bulk_create はシグナルを通らないので、集計系はまとめて作り直す
+        rollup.rebuild(batch_size=self.batch)
+        review.rebuild(batch_size=self.batch)
+
+    def _sessions(self, users):
+        """users のログイン済みセッションを作り、セッションキーを返す"""
+        engine = import_module(settings.SESSION_ENGINE)
+        keys = []
+        for user in users:
+            session = engine.SessionStore()
+            session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+            session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.save()
+            keys.append(session.session_key)
+        return keys
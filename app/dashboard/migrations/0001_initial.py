@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('vocabularies', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='日付')),
+                ('answers', models.PositiveIntegerField(default=0, verbose_name='回答数')),
+                ('corrects', models.PositiveIntegerField(default=0, verbose_name='正解数')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL, verbose_name='ユーザー')),
+                ('vocabulary', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='vocabularies.vocabulary', verbose_name='用語集')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'day', 'vocabulary'), name='dashboard_dailystat_user_day_vocab')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:55
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicates(apps, schema_editor):
+    """vocabulary が常に NULL だったため (user, day) で重複した行を1行に足し合わせる"""
+    DailyStat = apps.get_model('dashboard', 'DailyStat')
+    dups = (
+        DailyStat.objects.values('user_id', 'day')
+        .annotate(n=Count('id'), keep=Min('id'), answers=Sum('answers'), corrects=Sum('corrects'))
+        .filter(n__gt=1)
+        .order_by()
+    )
+    for row in dups.iterator():
+        DailyStat.objects.filter(pk=row['keep']).update(answers=row['answers'], corrects=row['corrects'])
+        DailyStat.objects.filter(user_id=row['user_id'], day=row['day']).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='dailystat',
+            name='dashboard_dailystat_user_day_vocab',
+        ),
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='dailystat',
+            name='vocabulary',
+        ),
+        migrations.AddConstraint(
+            model_name='dailystat',
+            constraint=models.UniqueConstraint(fields=('user', 'day'), name='dashboard_dailystat_user_day'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_dailystat_user_day'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailystat',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='更新日'),
+            preserve_default=False,
+        ),
+    ]
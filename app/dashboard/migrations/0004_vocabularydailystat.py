@@ -0,0 +1,62 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+
+VOCAB_PATH = 'quiz__term__vocabulary_terms__vocabulary_entries__vocabulary'
+
+
+def backfill(apps, schema_editor):
+    """既存の QuizHistory から用語集別の行を作る（dashboard.rollup.rebuild と同じ集計）"""
+    QuizHistory = apps.get_model('quizzes', 'QuizHistory')
+    VocabularyDailyStat = apps.get_model('dashboard', 'VocabularyDailyStat')
+    rows = (
+        QuizHistory.objects.filter(**{f'{VOCAB_PATH}__user': F('user')})
+        .annotate(day=TruncDate('answered_at'))
+        .values('user_id', 'day', vocabulary_id=F(f'{VOCAB_PATH}_id'))
+        .annotate(
+            answers=Count('id', distinct=True),
+            corrects=Count('id', distinct=True, filter=Q(is_correct=True)),
+        )
+        .order_by()
+    )
+    batch = []
+    for row in rows.iterator(chunk_size=1000):
+        batch.append(VocabularyDailyStat(**row))
+        if len(batch) >= 1000:
+            VocabularyDailyStat.objects.bulk_create(batch)
+            batch = []
+    VocabularyDailyStat.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_dailystat_updated_at'),
+        ('quizzes', '0005_unique_quiz_per_term'),
+        ('vocabularies', '0005_term_quiz_term'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VocabularyDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='日付')),
+                ('answers', models.PositiveIntegerField(default=0, verbose_name='回答数')),
+                ('corrects', models.PositiveIntegerField(default=0, verbose_name='正解数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vocabulary_daily_stats', to=settings.AUTH_USER_MODEL, verbose_name='ユーザー')),
+                ('vocabulary', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='vocabularies.vocabulary', verbose_name='用語集')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'day'], name='dashboard_vocabstat_user_day')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'vocabulary', 'day'), name='dashboard_vocabstat_user_vocab_day')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
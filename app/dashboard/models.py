@@ -1,3 +1,47 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class DailyStat(models.Model):
+    """
+    QuizHistory のユーザー別・日別ロールアップ（1ユーザー1日1行）。
+    回答のたびに dashboard.rollup で加算し、summary / recent / daily はこのテーブルだけを読む。
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_stats', verbose_name='ユーザー')
+    day = models.DateField(verbose_name='日付')
+    answers = models.PositiveIntegerField(default=0, verbose_name='回答数')
+    corrects = models.PositiveIntegerField(default=0, verbose_name='正解数')
+    # 加算・取り消し・作り直しのたびに更新（ダッシュボードの ETag / Last-Modified に使う）
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新日')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='dashboard_dailystat_user_day'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} {self.day}: {self.corrects}/{self.answers}'
+
+
+class VocabularyDailyStat(models.Model):
+    """
+    QuizHistory のユーザー別・用語集別・日別ロールアップ（1ユーザー1用語集1日1行）。
+    出題用の用語（terms.Term）→ vocabularies.Term.quiz_term → 自分の用語集のエントリ、とたどって
+    回答時点で入っている用語集ごとに加算する（同じ用語が複数の用語集に入っていればそれぞれに数える）。
+    vocabs はこのテーブルだけを読む。後から用語集に入れた・外した分は rebuild で反映される。
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='vocabulary_daily_stats', verbose_name='ユーザー')
+    vocabulary = models.ForeignKey('vocabularies.Vocabulary', on_delete=models.CASCADE, related_name='daily_stats', verbose_name='用語集')
+    day = models.DateField(verbose_name='日付')
+    answers = models.PositiveIntegerField(default=0, verbose_name='回答数')
+    corrects = models.PositiveIntegerField(default=0, verbose_name='正解数')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新日')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'vocabulary', 'day'], name='dashboard_vocabstat_user_vocab_day'),
+        ]
+        indexes = [models.Index(fields=['user', 'day'], name='dashboard_vocabstat_user_day')]
+
+    def __str__(self):
+        return f'{self.user_id} {self.vocabulary_id} {self.day}: {self.corrects}/{self.answers}'
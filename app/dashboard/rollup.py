@@ -0,0 +1,148 @@
+"""
+DailyStat（日別ロールアップ）と VocabularyDailyStat（用語集別・日別ロールアップ）の更新。
+
+- record / record_many: QuizHistory 書き込み時の加算（signals から呼ばれる）
+- rebuild: QuizHistory から作り直す（rebuild_daily_stats コマンド）
+日付は TIME_ZONE（Asia/Tokyo）基準。
+用語集は「出題用の用語 → vocabularies.Term.quiz_term → 回答したユーザー自身の用語集のエントリ」で決まる。
+"""
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from quizzes.models import QuizHistory
+from vocabularies.models import VocabularyTerm
+from .models import DailyStat, VocabularyDailyStat
+
+# QuizHistory → 用語集
+VOCAB_PATH = 'quiz__term__vocabulary_terms__vocabulary_entries__vocabulary'
+
+
+def _key(history):
+    return (history.user_id, timezone.localdate(history.answered_at))
+
+
+def _apply(model, lookup, answers, corrects):
+    qs = model.objects.filter(**lookup)
+    if answers < 0:
+        # 用語集の入れ替えなどで加算されていなかった分は取り消さない（0 を下回らないように）
+        qs = qs.filter(answers__gte=-answers, corrects__gte=-corrects)
+    # update() では auto_now が効かないので updated_at も明示する
+    changes = dict(answers=F('answers') + answers, corrects=F('corrects') + corrects, updated_at=timezone.now())
+    if qs.update(**changes) or answers < 0:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, answers=answers, corrects=corrects)
+    except IntegrityError:
+        # 同時に別リクエストが作成した → 加算し直す
+        qs.update(**changes)
+
+
+def _vocabularies(user_id, quiz_ids):
+    """{quiz_id: [user の用語集ID, ...]}（1クエリ）"""
+    rows = (
+        VocabularyTerm.objects
+        .filter(vocabulary__user_id=user_id, term__quiz_term__quizzes__in=quiz_ids)
+        .values_list('term__quiz_term__quizzes', 'vocabulary_id')
+        .distinct()
+    )
+    found = defaultdict(list)
+    for quiz_id, vocabulary_id in rows:
+        found[quiz_id].append(vocabulary_id)
+    return found
+
+
+def _add(histories, sign):
+    answers, corrects = Counter(), Counter()
+    vocab_answers, vocab_corrects = Counter(), Counter()
+    by_user = defaultdict(set)
+    for h in histories:
+        by_user[h.user_id].add(h.quiz_id)
+    vocabularies = {user_id: _vocabularies(user_id, quiz_ids) for user_id, quiz_ids in by_user.items()}
+    for h in histories:
+        key = _key(h)
+        correct = 1 if h.is_correct else 0
+        answers[key] += 1
+        corrects[key] += correct
+        for vocabulary_id in vocabularies[h.user_id].get(h.quiz_id, ()):
+            vocab_key = (*key, vocabulary_id)
+            vocab_answers[vocab_key] += 1
+            vocab_corrects[vocab_key] += correct
+    for (user_id, day), n in answers.items():
+        _apply(DailyStat, dict(user_id=user_id, day=day), sign * n, sign * corrects[(user_id, day)])
+    for (user_id, day, vocabulary_id), n in vocab_answers.items():
+        _apply(
+            VocabularyDailyStat, dict(user_id=user_id, day=day, vocabulary_id=vocabulary_id),
+            sign * n, sign * vocab_corrects[(user_id, day, vocabulary_id)],
+        )
+
+
+def record(history, sign=1):
+    """回答1件ぶんを加算（sign=-1 で取り消し）"""
+    _add([history], sign)
+
+
+def record_many(histories):
+    """bulk_create した回答をまとめて加算（キーごとに1回の UPDATE。用語集の解決はユーザーごとに1クエリ）"""
+    _add(histories, 1)
+
+
+def _bulk_rebuild(model, rows, make, batch_size):
+    batch, created = [], 0
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(make(row))
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+    return created + len(batch)
+
+
+def rebuild(user=None, batch_size=1000):
+    """QuizHistory から DailyStat と VocabularyDailyStat を作り直す。user 指定時はそのユーザーだけ。作った行数を返す"""
+    histories = QuizHistory.objects.all()
+    stats = DailyStat.objects.all()
+    vocab_stats = VocabularyDailyStat.objects.all()
+    if user is not None:
+        histories = histories.filter(user=user)
+        stats = stats.filter(user=user)
+        vocab_stats = vocab_stats.filter(user=user)
+
+    rows = (
+        histories.annotate(day=TruncDate('answered_at'))
+        .values('user_id', 'day')
+        .annotate(
+            answers=Count('id'),
+            corrects=Sum(Case(When(is_correct=True, then=1), default=0, output_field=IntegerField())),
+        )
+        .order_by()
+    )
+    # 同じ用語集に同じ出題用の用語が2回入っていても1回と数える
+    vocab_rows = (
+        histories.filter(**{f'{VOCAB_PATH}__user': F('user')})
+        .annotate(day=TruncDate('answered_at'))
+        .values('user_id', 'day', vocabulary_id=F(f'{VOCAB_PATH}_id'))
+        .annotate(
+            answers=Count('id', distinct=True),
+            corrects=Count('id', distinct=True, filter=Q(is_correct=True)),
+        )
+        .order_by()
+    )
+
+    with transaction.atomic():
+        stats.delete()
+        vocab_stats.delete()
+        created = _bulk_rebuild(DailyStat, rows, lambda row: DailyStat(
+            user_id=row['user_id'], day=row['day'],
+            answers=row['answers'], corrects=row['corrects'] or 0,
+        ), batch_size)
+        created += _bulk_rebuild(VocabularyDailyStat, vocab_rows, lambda row: VocabularyDailyStat(
+            user_id=row['user_id'], vocabulary_id=row['vocabulary_id'], day=row['day'],
+            answers=row['answers'], corrects=row['corrects'],
+        ), batch_size)
+    return created
@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from quizzes.models import QuizHistory
+from quizzes.signals import answers_recorded
+from . import rollup
+
+
+@receiver(pre_save, sender=QuizHistory)
+def remember_daily_stat(sender, instance, raw=False, **kwargs):
+    # 既存の回答の編集（管理画面など）は、編集前の値を取り消してから加算し直す
+    if instance.pk and not raw:
+        instance._rollup_before = (
+            QuizHistory.objects.filter(pk=instance.pk).only('user_id', 'quiz_id', 'is_correct', 'answered_at').first()
+        )
+
+
+@receiver(post_save, sender=QuizHistory)
+def add_daily_stat(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    before = instance.__dict__.pop('_rollup_before', None)
+    if before is not None:
+        rollup.record(before, sign=-1)
+    rollup.record(instance)
+
+
+@receiver(post_delete, sender=QuizHistory)
+def remove_daily_stat(sender, instance, **kwargs):
+    rollup.record(instance, sign=-1)
+
+
+@receiver(answers_recorded)
+def add_daily_stats(sender, histories, **kwargs):
+    rollup.record_many(histories)
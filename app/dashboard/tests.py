@@ -1,3 +1,258 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import threading
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import QuerySet, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from quizzes.models import Quiz, QuizHistory, ReviewState
+from terms import hierarchy
+from terms.models import Tag, TagClosure, Term
+from vocabularies.models import Term as VocabTerm, Vocabulary, VocabularyTerm
+from . import rollup
+from .models import DailyStat, VocabularyDailyStat
+
+
+def _quiz(name):
+    term = Term.objects.create(term=name, definition=f"{name} definition")
+    return Quiz.objects.create(term=term, question_type="DT")
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("learner", password="pw")
+        self.quiz = _quiz("TCP")
+
+    def _totals(self):
+        return DailyStat.objects.filter(user=self.user).aggregate(a=Sum("answers"), c=Sum("corrects"))
+
+    def _raw(self):
+        qs = QuizHistory.objects.filter(user=self.user)
+        return {"a": qs.count(), "c": qs.filter(is_correct=True).count()}
+
+    def test_totals_match_history(self):
+        for correct in (True, False, True):
+            QuizHistory.objects.create(user=self.user, quiz=self.quiz, is_correct=correct)
+        QuizHistory.objects.filter(user=self.user, is_correct=False).first().delete()
+        self.assertEqual(DailyStat.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(self._totals(), self._raw())
+
+    def test_record_many_and_rebuild(self):
+        now = timezone.now()
+        rows = QuizHistory.objects.bulk_create([
+            QuizHistory(user=self.user, quiz=self.quiz, is_correct=i % 2 == 0, answered_at=now) for i in range(5)
+        ])
+        rollup.record_many(rows)
+        self.assertEqual(self._totals(), self._raw())
+        DailyStat.objects.filter(user=self.user).update(answers=0, corrects=0)
+        rollup.rebuild(user=self.user)
+        self.assertEqual(self._totals(), self._raw())
+
+    def test_lost_insert_race_adds_to_winner(self):
+        # UPDATE で行が無かった直後に別リクエストが作った → こちらの INSERT は一意制約で失敗し、加算し直す
+        user_id, day = key = (self.user.pk, timezone.localdate())
+        update = QuerySet.update
+        raced = []
+
+        def racing_update(qs, **kwargs):
+            if not raced:
+                raced.append(DailyStat.objects.create(user_id=user_id, day=day, answers=1, corrects=1))
+                return 0
+            return update(qs, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", autospec=True, side_effect=racing_update):
+            rollup._apply(DailyStat, dict(zip(("user_id", "day"), key)), 1, 1)
+        self.assertEqual(list(DailyStat.objects.filter(user=self.user).values_list("answers", "corrects")), [(2, 2)])
+
+
+class DashboardValidatorTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("learner", password="pw")
+        self.client.force_login(self.user)
+        quiz = _quiz("TCP")
+        self.first = QuizHistory.objects.create(user=self.user, quiz=quiz, is_correct=True)
+        self.latest = QuizHistory.objects.create(user=self.user, quiz=quiz, is_correct=True)
+
+    def _etag(self):
+        response = self.client.get("/dashboard/summary")
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def test_not_modified(self):
+        etag = self._etag()
+        self.assertEqual(self.client.get("/dashboard/summary", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_changes_without_new_answers(self):
+        # 最新の回答は変わらない変更（古い回答の編集・削除、作り直し）でも ETag が変わる
+        etags = [self._etag()]
+        self.first.is_correct = False
+        self.first.save()
+        self.assertEqual(self.client.get("/dashboard/summary").json()["correct_answers"], 1)
+        etags.append(self._etag())
+        self.first.delete()
+        etags.append(self._etag())
+        rollup.rebuild(user=self.user)
+        etags.append(self._etag())
+        self.assertEqual(len(set(etags)), len(etags))
+
+
+class RollupConcurrencyTests(TransactionTestCase):
+    # SQLite のテスト DB（共有キャッシュのインメモリ）は書き込みが重なると待たずに
+    # "database table is locked" になるので、行ロックのある DB でだけ走らせる
+    @skipIf(connection.vendor == "sqlite", "SQLite cannot run concurrent writers")
+    def test_concurrent_first_answers(self):
+        # 同じ (user, day) の最初の回答が同時に来ても1行にまとまり、二重に数えない
+        user = get_user_model().objects.create_user("racer", password="pw")
+        key = (user.pk, timezone.localdate())
+        barrier = threading.Barrier(2)
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                rollup._apply(DailyStat, dict(zip(("user_id", "day"), key)), 1, 1)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(list(DailyStat.objects.filter(user=user).values_list("answers", "corrects")), [(2, 2)])
+
+
+class VocabsViewTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("owner", password="pw")
+        self.other = get_user_model().objects.create_user("other", password="pw")
+        self.quiz = _quiz("UDP")
+        self.mine = Vocabulary.objects.create(user=self.user, title="network")
+        self.theirs = Vocabulary.objects.create(user=self.other, title="theirs")
+        for owner, vocabulary in ((self.user, self.mine), (self.other, self.theirs)):
+            vt = VocabTerm.objects.create(user=owner, term_name="UDP", quiz_term=self.quiz.term)
+            VocabularyTerm.objects.create(user=owner, vocabulary=vocabulary, term=vt)
+
+    def _stats(self):
+        return list(VocabularyDailyStat.objects.values_list("user__username", "vocabulary__title", "answers", "corrects"))
+
+    def test_counts_per_own_vocabulary(self):
+        QuizHistory.objects.create(user=self.user, quiz=self.quiz, is_correct=True)
+        QuizHistory.objects.create(user=self.user, quiz=self.quiz, is_correct=False)
+        self.assertEqual(self._stats(), [("owner", "network", 2, 1)])
+
+        self.client.force_login(self.user)
+        # セッション・ユーザー・ETag（最新の回答とロールアップ）・集計。履歴の JOIN は無い
+        with self.assertNumQueries(5):
+            data = self.client.get("/dashboard/vocabs").json()
+        self.assertEqual(data["vocabs"], [{
+            "vocabulary_id": self.mine.pk, "vocabulary_name": "network",
+            "answers": 2, "corrects": 1, "accuracy": 0.5,
+        }])
+
+    def test_edit_delete_bulk_and_rebuild(self):
+        a = QuizHistory.objects.create(user=self.user, quiz=self.quiz, is_correct=False)
+        a.is_correct = True
+        a.save()
+        rows = QuizHistory.objects.bulk_create([
+            QuizHistory(user=self.user, quiz=self.quiz, is_correct=False, answered_at=timezone.now())
+            for _ in range(3)
+        ])
+        rollup.record_many(rows)
+        rows[0].delete()
+        self.assertEqual(self._stats(), [("owner", "network", 3, 1)])
+
+        # 後から入れた用語集は rebuild で反映される
+        extra = Vocabulary.objects.create(user=self.user, title="extra")
+        VocabularyTerm.objects.create(
+            user=self.user, vocabulary=extra, term=VocabTerm.objects.get(user=self.user),
+        )
+        VocabularyDailyStat.objects.update(answers=0, corrects=0)
+        rollup.rebuild(user=self.user)
+        self.assertEqual(sorted(self._stats()), [("owner", "extra", 3, 1), ("owner", "network", 3, 1)])
+
+class RecentCursorTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("learner", password="pw")
+        quiz = _quiz("HTTP")
+        QuizHistory.objects.bulk_create(
+            [QuizHistory(user=self.user, quiz=quiz, is_correct=bool(i % 2)) for i in range(5)]
+        )
+        # 同じ時刻が並んでも id で順序が決まること
+        QuizHistory.objects.filter(user=self.user).update(answered_at=timezone.now())
+        self.client.force_login(self.user)
+
+    def test_pages_cover_everything_once(self):
+        ids, cursor = [], None
+        while True:
+            params = {"limit": 2, "count": 0}
+            if cursor:
+                params["cursor"] = cursor
+            data = self.client.get("/dashboard/recent", params).json()
+            ids += [r["id"] for r in data["results"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        expected = list(QuizHistory.objects.filter(user=self.user).order_by("-id").values_list("id", flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/dashboard/recent", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+
+class SeedScaleTests(TestCase):
+    OPTIONS = dict(
+        users=2, tags=10, tag_depth=2, terms=20, vocabularies=2, entries=5, favorites=2,
+        histories=50, days=7, shares=3, sessions=1, seed=1, public_ratio=1.0,
+    )
+
+    def test_small_scale(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "seed.json")
+            call_command("seed_scale", manifest=path, force=True, stdout=io.StringIO(), **self.OPTIONS)
+            with open(path) as f:
+                manifest = json.load(f)
+
+        users = get_user_model().objects.filter(username__startswith="seed-user-")
+        self.assertEqual(users.count(), 2)
+        self.assertEqual(Term.objects.count(), 20)
+        self.assertEqual(Quiz.objects.count(), 20 * len(Quiz.QuestionType.values))
+        self.assertEqual(QuizHistory.objects.count(), 50)
+        self.assertEqual(VocabularyTerm.objects.count(), 2 * 2 * 5)
+
+        # シグナルを通らない分は作り直されている
+        closure = set(TagClosure.objects.values_list("ancestor_id", "descendant_id", "depth"))
+        hierarchy.rebuild()
+        self.assertEqual(closure, set(TagClosure.objects.values_list("ancestor_id", "descendant_id", "depth")))
+        for tag in Tag.objects.all():
+            self.assertEqual(tag.term_count, tag.terms.count())
+        self.assertEqual(DailyStat.objects.aggregate(n=Sum("answers"))["n"], 50)
+        self.assertEqual(
+            ReviewState.objects.count(),
+            QuizHistory.objects.values("user_id", "quiz__term_id").distinct().count(),
+        )
+        for vocabulary in Vocabulary.objects.all():
+            self.assertEqual(vocabulary.term_count, 5)
+
+        self.assertEqual(len(manifest["sessions"]), 1)
+        self.assertEqual(len(manifest["share_tokens"]), 3)
+        self.assertTrue(set(manifest["term_ids"]) <= set(Term.objects.values_list("pk", flat=True)))
+        self.assertEqual(manifest["session_cookie_name"], settings.SESSION_COOKIE_NAME)
+
+    @override_settings(DEBUG=False)
+    def test_refuses_without_force(self):
+        with self.assertRaises(CommandError):
+            call_command("seed_scale", stdout=io.StringIO(), **self.OPTIONS)
+        self.assertFalse(get_user_model().objects.exists())
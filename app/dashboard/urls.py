@@ -9,7 +9,8 @@ urlpatterns = [
 
 urlpatterns = [
     path('summary', views.summary, name='summary'),          # ?days=30
-    path('recent', views.recent, name='recent'),             # ?days=30&limit=20&offset=0
+    path('recent', views.recent, name='recent'),             # ?days=30&limit=20&offset=0 or &cursor=...
     path('vocabs', views.vocabs, name='vocabs'),             # ?days=90
     path('daily', views.daily, name='daily'),                # ?days=30
+    path('export', views.export_history, name='export'),     # ?format=ndjson|csv&after=<id>&until=<id>
 ]
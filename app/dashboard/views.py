@@ -3,17 +3,20 @@ from django.shortcuts import render
 def dummy_dashboard_view(request):
     return render(request, 'dashboard/home.html')
 
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Sum, Case, When, IntegerField
-from django.db.models.functions import TruncDate
+from django.db.models import Count, F, Max, Sum
 from django.http import JsonResponse
 from django.utils import timezone
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.views.decorators.http import require_GET
 
+from core import conditional, streaming
+from quizzes import distractors
 from quizzes.models import QuizHistory
 from terms.models import Term
 from vocabularies.models import Vocabulary
+from .models import DailyStat, VocabularyDailyStat
 
 
 # --------- helpers ---------
@@ -28,35 +31,107 @@ def _as_int(value, default, min_value=None, max_value=None):
         n = max_value
     return n
 
+def _since_day(days):
+    """直近days日（今日を含む）の初日。集計はローカル日付（TIME_ZONE）単位。"""
+    return timezone.localdate() - timedelta(days=days - 1)
+
+def _history_qs(user):
+    """_history_item が使う関連を JOIN 済みのユーザー履歴QS"""
+    return QuizHistory.objects.filter(user=user).select_related('quiz', 'quiz__term', 'selected_choice')
+
 def _period_qs(user, days):
     """ユーザーの直近days日分の履歴QSを返す（answered_at降順）。"""
-    now = timezone.now()
-    since = now - timedelta(days=days)
-    return (
-        QuizHistory.objects
-        .filter(user=user, answered_at__gte=since)
-        .select_related('quiz', 'quiz__term', 'quiz__term__vocabulary', 'selected_choice')
-        .order_by('-answered_at')
+    since = timezone.make_aware(datetime.combine(_since_day(days), time.min))
+    return _history_qs(user).filter(answered_at__gte=since).order_by('-answered_at', '-id')
+
+def _period_stats(user, days):
+    """ユーザーの直近days日分のロールアップQS（DailyStat）を返す。"""
+    return DailyStat.objects.filter(user=user, day__gte=_since_day(days))
+
+def _accuracy(answers, corrects):
+    return round((corrects / answers) if answers else 0.0, 4)
+
+def _encode_cursor(history):
+    """(answered_at, id) を不透明なカーソル文字列にする"""
+    raw = f"{history.answered_at.isoformat()}|{history.id}"
+    return urlsafe_base64_encode(raw.encode())
+
+def _decode_cursor(value):
+    """カーソルを (answered_at, id) に戻す。壊れていれば None"""
+    try:
+        ts, pk = urlsafe_base64_decode(value).decode().split('|')
+        answered_at = datetime.fromisoformat(ts)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if timezone.is_naive(answered_at):
+        return None
+    return answered_at, pk
+
+def _history_item(h):
+    term = h.quiz.term
+    vocab = getattr(term, "vocabulary", None)
+    return {
+        "id": h.id,
+        "term_id": term.id if term else None,
+        "term_word": distractors.term_name(term) if term else None,
+        "vocabulary_id": vocab.id if vocab else None,
+        "vocabulary_name": getattr(vocab, "title", None),
+        "question_type": h.quiz.question_type,
+        "selected_choice": getattr(h.selected_choice, "text", None),
+        "is_correct": bool(h.is_correct),
+        "answered_at": h.answered_at.isoformat(),
+    }
+
+
+# 条件付き GET: 最新の回答（(user, answered_at) インデックスの先頭1行）と、ロールアップの行数・最終更新、
+# 今日の日付から ETag を作る。ロールアップは回答の追加だけでなく編集・削除・作り直し（rebuild）でも
+# updated_at が進むので、最新の回答が変わらない変更もここで拾える。
+# 日付を含めるのは、回答が無くても日付が変わると「直近N日」の範囲がずれるため。
+# Last-Modified も同じ理由で「最新の回答・ロールアップの更新」と「今日の0時」の遅いほう。
+DASHBOARD_CACHE_CONTROL = {"private": True, "max_age": 0, "must_revalidate": True}
+
+async def _validators(request, *args, **kwargs):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return None, None
+    last = await (
+        QuizHistory.objects.filter(user=user)
+        .order_by('-answered_at', '-id')
+        .values_list('answered_at', 'id')
+        .afirst()
     )
+    stats = await DailyStat.objects.filter(user=user).aaggregate(rows=Count('id'), changed=Max('updated_at'))
+    today = timezone.localdate()
+    midnight = timezone.make_aware(datetime.combine(today, time.min))
+    answered_at, last_id = last or (None, None)
+    last_modified = max(t for t in (answered_at, stats['changed'], midnight) if t is not None)
+    etag = conditional.make_etag(
+        user.pk, last_id, answered_at, stats['rows'], stats['changed'], today, request.GET.urlencode(),
+    )
+    return etag, last_modified
+
 
+# JSON API は async ビュー（ASGI で動かすと DB 待ちの間ワーカーを占有しない）。
+# request.user は同期で DB を読むので await request.auser() を使う。
 
 # --------- 1) summary ---------
 @login_required
 @require_GET
-def summary(request):
+@conditional.conditional(_validators, cache_control=DASHBOARD_CACHE_CONTROL)
+async def summary(request):
     days = _as_int(request.GET.get('days'), default=30, min_value=1, max_value=365)
-    qs = _period_qs(request.user, days)
-
-    # 集計：件数と正解数
-    total = qs.count()
-    correct = qs.filter(is_correct=True).count()
-    accuracy = (correct / total) if total else 0.0
+    user = await request.auser()
+    # 集計：件数と正解数（ロールアップから1クエリで）
+    agg = await _period_stats(user, days).aaggregate(total=Sum('answers'), correct=Sum('corrects'))
+    total = agg['total'] or 0
+    correct = agg['correct'] or 0
 
     data = {
         "range_days": days,
         "total_answers": total,
         "correct_answers": correct,
-        "accuracy": round(accuracy, 4),
+        "accuracy": _accuracy(total, correct),
     }
     return JsonResponse(data)
 
@@ -64,68 +139,71 @@ def summary(request):
 # --------- 2) recent ---------
 @login_required
 @require_GET
-def recent(request):
+@conditional.conditional(_validators, cache_control=DASHBOARD_CACHE_CONTROL)
+async def recent(request):
+    """
+    ?cursor=... を渡すとキーセット方式（answered_at, id の降順）で続きを返す。
+    (user, answered_at) インデックスを範囲スキャンするだけなので、深いページでも OFFSET の読み飛ばしが起きない。
+    cursor が無ければ従来どおり offset/limit。count=0 で件数を省略できる。
+    """
     days = _as_int(request.GET.get('days'), default=30, min_value=1, max_value=365)
     limit = _as_int(request.GET.get('limit'), default=20, min_value=1, max_value=200)
     offset = _as_int(request.GET.get('offset'), default=0, min_value=0)
+    cursor = request.GET.get('cursor')
+    with_count = request.GET.get('count', '1') not in ('0', 'false')
+    user = await request.auser()
 
-    qs = _period_qs(request.user, days)
-    items = []
-    for h in qs[offset:offset+limit]:
-        term = h.quiz.term
-        vocab = term.vocabulary if term else None
-        items.append({
-            "id": h.id,
-            "term_id": term.id if term else None,
-            "term_word": term.word if term else None,
-            "vocabulary_id": vocab.id if vocab else None,
-            "vocabulary_name": getattr(vocab, "name", None),
-            "question_type": h.quiz.question_type,
-            "selected_choice": getattr(h.selected_choice, "text", None),
-            "is_correct": bool(h.is_correct),
-            "answered_at": h.answered_at.isoformat(),
-        })
+    qs = _period_qs(user, days)
+    if cursor:
+        decoded = _decode_cursor(cursor)
+        if decoded is None:
+            return JsonResponse({"error": "invalid cursor"}, status=400)
+        answered_at, last_id = decoded
+        qs = qs.filter(answered_at__lte=answered_at).exclude(answered_at=answered_at, id__gte=last_id)
+        offset = 0
 
-    return JsonResponse({
+    page = [h async for h in qs[offset:offset + limit + 1]]
+    has_next = len(page) > limit
+    page = page[:limit]
+
+    data = {
         "range_days": days,
         "offset": offset,
         "limit": limit,
-        "count": qs.count(),
-        "results": items,
-    })
+        "results": [_history_item(h) for h in page],
+        "next_cursor": _encode_cursor(page[-1]) if has_next else None,
+    }
+    if with_count:
+        # 件数は生の履歴ではなくロールアップから数える
+        data["count"] = (await _period_stats(user, days).aaggregate(n=Sum('answers')))['n'] or 0
+    return JsonResponse(data)
 
 
 # --------- 3) vocabs ---------
 @login_required
 @require_GET
-def vocabs(request):
+@conditional.conditional(_validators, cache_control=DASHBOARD_CACHE_CONTROL)
+async def vocabs(request):
     days = _as_int(request.GET.get('days'), default=90, min_value=1, max_value=365)
-    qs = _period_qs(request.user, days)
-
-    # Vocabulary単位の集計
+    user = await request.auser()
+    # Vocabulary単位の集計（用語集別のロールアップ VocabularyDailyStat から1クエリで）
     agg = (
-        qs.values(
-            'quiz__term__vocabulary_id',
-            'quiz__term__vocabulary__name',
-        )
-        .annotate(
-            answers=Count('id'),
-            corrects=Sum(Case(When(is_correct=True, then=1), default=0, output_field=IntegerField())),
-        )
-        .order_by('-answers')
+        VocabularyDailyStat.objects.filter(user=user, day__gte=_since_day(days))
+        .values('vocabulary_id', vocabulary_title=F('vocabulary__title'))
+        .annotate(answers=Sum('answers'), corrects=Sum('corrects'))
+        .order_by('-answers', 'vocabulary_id')
     )
 
     rows = []
-    for row in agg:
-        answers = row['answers']
+    async for row in agg:
+        answers = row['answers'] or 0
         corrects = row['corrects'] or 0
-        acc = (corrects / answers) if answers else 0.0
         rows.append({
-            "vocabulary_id": row['quiz__term__vocabulary_id'],
-            "vocabulary_name": row['quiz__term__vocabulary__name'],
+            "vocabulary_id": row['vocabulary_id'],
+            "vocabulary_name": row['vocabulary_title'],
             "answers": answers,
             "corrects": corrects,
-            "accuracy": round(acc, 4),
+            "accuracy": _accuracy(answers, corrects),
         })
 
     return JsonResponse({
@@ -137,35 +215,60 @@ def vocabs(request):
 # --------- 4) daily ---------
 @login_required
 @require_GET
-def daily(request):
+@conditional.conditional(_validators, cache_control=DASHBOARD_CACHE_CONTROL)
+async def daily(request):
     days = _as_int(request.GET.get('days'), default=30, min_value=1, max_value=365)
-    qs = _period_qs(request.user, days)
-
+    user = await request.auser()
     daily_agg = (
-        qs.annotate(day=TruncDate('answered_at'))
-          .values('day')
-          .annotate(
-              answers=Count('id'),
-              corrects=Sum(Case(When(is_correct=True, then=1), default=0, output_field=IntegerField())),
-          )
-          .order_by('day')
+        _period_stats(user, days)
+        .values('day')
+        .annotate(answers=Sum('answers'), corrects=Sum('corrects'))
+        .order_by('day')
     )
 
     series = []
-    for d in daily_agg:
-        answers = d['answers']
+    async for d in daily_agg:
+        answers = d['answers'] or 0
         corrects = d['corrects'] or 0
-        acc = (corrects / answers) if answers else 0.0
         # 日付はISO形式（YYYY-MM-DD）
-        day_str = d['day'].isoformat() if hasattr(d['day'], 'isoformat') else str(d['day'])
         series.append({
-            "date": day_str,
+            "date": d['day'].isoformat(),
             "answers": answers,
             "corrects": corrects,
-            "accuracy": round(acc, 4),
+            "accuracy": _accuracy(answers, corrects),
         })
 
     return JsonResponse({
         "range_days": days,
         "series": series,
     })
+
+
+# --------- 5) export ---------
+HISTORY_FIELDS = [
+    "id", "term_id", "term_word", "vocabulary_id", "vocabulary_name",
+    "question_type", "selected_choice", "is_correct", "answered_at",
+]
+
+@login_required
+@require_GET
+async def export_history(request):
+    """
+    自分の解答履歴を全件 NDJSON / CSV でストリーミングする。
+    ?format=ndjson|csv&after=<id>&until=<id>&days=
+    id 昇順なので、途中で切れたら最後に受け取った id を after に渡して再開する。
+    """
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in streaming.FORMATS:
+        return JsonResponse({"error": "invalid format"}, status=400)
+    user = await request.auser()
+
+    qs = _history_qs(user)
+    days = _as_int(request.GET.get('days'), default=None, min_value=1)
+    if days:
+        qs = qs.filter(answered_at__gte=timezone.make_aware(datetime.combine(_since_day(days), time.min)))
+    after, until = streaming.id_range(request)
+    return streaming.stream_export(
+        request, streaming.apply_range(qs, after, until), _history_item, HISTORY_FIELDS,
+        fmt=fmt, filename=f"quiz-history-{user.pk}",
+    )
@@ -0,0 +1,51 @@
+# gunicorn の設定（app/ で gunicorn を起動すると自動で読み込まれる）
+# DB 接続は ワーカー数 × スレッド数 だけ常駐するので、RDS の max_connections に収まるようにする
+import multiprocessing
+import os
+import shutil
+
+# APP_SERVER=asgi で async ビューを ASGI（uvicorn ワーカー）で配信する
+# ASGI では DB 接続を使い回せない（リクエストごとに別スレッドで ORM が動き、接続が残り続ける）ので
+# 本番設定（core/settings/prod.py）で CONN_MAX_AGE=0 に固定している。接続数が問題になるなら
+# wsgi のまま threads を増やすか、DB 側にコネクションプール（RDS Proxy など）を置く
+if os.getenv("APP_SERVER", "wsgi").lower() == "asgi":
+    wsgi_app = "core.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "core.wsgi:application"
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# メモリリーク対策で定期的にワーカーを入れ替える（同時に入れ替わらないよう jitter を付ける）
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+
+# /metrics を全ワーカー分まとめて返すため、prometheus_client のマルチプロセスモードを使う
+# （ワーカーが値を書くディレクトリ。prometheus_client の import より前に環境変数を設定する）
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/iterms-prometheus")
+
+
+def on_starting(server):
+    # 前回起動時のファイルが残っていると値が混ざるので消しておく
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def post_worker_init(worker):
+    from core import metrics
+    # 1ワーカーが同時に処理できるリクエスト数（同期ワーカーは threads。uvicorn は上限が無いので目安値）
+    if wsgi_app == "core.asgi:application":
+        metrics.set_capacity(int(os.getenv("GUNICORN_ASGI_CAPACITY", "100")))
+    else:
+        metrics.set_capacity(threads)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,92 @@
+"""
+readiness（/health/ready/）の確認項目。
+
+- database: SELECT 1。結果を HEALTH_DB_CHECK_INTERVAL 秒だけ覚えておき、
+  ロードバランサが何度叩いても DB へのピンは1プロセスあたりその間隔に1回まで
+- migrations: 未適用のマイグレーションが無いか。マイグレーションファイルの読み込みは重いので、
+  一度「全部適用済み」になったらそのプロセスでは再確認しない（コードが変わればプロセスも変わる）
+
+どちらも同時に来たリクエストは1つだけが確認し、他は前回の結果を使う。
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+class CachedCheck:
+    def __init__(self, func, interval, sticky_ok=False):
+        self.func = func
+        self.interval = interval
+        self.sticky_ok = sticky_ok  # 一度成功したら以後は確認しない
+        self.result = None          # (ok, detail)
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        if self._fresh():
+            return self.result
+        if not self.lock.acquire(blocking=self.result is None):
+            # 別スレッドが確認中 → 前回の結果
+            return self.result
+        try:
+            if not self._fresh():
+                try:
+                    self.result = self.func()
+                except Exception as e:
+                    self.result = (False, f"{e.__class__.__name__}: {e}")
+                self.checked_at = time.monotonic()
+            return self.result
+        finally:
+            self.lock.release()
+
+    def _fresh(self):
+        if self.result is None:
+            return False
+        if self.sticky_ok and self.result[0]:
+            return True
+        return time.monotonic() - self.checked_at < self.interval()
+
+    def reset(self):
+        self.result = None
+
+
+def _db_interval():
+    return getattr(settings, "HEALTH_DB_CHECK_INTERVAL", 5)
+
+
+def _ping_database():
+    conn = connections[DEFAULT_DB_ALIAS]
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+    return True, "ok"
+
+
+def _check_migrations():
+    conn = connections[DEFAULT_DB_ALIAS]
+    executor = MigrationExecutor(conn)
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    if plan:
+        return False, f"{len(plan)} pending"
+    return True, "ok"
+
+
+database = CachedCheck(_ping_database, _db_interval)
+migrations = CachedCheck(_check_migrations, _db_interval, sticky_ok=True)
+
+CHECKS = {"database": database, "migrations": migrations}
+
+
+def run():
+    """(全て ok か, {名前: detail})。DB に繋がらなければマイグレーションは確認しない"""
+    results = {}
+    ok, results["database"] = database()
+    if ok:
+        migrations_ok, results["migrations"] = migrations()
+        ok = ok and migrations_ok
+    else:
+        results["migrations"] = "skipped"
+    return ok, results
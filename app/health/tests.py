@@ -1,3 +1,123 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import OperationalError
+from django.test import Client, TestCase, override_settings
+from prometheus_client import REGISTRY
+
+from core import metrics, profiling
+from terms.models import Term
+from . import checks
+
+PROFILED = ["core.middleware.QueryProfilingMiddleware", *settings.MIDDLEWARE]
+
+
+class ReadinessTests(TestCase):
+    def setUp(self):
+        for check in checks.CHECKS.values():
+            check.reset()
+        self.addCleanup(lambda: [check.reset() for check in checks.CHECKS.values()])
+
+    def test_ready(self):
+        response = self.client.get("/health/ready/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"ready": True, "checks": {"database": "ok", "migrations": "ok"}})
+
+    def test_database_down(self):
+        with mock.patch.object(checks.database, "func", side_effect=OperationalError("down")):
+            response = self.client.get("/health/ready/")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["checks"], {"database": "OperationalError: down", "migrations": "skipped"})
+
+    def test_database_ping_is_cached(self):
+        with mock.patch.object(checks.database, "func", return_value=(True, "ok")) as ping:
+            self.client.get("/health/ready/")
+            self.client.get("/health/ready/")
+        self.assertEqual(ping.call_count, 1)
+
+    def test_liveness_skips_checks(self):
+        with mock.patch.object(checks, "run") as run:
+            response = self.client.get("/health/live/")
+        self.assertEqual(response.status_code, 200)
+        run.assert_not_called()
+
+
+class QueryProfilingTests(TestCase):
+    def setUp(self):
+        profiling.reset()
+        self.addCleanup(profiling.reset)
+
+    def test_sql_shape_ignores_values(self):
+        self.assertEqual(
+            profiling.sql_shape("SELECT * FROM t WHERE id = 12 AND name = 'a''b' AND pk IN (%s, %s, %s)"),
+            "SELECT * FROM t WHERE id = ? AND name = ? AND pk IN (...)",
+        )
+
+    @override_settings(MIDDLEWARE=PROFILED, QUERY_PROFILING=True)
+    def test_counts_queries_per_route(self):
+        response = Client().get("/terms/tags/cloud/")
+        routes = profiling.snapshot()["routes"]
+        self.assertEqual(routes["GET /terms/tags/cloud/"]["requests"], 1)
+        self.assertEqual(routes["GET /terms/tags/cloud/"]["max_queries"], int(response["X-Query-Count"]))
+        self.assertIn("db;dur=", response["Server-Timing"])
+
+    def test_flags_repeated_query_shape(self):
+        Term.objects.bulk_create([Term(term=f"t{i}", definition="d") for i in range(12)])
+        profiling.install()
+        profile, token = profiling.start()
+        try:
+            for term in Term.objects.all():
+                Term.objects.filter(pk=term.pk).exists()  # 1件ずつ引く（N+1）
+        finally:
+            profiling.stop(token)
+        profiling.record("GET /n-plus-one/", profile, slow_ms=10_000, repeat_threshold=10)
+        stats = profiling.snapshot()["routes"]["GET /n-plus-one/"]
+        self.assertEqual(stats["n_plus_one"], 1)
+        self.assertEqual(stats["last_repeated"]["count"], 12)
+        self.assertIn("LIMIT ?", stats["last_repeated"]["sql"])
+
+    @override_settings(MIDDLEWARE=PROFILED, QUERY_PROFILING=False)
+    def test_inactive_when_disabled(self):
+        response = Client().get("/terms/tags/cloud/")
+        self.assertNotIn("X-Query-Count", response)
+        self.assertEqual(profiling.snapshot()["routes"], {})
+
+    def test_query_stats_is_staff_only(self):
+        user = get_user_model().objects.create_user("member", password="pw")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get("/admin/query-stats/").status_code, 302)
+        user.is_staff = True
+        user.save()
+        response = self.client.get("/admin/query-stats/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("routes", response.json())
+
+
+class MetricsTests(TestCase):
+    def _count(self, view, method="GET"):
+        labels = {"view": view, "method": method}
+        return REGISTRY.get_sample_value("iterms_http_request_duration_seconds_count", labels) or 0
+
+    def test_latency_is_labelled_by_view_name(self):
+        before = self._count("sharing:open")
+        self.client.get("/sharing/some-token/")
+        self.client.get("/sharing/another-token/")
+        self.assertEqual(self._count("sharing:open"), before + 2)
+        # 生のパスはラベルにしない（トークンごとに系列が増えないように）
+        self.assertEqual(self._count("/sharing/some-token/"), 0)
+
+    def test_endpoint_returns_exposition_format(self):
+        self.client.get("/health/ready/")
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE_LATEST)
+        body = response.content.decode()
+        self.assertIn("# TYPE iterms_http_request_duration_seconds histogram", body)
+        self.assertIn('iterms_http_requests_total{method="GET",status="200",view="readiness"}', body)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        before = self._count("readiness")
+        Client().get("/health/ready/")
+        self.assertEqual(self._count("readiness"), before)
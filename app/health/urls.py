@@ -1,6 +1,8 @@
 from django.urls import path
-from .views import health_check
+from .views import health_check, readiness
 
 urlpatterns = [
     path("", health_check),
-]
\ No newline at end of file
+    path("live/", health_check, name="liveness"),
+    path("ready/", readiness, name="readiness"),
+]
@@ -1,4 +1,26 @@
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.cache import never_cache
+
+from core import metrics as app_metrics
+from . import checks
+
 
 def health_check(request):
-    return HttpResponse("OK", status=200)
\ No newline at end of file
+    """liveness: プロセスが応答できるか（DB などは見ない。落ちていても再起動では直らないため）"""
+    return HttpResponse("OK", status=200)
+
+
+@never_cache
+def readiness(request):
+    """
+    readiness: このワーカーにトラフィックを流してよいか。
+    DB に繋がり、マイグレーションが全て適用済みなら 200、そうでなければ 503（health/checks.py）。
+    """
+    ok, results = checks.run()
+    return JsonResponse({"ready": ok, "checks": results}, status=200 if ok else 503)
+
+
+def metrics(request):
+    """Prometheus のスクレイプ用（nginx からは公開しない。コンテナ間で django:8000/metrics を直接読む）"""
+    body, content_type = app_metrics.render()
+    return HttpResponse(body, content_type=content_type)
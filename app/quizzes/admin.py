@@ -1,6 +1,6 @@
 # Register your models here.
 from django.contrib import admin
-from .models import Quiz, QuizChoice, QuizHistory
+from .models import Quiz, QuizChoice, QuizHistory, QuizSession, ReviewState
 
 class QuizChoiceInline(admin.TabularInline):
     model = QuizChoice
@@ -16,3 +16,15 @@ class QuizAdmin(admin.ModelAdmin):
 class QuizHistoryAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "quiz", "is_correct", "answered_at")
     list_filter = ("is_correct",)
+
+@admin.register(ReviewState)
+class ReviewStateAdmin(admin.ModelAdmin):
+    list_display = ("user", "term", "due_at", "interval_days", "repetitions", "ease", "lapses")
+    raw_id_fields = ("user", "term")
+    ordering = ("due_at",)
+
+@admin.register(QuizSession)
+class QuizSessionAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "question_type", "vocabulary", "tag", "corrects", "answers", "created_at", "completed_at")
+    list_filter = ("question_type",)
+    raw_id_fields = ("user", "vocabulary", "tag")
@@ -0,0 +1,152 @@
+"""
+誤答（ディストラクタ）候補の抽選。
+
+プール全件を Python に読み込んでシャッフルする代わりに、
+主キー範囲からランダムな pk を選び、その行だけをインデックスで取得する。
+用語テーブルが大きくなっても 1 問あたりのクエリ数・読み込み行数はほぼ一定。
+"""
+import random
+from itertools import chain
+
+# ランダムな pk をまとめて引く回数（pk が密ならほぼ1回で揃う）
+ID_ROUNDS = 2
+
+# 用語モデルごとの (用語名, 説明) のフィールド。Quiz.term は terms.Term、
+# VocabularyTerm.term は vocabularies.Term を指している
+FIELDS = {
+    "terms.term": ("term", "definition"),
+    "vocabularies.term": ("term_name", "description"),
+}
+
+
+def _fields(model):
+    try:
+        return FIELDS[model._meta.label_lower]
+    except KeyError:
+        raise ValueError(f"unsupported term model: {model._meta.label}") from None
+
+
+def name_field(model):
+    return _fields(model)[0]
+
+
+def text_field(model):
+    return _fields(model)[1]
+
+
+def term_name(term):
+    return getattr(term, name_field(term.__class__))
+
+
+def term_text(term):
+    return getattr(term, text_field(term.__class__))
+
+
+def normalize(name):
+    """重複判定用の正規化（前後空白除去＋小文字化）"""
+    return (name or "").strip().lower()
+
+
+def sample_distractors(pool_qs, correct_term, k, *, exclude_names=(), probes=None, scan_limit=1000, rng=random):
+    """
+    pool_qs から correct_term 以外の用語を最大 k 件ランダムに選ぶ。
+    名前を正規化して重複・空・正解と同名のものは除外する。
+    correct_term=None ならプールからの単純な無作為抽出になる。
+
+    1) pk の最小/最大をインデックスの両端から取得
+    2) 範囲内のランダムな pk をまとめて IN で引く（pk が密なら1クエリで揃う）
+    3) 足りなければ独立したランダムな起点ごとに pk >= pivot の1行を取る（欠番の多いプール用）
+    4) それでも足りない（重複だらけの小さいプール等）ときだけ scan_limit 行まで順に走査
+    どの段階でも1つの起点から連続した行をまとめて取らないので、隣り合う pk の用語ばかりにはならない。
+    """
+    if k <= 0:
+        return []
+    model = pool_qs.model
+    n_field = name_field(model)
+    cols = ["pk", n_field, text_field(model)]
+
+    # MIN/MAX を 1 クエリにまとめると SQLite ではフルスキャンになるので別々に取る
+    pks = pool_qs.values_list("pk", flat=True)
+    lo = pks.order_by("pk").first()
+    hi = pks.order_by("-pk").first()
+    if lo is None:
+        return []
+
+    base = pool_qs.only(*cols).order_by("pk")
+    seen = set()
+    if correct_term is not None:
+        base = base.exclude(pk=correct_term.pk)
+        seen.add(normalize(term_name(correct_term)))
+    seen.update(normalize(n) for n in exclude_names)
+    tried, res = set(), []
+
+    def take(rows):
+        for t in rows:
+            if t.pk in tried:
+                continue
+            tried.add(t.pk)
+            name = normalize(getattr(t, n_field))
+            if not name or name in seen:
+                continue
+            seen.add(name)
+            res.append(t)
+            if len(res) >= k:
+                return True
+        return False
+
+    span = hi - lo + 1
+    for _ in range(ID_ROUNDS):
+        ids = {rng.randint(lo, hi) for _ in range(min(span, 4 * (k - len(res))))} - tried
+        rows = list(base.filter(pk__in=ids))
+        rng.shuffle(rows)
+        if take(rows):
+            return res
+
+    probes = probes if probes is not None else 2 * k + 2
+    for _ in range(probes):
+        pivot = rng.randint(lo, hi)
+        row = base.filter(pk__gte=pivot).first() or base.filter(pk__lt=pivot).last()
+        if row is None:
+            break
+        if take([row]):
+            return res
+
+    # フェールセーフ: 有効な候補が少ないプールだけ、上限つきで順に走査する
+    if scan_limit:
+        take(base.exclude(pk__in=tried)[:scan_limit].iterator(chunk_size=200))
+    return res[:k]
+
+
+def pick_from(candidates, correct_term, k, *, exclude_names=(), rng=random):
+    """
+    読み込み済みの候補リストから、sample_distractors と同じ規則で最大 k 件選ぶ。
+    一括生成で候補プールを使い回すとき用（クエリは発行しない）。
+    候補全体をコピー・シャッフルせず、添字を random.sample で必要な分だけ引く（1問あたり O(k)）。
+    重複名ばかりで足りないときだけ、残りを順に見る。
+    """
+    seen = {normalize(term_name(correct_term))}
+    seen.update(normalize(n) for n in exclude_names)
+    res = []
+
+    def take(indexes):
+        for i in indexes:
+            t = candidates[i]
+            if t.pk == correct_term.pk:
+                continue
+            name = normalize(term_name(t))
+            if not name or name in seen:
+                continue
+            seen.add(name)
+            res.append(t)
+            if len(res) >= k:
+                return True
+        return False
+
+    n = len(candidates)
+    drawn = rng.sample(range(n), min(n, 2 * k + 2))
+    if take(drawn) or len(drawn) == n:
+        return res
+    # フェールセーフ: ランダムな位置から一周する
+    drawn, start = set(drawn), rng.randrange(n)
+    take(i for i in chain(range(start, n), range(start)) if i not in drawn)
+    return res
@@ -0,0 +1,100 @@
+"""
+誤答抽選のベンチマーク。
+
+    python manage.py bench_distractors --sizes 10000 100000 1000000 --quizzes 50
+
+各サイズまで用語テーブルを合成データで埋めてからクイズを作成し、
+1問あたりの時間とクエリ数を表示する。データはすべてロールバックされる。
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from quizzes import distractors
+from quizzes.models import Quiz
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _legacy_pick(pool_qs, correct_term, k):
+    """旧実装（プール全件読み込み＋シャッフル）の比較用コピー"""
+    cand = [t for t in pool_qs if t.id != correct_term.id]
+    random.shuffle(cand)
+    seen, res = set(), []
+    c_name = distractors.normalize(distractors.term_name(correct_term))
+    for t in cand:
+        name = distractors.normalize(distractors.term_name(t))
+        if not name or name == c_name or name in seen:
+            continue
+        seen.add(name)
+        res.append(t)
+        if len(res) >= k:
+            break
+    return res
+
+
+class Command(BaseCommand):
+    help = "Quiz.make_from_term の誤答抽選を 10k/100k/1M 用語で計測する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000])
+        parser.add_argument("--quizzes", type=int, default=50, help="サイズごとに作るクイズ数")
+        parser.add_argument("--batch", type=int, default=5000, help="用語投入の bulk_create 件数")
+        parser.add_argument("--legacy", action="store_true", help="旧実装（全件読み込み）も計測する")
+
+    def handle(self, *args, **opts):
+        model = Quiz._meta.get_field("term").related_model
+        try:
+            with transaction.atomic():
+                for size in sorted(opts["sizes"]):
+                    self._fill(model, size, opts["batch"])
+                    self._run(model, size, opts["quizzes"], opts["legacy"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _fill(self, model, size, batch):
+        n_field = distractors.name_field(model)
+        t_field = distractors.text_field(model)
+        have = model.objects.count()
+        started = time.perf_counter()
+        while have < size:
+            n = min(batch, size - have)
+            model.objects.bulk_create([
+                model(**{n_field: f"bench-term-{have + i}", t_field: f"bench definition {have + i}"})
+                for i in range(n)
+            ])
+            have += n
+        self.stdout.write(f"[{size:>9,} terms] filled in {time.perf_counter() - started:.1f}s")
+
+    def _run(self, model, size, count, legacy):
+        lo = model.objects.order_by("pk").values_list("pk", flat=True).first()
+        hi = model.objects.order_by("-pk").values_list("pk", flat=True).first()
+        ids = [random.randint(lo, hi) for _ in range(count)]
+        terms = list(model.objects.filter(pk__in=ids))
+
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            for term in terms:
+                Quiz.make_from_term(term, question_type=random.choice(Quiz.QuestionType.values))
+            elapsed = time.perf_counter() - started
+        self._report(size, "sampled", elapsed, len(terms), len(ctx.captured_queries))
+
+        if legacy:
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                for term in terms:
+                    _legacy_pick(model.objects.all(), term, 3)
+                elapsed = time.perf_counter() - started
+            self._report(size, "legacy ", elapsed, len(terms), len(ctx.captured_queries))
+
+    def _report(self, size, label, elapsed, n, queries):
+        n = max(n, 1)
+        self.stdout.write(
+            f"[{size:>9,} terms] {label} {elapsed / n * 1000:8.2f} ms/quiz  {queries / n:5.1f} queries/quiz"
+        )
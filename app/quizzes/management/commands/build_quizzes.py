@@ -0,0 +1,65 @@
+"""
+クイズの事前生成。
+
+    python manage.py build_quizzes --vocabulary 3 5
+    python manage.py build_quizzes --terms 10 11 12 --types DT
+    python manage.py build_quizzes --all
+
+既にクイズがある (用語, 出題形式) はスキップするので何度実行してもよい。
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quizzes.models import Quiz
+from vocabularies.models import Vocabulary
+
+
+class Command(BaseCommand):
+    help = "用語集・用語IDを指定してクイズを一括作成する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vocabulary", nargs="+", type=int, default=[], help="用語集ID")
+        parser.add_argument("--terms", nargs="+", type=int, default=[], help="用語ID")
+        parser.add_argument("--all", action="store_true", help="全用語を対象にする")
+        parser.add_argument("--types", nargs="+", choices=Quiz.QuestionType.values, default=None)
+        parser.add_argument("--choices", type=int, default=4)
+        parser.add_argument("--chunk", type=int, default=1000, help="--all 時に1トランザクションで扱う用語数")
+
+    def handle(self, *args, **opts):
+        if not (opts["vocabulary"] or opts["terms"] or opts["all"]):
+            raise CommandError("--vocabulary / --terms / --all のいずれかを指定してください")
+        kwargs = {"question_types": opts["types"], "choices": opts["choices"]}
+        started = time.perf_counter()
+        total = 0
+
+        for vocab_id in opts["vocabulary"]:
+            vocab = Vocabulary.objects.filter(pk=vocab_id).first()
+            if vocab is None:
+                raise CommandError(f"vocabulary {vocab_id} not found")
+            created = Quiz.make_for_vocabulary(vocab, **kwargs)
+            total += len(created)
+            self.stdout.write(f"vocabulary {vocab_id}: {len(created)} quizzes")
+
+        if opts["terms"]:
+            created = Quiz.make_from_terms(opts["terms"], **kwargs)
+            total += len(created)
+            self.stdout.write(f"terms: {len(created)} quizzes")
+
+        if opts["all"]:
+            model = Quiz._meta.get_field("term").related_model
+            last = 0
+            while True:
+                ids = list(
+                    model.objects.filter(pk__gt=last).order_by("pk")
+                    .values_list("pk", flat=True)[:opts["chunk"]]
+                )
+                if not ids:
+                    break
+                last = ids[-1]
+                created = Quiz.make_from_terms(ids, **kwargs)
+                total += len(created)
+                self.stdout.write(f"terms <= {last}: {len(created)} quizzes")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"created {total} quizzes in {elapsed:.1f}s"))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0001_initial'),
+        ('terms', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='payload',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['term', 'question_type'], name='quizzes_qui_term_id_064a5c_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0002_quiz_payload'),
+        ('terms', '0002_fulltext_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ease', models.FloatField(default=2.5)),
+                ('interval_days', models.PositiveIntegerField(default=0)),
+                ('repetitions', models.PositiveIntegerField(default=0)),
+                ('lapses', models.PositiveIntegerField(default=0)),
+                ('due_at', models.DateTimeField()),
+                ('last_answered_at', models.DateTimeField()),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_states', to='terms.term')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'due_at'], name='quizzes_rev_user_id_8bdb78_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'term'), name='quizzes_reviewstate_user_term')],
+            },
+        ),
+    ]
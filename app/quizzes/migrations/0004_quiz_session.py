@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0003_review_state'),
+        ('terms', '0002_fulltext_index'),
+        ('vocabularies', '0003_order_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question_type', models.CharField(choices=[('DT', '定義→用語名'), ('TD', '用語名→定義')], default='DT', max_length=2)),
+                ('quiz_ids', models.JSONField(default=list)),
+                ('answers', models.PositiveSmallIntegerField(default=0)),
+                ('corrects', models.PositiveSmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('tag', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='terms.tag')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_sessions', to=settings.AUTH_USER_MODEL)),
+                ('vocabulary', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='vocabularies.vocabulary')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at'], name='quizzes_qui_user_id_2cfbce_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# (term, question_type) を一意にする。既に重複しているクイズは最も古いものに寄せてから制約を付ける
+# （解答履歴と正誤は残したまま、選択した選択肢は残すクイズの同じ選択肢があればそれに付け替える）
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    Quiz = apps.get_model("quizzes", "Quiz")
+    QuizChoice = apps.get_model("quizzes", "QuizChoice")
+    QuizHistory = apps.get_model("quizzes", "QuizHistory")
+
+    dups = (
+        Quiz.objects.values("term_id", "question_type")
+        .annotate(n=Count("id"), keep=Min("id"))
+        .filter(n__gt=1)
+    )
+    for row in dups.iterator():
+        keep = row["keep"]
+        others = list(
+            Quiz.objects.filter(term_id=row["term_id"], question_type=row["question_type"])
+            .exclude(pk=keep).values_list("pk", flat=True)
+        )
+        choices = QuizChoice.objects.order_by("order", "pk")
+        kept = list(choices.filter(quiz_id=keep).values_list("pk", "text", "is_correct"))
+        correct = next((pk for pk, _, ok in kept if ok), None)
+        by_text = {(text, ok): pk for pk, text, ok in kept}
+        for quiz_id in others:
+            # 同じ文言・正誤の選択肢があればそれへ、正解は（同じ用語なので）残すクイズの正解へ。
+            # 誤答の文言は抽選で変わるので、一致しなければ NULL にする（別の誤答に付け替えると、
+            # 選んでいない答えを選んだことになる）。QuizHistory.is_correct はそのまま残る
+            for choice_id, text, ok in choices.filter(quiz_id=quiz_id).values_list("pk", "text", "is_correct"):
+                target = by_text.get((text, ok))
+                if target is None and ok:
+                    target = correct
+                QuizHistory.objects.filter(selected_choice_id=choice_id).update(selected_choice_id=target)
+        QuizHistory.objects.filter(quiz_id__in=others).update(quiz_id=keep)
+        Quiz.objects.filter(pk__in=others).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0004_quiz_session'),
+        ('terms', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='quiz',
+            constraint=models.UniqueConstraint(fields=('term', 'question_type'), name='quizzes_quiz_term_qtype'),
+        ),
+        migrations.RemoveIndex(
+            model_name='quiz',
+            name='quizzes_qui_term_id_064a5c_idx',
+        ),
+    ]
@@ -1,9 +1,12 @@
 
 # Create your models here.
+from collections import defaultdict
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
 import random
 
+from . import distractors
+
 class Quiz(models.Model):
     class QuestionType(models.TextChoices):
         DEF_TO_TERM = "DT", "定義→用語名"
@@ -13,56 +16,231 @@ class Quiz(models.Model):
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     question_type = models.CharField(max_length=2, choices=QuestionType.choices, default=QuestionType.DEF_TO_TERM)
     created_at = models.DateTimeField(auto_now_add=True)
+    # 出題用のシリアライズ済みデータ（問題文＋並び順どおりの選択肢）。選択肢や用語が変わったら None に戻す
+    payload = models.JSONField(null=True, blank=True, editable=False)
+
+    class Meta:
+        # 1つの (用語, 出題形式) に1問だけ。同時アクセスで重複して作られないようにする（get_or_make）
+        constraints = [
+            models.UniqueConstraint(fields=["term", "question_type"], name="quizzes_quiz_term_qtype"),
+        ]
 
     def __str__(self):
         return f"Quiz#{self.id} ({self.get_question_type_display()})"
 
-    # ---- AIなしの選択肢生成（ヘルパーをこの中に持たせる）----
+    # ---- 出題データ（play / play_json 用）----
     @staticmethod
-    def _pick_distractors(pool_qs, correct_term, k):
-        cand = [t for t in pool_qs if t.id != correct_term.id]
-        random.shuffle(cand)
-        seen, res = set(), []
-        c_name = (correct_term.term_name or "").strip().lower()
-        for t in cand:
-            name = (t.term_name or "").strip().lower()
-            if not name or name == c_name or name in seen:
-                continue
-            seen.add(name)
-            res.append(t)
-            if len(res) >= k:
-                break
-        return res[:k]
+    def _question_text(term, question_type):
+        if question_type == Quiz.QuestionType.DEF_TO_TERM:
+            return distractors.term_text(term)
+        return distractors.term_name(term)
+
+    def build_payload(self, choices):
+        """正解フラグは含めない（クライアントにそのまま返すため）"""
+        return {
+            "id": self.pk,
+            "term_id": self.term_id,
+            "question_type": self.question_type,
+            "question": self._question_text(self.term, self.question_type),
+            "choices": [
+                {"id": c.pk, "order": c.order, "text": c.text}
+                for c in sorted(choices, key=lambda c: c.order)
+            ],
+        }
+
+    def get_payload(self):
+        """payload を返す。無効化されていればその場で組み立て直して保存する"""
+        if self.payload is None:
+            self.payload = self.build_payload(self.choices.all())
+            Quiz.objects.filter(pk=self.pk).update(payload=self.payload)
+        return self.payload
+
+    @classmethod
+    def refresh_payloads(cls, quizzes, batch_size=500):
+        """選択肢を1クエリで読み、payload をまとめて保存する（bulk_create 直後用）"""
+        by_quiz = {q.pk: [] for q in quizzes}
+        for c in QuizChoice.objects.filter(quiz__in=quizzes).order_by("quiz_id", "order"):
+            by_quiz[c.quiz_id].append(c)
+        for q in quizzes:
+            q.payload = q.build_payload(by_quiz[q.pk])
+        cls.objects.bulk_update(quizzes, ["payload"], batch_size=batch_size)
+
+    # ---- AIなしの選択肢生成（抽選ロジックは distractors.py）----
+    @staticmethod
+    def _pick_distractors(pool_qs, correct_term, k, exclude_names=()):
+        return distractors.sample_distractors(pool_qs, correct_term, k, exclude_names=exclude_names)
+
+    @staticmethod
+    def _choice_text(term, question_type):
+        if question_type == Quiz.QuestionType.DEF_TO_TERM:
+            return distractors.term_name(term)
+        return (distractors.term_text(term) or "")[:255]
 
     @classmethod
     def make_from_term(cls, term, *, created_by=None, question_type="DT", choices=4):
         """用語1つから1問を作成（AI不使用）"""
         if choices < 2:
             raise ValueError("choices must be >= 2")
-        quiz = cls.objects.create(term=term, created_by=created_by, question_type=question_type)
+        with transaction.atomic():
+            # 先に Quiz を INSERT して一意制約の行ロックを取る（同じ問題を作ろうとした他のトランザクションは
+            # ここで待たされ、コミット後に IntegrityError になる）
+            quiz = cls.objects.create(term=term, created_by=created_by, question_type=question_type)
 
-        # 正解文字列 & プール
-        if question_type == cls.QuestionType.DEF_TO_TERM:
-            correct_text = term.term_name
-        else:
-            correct_text = (term.description or "")[:255]
+            # プール（terms.Term には用語帳の区別が無いので全体から）
+            distract_terms = cls._pick_distractors(term.__class__.objects.all(), term, k=choices - 1)
 
-        pool = term.__class__.objects.filter(term_book=term.term_book)
-        distract_terms = cls._pick_distractors(pool, term, k=choices - 1)
-        if len(distract_terms) < choices - 1:
-            # 全体から補充
-            extra = cls._pick_distractors(term.__class__.objects.all(), term, k=(choices - 1) - len(distract_terms))
-            distract_terms.extend(extra)
+            QuizChoice.objects.bulk_create(cls._build_choices(quiz, term, distract_terms))
+            # MySQL では bulk_create で選択肢の pk が返らないので読み直して payload を作る
+            cls.refresh_payloads([quiz])
+        return quiz
+
+    @classmethod
+    def get_or_make(cls, term, question_type="DT", *, created_by=None, choices=4):
+        """
+        (term, question_type) のクイズを返す。無ければ作る。
+
+        make_from_term は最初に Quiz を INSERT するので、同時に作ろうとした側は一意制約の行ロックで
+        待たされ、先のトランザクションのコミット後に IntegrityError になる。そのときは出来上がった方を返す。
+        """
+        quiz = cls.objects.filter(term=term, question_type=question_type).first()
+        if quiz is not None:
+            return quiz
+        try:
+            return cls.make_from_term(term, created_by=created_by, question_type=question_type, choices=choices)
+        except IntegrityError:
+            return cls.objects.get(term=term, question_type=question_type)
 
-        items = [QuizChoice(quiz=quiz, text=correct_text, is_correct=True, order=0)]
+    @classmethod
+    def _build_choices(cls, quiz, term, distract_terms):
+        """正解＋誤答の QuizChoice をシャッフル済みの順番で返す（保存はしない）"""
+        qtype = quiz.question_type
+        items = [QuizChoice(quiz=quiz, text=cls._choice_text(term, qtype), is_correct=True, order=0)]
         for i, t in enumerate(distract_terms, start=1):
-            text = t.term_name if question_type == cls.QuestionType.DEF_TO_TERM else (t.description or "")[:255]
-            items.append(QuizChoice(quiz=quiz, text=text, is_correct=False, order=i))
+            items.append(QuizChoice(quiz=quiz, text=cls._choice_text(t, qtype), is_correct=False, order=i))
         random.shuffle(items)
         for idx, ch in enumerate(items):
             ch.order = idx
-        QuizChoice.objects.bulk_create(items)
-        return quiz
+        return items
+
+    # ---- 一括生成（用語集まるごとの事前生成用）----
+    @staticmethod
+    def terms_for_vocabulary(vocabulary):
+        """
+        用語集に含まれる用語を Quiz.term 側のモデル（terms.Term）で返す。
+        vocabularies.Term.quiz_term で明示的に紐付いたものだけ。未作成の分は link_vocabulary_terms で作る。
+        """
+        from terms.models import Term
+        from vocabularies.models import VocabularyTerm
+
+        linked = VocabularyTerm.objects.filter(vocabulary=vocabulary, term__quiz_term__isnull=False)
+        return Term.objects.filter(pk__in=linked.values("term__quiz_term_id"))
+
+    @staticmethod
+    def link_vocabulary_terms(vocabulary):
+        """
+        用語集の用語のうち quiz_term が無いものに terms.Term を作って紐付ける。作った数を返す。
+        名前が同じでも既存の terms.Term には紐付けない（別の意味の用語かもしれないため）。
+        未紐付けの取得・作成（bulk_create）・紐付け（bulk_update）はそれぞれ1回で、件数によらない。
+        """
+        from terms.models import Term
+        from vocabularies.models import Term as VocabTerm
+
+        with transaction.atomic():
+            unlinked = list(
+                VocabTerm.objects.filter(vocabulary_entries__vocabulary=vocabulary, quiz_term__isnull=True)
+                .select_for_update().only("pk", "term_name", "description").distinct().order_by("pk")
+            )
+            if not unlinked:
+                return 0
+            last_pk = Term.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+            created = Term.objects.bulk_create(
+                [Term(term=vt.term_name, definition=vt.description) for vt in unlinked]
+            )
+            if created[0].pk is None:
+                # MySQL は bulk_create で pk が返らないので、今作った範囲を (用語名, 定義) で作成順に引き直す
+                rows = (
+                    Term.objects.filter(pk__gt=last_pk, term__in={vt.term_name for vt in unlinked})
+                    .order_by("pk").values_list("pk", "term", "definition")
+                )
+                ids = defaultdict(list)
+                for pk, name, definition in rows:
+                    ids[(name, definition)].append(pk)
+                for term in created:
+                    term.pk = ids[(term.term, term.definition)].pop(0)
+            for vt, term in zip(unlinked, created):
+                vt.quiz_term_id = term.pk
+            VocabTerm.objects.bulk_update(unlinked, ["quiz_term"])
+        return len(created)
+
+    @classmethod
+    def make_for_vocabulary(cls, vocabulary, **kwargs):
+        """用語集の全用語についてクイズを一括作成する"""
+        cls.link_vocabulary_terms(vocabulary)
+        return cls.make_from_terms(cls.terms_for_vocabulary(vocabulary), **kwargs)
+
+    @classmethod
+    def make_from_terms(cls, terms, *, created_by=None, question_types=None, choices=4,
+                        skip_existing=True, pool_size=64, batch_size=500):
+        """
+        複数の用語からクイズを一括作成する。
+        terms: Term の QuerySet / リスト / ID のリスト
+        question_types: 省略時は全種類（DT, TD）
+
+        用語数に関係なく、既存チェック・候補プール取得・Quiz と QuizChoice の
+        bulk_create を 1 トランザクションの中で数クエリで行う。
+        誤答はまず同じバッチ内の用語から、足りなければ全体から抽選したプールから選ぶ。
+        """
+        if choices < 2:
+            raise ValueError("choices must be >= 2")
+        question_types = list(question_types or cls.QuestionType.values)
+        model = cls._meta.get_field("term").related_model
+        cols = ["pk", distractors.name_field(model), distractors.text_field(model)]
+
+        if isinstance(terms, models.QuerySet):
+            terms = list(terms.only(*cols))
+        else:
+            terms = list(terms)
+            ids = [t for t in terms if not isinstance(t, models.Model)]
+            if ids:
+                loaded = model.objects.only(*cols).in_bulk(ids)
+                terms = [t for t in terms if isinstance(t, models.Model)] + list(loaded.values())
+        if not terms:
+            return []
+
+        with transaction.atomic():
+            existing = set()
+            if skip_existing:
+                existing = set(
+                    cls.objects.filter(term__in=terms, question_type__in=question_types)
+                    .values_list("term_id", "question_type")
+                )
+            todo = [(t, q) for t in terms for q in question_types if (t.pk, q) not in existing]
+            if not todo:
+                return []
+
+            pool = terms + distractors.sample_distractors(model.objects.all(), None, k=pool_size)
+
+            quizzes = cls.objects.bulk_create(
+                [cls(term=t, created_by=created_by, question_type=q) for t, q in todo],
+                batch_size=batch_size,
+            )
+            if quizzes[0].pk is None:
+                # MySQL は bulk_create で pk が返らないので (term, question_type) で引き直す
+                rows = (
+                    cls.objects.filter(term__in=terms, question_type__in=question_types)
+                    .order_by("pk").values_list("pk", "term_id", "question_type")
+                )
+                ids = {(term_id, qtype): pk for pk, term_id, qtype in rows}
+                for quiz in quizzes:
+                    quiz.pk = ids[(quiz.term_id, quiz.question_type)]
+
+            items = []
+            for quiz, (term, _) in zip(quizzes, todo):
+                picked = distractors.pick_from(pool, term, k=choices - 1)
+                items.extend(cls._build_choices(quiz, term, picked))
+            QuizChoice.objects.bulk_create(items, batch_size=batch_size * choices)
+            cls.refresh_payloads(quizzes, batch_size=batch_size)
+        return quizzes
 
 
 class QuizChoice(models.Model):
@@ -94,3 +272,49 @@ class QuizHistory(models.Model):
 
     def __str__(self):
         return f"{self.user_id}-{self.quiz_id}-{'OK' if self.is_correct else 'NG'}"
+
+
+class ReviewState(models.Model):
+    """
+    (ユーザー, 用語) ごとの復習スケジュール（SM-2 方式）。
+    回答のたびに quizzes.review で更新し、「次に出す問題」は (user, due_at) インデックスだけで引く。
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="review_states")
+    term = models.ForeignKey("terms.Term", on_delete=models.CASCADE, related_name="review_states")
+    ease = models.FloatField(default=2.5)
+    interval_days = models.PositiveIntegerField(default=0)
+    repetitions = models.PositiveIntegerField(default=0)
+    lapses = models.PositiveIntegerField(default=0)
+    due_at = models.DateTimeField()
+    last_answered_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "term"], name="quizzes_reviewstate_user_term"),
+        ]
+        indexes = [models.Index(fields=["user", "due_at"])]
+
+    def __str__(self):
+        return f"{self.user_id}-{self.term_id} due {self.due_at:%Y-%m-%d %H:%M}"
+
+
+class QuizSession(models.Model):
+    """
+    複数問をまとめて出題・一括回答するセッション（quizzes.sessions）。
+    出題したクイズの ID を quiz_ids に持ち、回答はこの中のクイズだけ受け付ける。
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="quiz_sessions")
+    vocabulary = models.ForeignKey("vocabularies.Vocabulary", on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    tag = models.ForeignKey("terms.Tag", on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    question_type = models.CharField(max_length=2, choices=Quiz.QuestionType.choices, default=Quiz.QuestionType.DEF_TO_TERM)
+    quiz_ids = models.JSONField(default=list)
+    answers = models.PositiveSmallIntegerField(default=0)
+    corrects = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "created_at"])]
+
+    def __str__(self):
+        return f"QuizSession#{self.id} ({self.corrects}/{len(self.quiz_ids)})"
@@ -0,0 +1,135 @@
+"""
+間隔反復（SM-2 方式）の復習スケジュール。
+
+- record / record_many: QuizHistory 書き込み時に ReviewState を更新（signals から呼ばれる）
+- due: 期限が来た復習を due_at 順に返す（(user, due_at) インデックスの範囲スキャンのみ）
+- rebuild: QuizHistory を古い順に再生して作り直す（rebuild_review_states コマンド）
+
+クイズは正誤の2値なので、正解を品質 4、不正解を品質 1 として SM-2 の式に当てはめる。
+不正解のときは間隔を 0 に戻し、RELEARN_DELAY 後に再出題する。
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import QuizHistory, ReviewState
+
+MIN_EASE = 1.3
+INITIAL_EASE = 2.5
+CORRECT_QUALITY = 4
+WRONG_QUALITY = 1
+RELEARN_DELAY = timedelta(minutes=10)
+
+
+def schedule(state, is_correct, answered_at):
+    """state（ReviewState、未保存でもよい）に1回分の回答を反映する"""
+    quality = CORRECT_QUALITY if is_correct else WRONG_QUALITY
+    state.ease = max(MIN_EASE, state.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if is_correct:
+        state.repetitions += 1
+        if state.repetitions == 1:
+            state.interval_days = 1
+        elif state.repetitions == 2:
+            state.interval_days = 6
+        else:
+            state.interval_days = max(1, round(state.interval_days * state.ease))
+        state.due_at = answered_at + timedelta(days=state.interval_days)
+    else:
+        state.repetitions = 0
+        state.interval_days = 0
+        state.lapses += 1
+        state.due_at = answered_at + RELEARN_DELAY
+    state.last_answered_at = answered_at
+    return state
+
+
+def _new_state(user_id, term_id):
+    return ReviewState(user_id=user_id, term_id=term_id, ease=INITIAL_EASE,
+                       interval_days=0, repetitions=0, lapses=0)
+
+
+def _term_id(history):
+    return history.quiz.term_id
+
+
+def record(history):
+    """回答1件ぶんを反映（(user, term) の行をロックして読み書き）"""
+    user_id, term_id = history.user_id, _term_id(history)
+    with transaction.atomic():
+        state = ReviewState.objects.select_for_update().filter(user_id=user_id, term_id=term_id).first()
+        if state is not None:
+            schedule(state, history.is_correct, history.answered_at).save()
+            return state
+        state = schedule(_new_state(user_id, term_id), history.is_correct, history.answered_at)
+        try:
+            with transaction.atomic():
+                state.save()
+            return state
+        except IntegrityError:
+            # 同時に別リクエストが作成した → 作られた行に反映し直す
+            state = ReviewState.objects.select_for_update().get(user_id=user_id, term_id=term_id)
+            schedule(state, history.is_correct, history.answered_at).save()
+            return state
+
+
+def record_many(histories):
+    """bulk_create した回答をまとめて反映（状態の読み込み1回＋bulk_update/bulk_create）"""
+    histories = sorted(histories, key=lambda h: h.answered_at)
+    if not histories:
+        return
+    keys = {(h.user_id, _term_id(h)) for h in histories}
+    user_ids = {u for u, _ in keys}
+    term_ids = {t for _, t in keys}
+
+    with transaction.atomic():
+        states = {
+            (s.user_id, s.term_id): s
+            for s in ReviewState.objects.select_for_update().filter(user_id__in=user_ids, term_id__in=term_ids)
+            if (s.user_id, s.term_id) in keys
+        }
+        existing = set(states)
+        for h in histories:
+            key = (h.user_id, _term_id(h))
+            state = states.get(key) or states.setdefault(key, _new_state(*key))
+            schedule(state, h.is_correct, h.answered_at)
+
+        fields = ["ease", "interval_days", "repetitions", "lapses", "due_at", "last_answered_at"]
+        ReviewState.objects.bulk_update([states[k] for k in existing], fields)
+        ReviewState.objects.bulk_create(
+            [s for k, s in states.items() if k not in existing],
+            update_conflicts=True, unique_fields=["user", "term"], update_fields=fields,
+        )
+
+
+def due(user, limit=20, now=None):
+    """期限が来た ReviewState を due_at の古い順に最大 limit 件（用語を JOIN 済み）"""
+    now = now or timezone.now()
+    return (
+        ReviewState.objects
+        .filter(user=user, due_at__lte=now)
+        .select_related("term")
+        .order_by("due_at")[:limit]
+    )
+
+
+def rebuild(user=None, batch_size=2000):
+    """QuizHistory を古い順に再生して ReviewState を作り直す。作成件数を返す"""
+    histories = QuizHistory.objects.select_related("quiz").only(
+        "user_id", "is_correct", "answered_at", "quiz__term_id",
+    )
+    states = ReviewState.objects.all()
+    if user is not None:
+        histories = histories.filter(user=user)
+        states = states.filter(user=user)
+
+    rebuilt = {}
+    for h in histories.order_by("answered_at", "id").iterator(chunk_size=batch_size):
+        key = (h.user_id, _term_id(h))
+        state = rebuilt.get(key) or rebuilt.setdefault(key, _new_state(*key))
+        schedule(state, h.is_correct, h.answered_at)
+
+    with transaction.atomic():
+        states.delete()
+        ReviewState.objects.bulk_create(rebuilt.values(), batch_size=batch_size)
+    return len(rebuilt)
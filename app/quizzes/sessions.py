@@ -0,0 +1,131 @@
+"""
+複数問のクイズセッション（まとめて出題・まとめて回答）。
+
+- start: 用語集 / タグ / 復習キューから N 問を選び、事前シリアライズ済みの payload をまとめて返す
+- submit: 全回答を1回の POST で受け取り、QuizHistory を1回の bulk_create で書く。
+  集計（DailyStat）と復習スケジュール（ReviewState）は answers_recorded シグナルで1回ずつ更新する
+
+1問ずつ play を往復する場合に比べ、リクエスト数と INSERT 数が問題数ぶん減る。
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import distractors, review
+from .models import Quiz, QuizChoice, QuizHistory, QuizSession
+from .signals import answers_recorded
+
+MAX_QUESTIONS = 50
+
+
+class SessionError(Exception):
+    """回答内容が不正（セッション外のクイズ・選択肢など）"""
+
+
+class AlreadySubmitted(SessionError):
+    """回答済みのセッションに再送された"""
+
+
+def _pick_terms(terms_qs, count):
+    # 用語数に依存しないランダム抽出（誤答の抽選と同じ方法）
+    return distractors.sample_distractors(terms_qs, None, count)
+
+
+def _quizzes_for(terms, question_type, user):
+    """terms それぞれの question_type のクイズを、無ければまとめて作って返す（terms の順）"""
+    try:
+        Quiz.make_from_terms(terms, created_by=user, question_types=[question_type], skip_existing=True)
+    except IntegrityError:
+        # 同じ用語のクイズを別リクエストが同時に作った → 作られた分を飛ばしてやり直す
+        Quiz.make_from_terms(terms, created_by=user, question_types=[question_type], skip_existing=True)
+    by_term = {}
+    for quiz in Quiz.objects.filter(term__in=terms, question_type=question_type).select_related("term").order_by("pk"):
+        by_term.setdefault(quiz.term_id, quiz)
+    return [by_term[t.pk] for t in terms if t.pk in by_term]
+
+
+def start(user, *, terms_qs=None, vocabulary=None, tag=None, question_type=Quiz.QuestionType.DEF_TO_TERM,
+          count=20, due_only=False):
+    """
+    セッションを作り、(session, [payload, ...]) を返す。
+    terms_qs: 出題元の用語 QS（Quiz.term 側のモデル）。due_only なら復習期限の来た用語を優先する。
+    出題できる用語が1つも無ければ SessionError（セッションは作らない）。
+    """
+    count = max(1, min(count, MAX_QUESTIONS))
+    if due_only:
+        terms = [s.term for s in review.due(user, limit=count)]
+    else:
+        terms = _pick_terms(terms_qs, count)
+
+    quizzes = _quizzes_for(terms, question_type, user)
+    if not quizzes:
+        raise SessionError("no questions to ask")
+    session = QuizSession.objects.create(
+        user=user, vocabulary=vocabulary, tag=tag, question_type=question_type,
+        quiz_ids=[q.pk for q in quizzes],
+    )
+    return session, [q.get_payload() for q in quizzes]
+
+
+def submit(session, answers):
+    """
+    answers: [(quiz_id, choice_id), ...]。1問1回まで、未回答のクイズがあってもよい。
+    結果の dict を返す。不正な回答は SessionError、回答済みのセッションは AlreadySubmitted。
+    """
+    allowed = set(session.quiz_ids)
+    picked = {}
+    for quiz_id, choice_id in answers:
+        if quiz_id not in allowed:
+            raise SessionError(f"quiz {quiz_id} is not in this session")
+        if quiz_id in picked:
+            raise SessionError(f"quiz {quiz_id} answered twice")
+        picked[quiz_id] = choice_id
+
+    # 選んだ選択肢と各問の正解を1クエリで
+    choices, correct_ids = {}, {}
+    rows = (
+        QuizChoice.objects.filter(quiz_id__in=picked)
+        .filter(Q(pk__in=picked.values()) | Q(is_correct=True))
+        .only("id", "quiz_id", "is_correct")
+    )
+    for c in rows:
+        choices[c.pk] = c
+        if c.is_correct:
+            correct_ids[c.quiz_id] = c.pk
+    quizzes = Quiz.objects.filter(pk__in=picked).only("id", "term_id", "question_type").in_bulk()
+
+    now = timezone.now()
+    histories, results = [], []
+    for quiz_id, choice_id in picked.items():
+        choice = choices.get(choice_id)
+        if choice is None or choice.quiz_id != quiz_id:
+            raise SessionError(f"choice {choice_id} does not belong to quiz {quiz_id}")
+        h = QuizHistory(user_id=session.user_id, quiz_id=quiz_id, selected_choice_id=choice_id,
+                        is_correct=choice.is_correct, answered_at=now)
+        # 集計・復習の更新で quiz を引き直さないように
+        h.quiz = quizzes[quiz_id]
+        histories.append(h)
+        results.append({
+            "quiz_id": quiz_id, "choice_id": choice_id,
+            "is_correct": choice.is_correct, "correct_choice_id": correct_ids.get(quiz_id),
+        })
+
+    corrects = sum(1 for h in histories if h.is_correct)
+    with transaction.atomic():
+        # 二重送信は completed_at の条件付き UPDATE で弾く
+        done = QuizSession.objects.filter(pk=session.pk, completed_at__isnull=True).update(
+            completed_at=now, answers=len(histories), corrects=corrects,
+        )
+        if not done:
+            raise AlreadySubmitted("session already submitted")
+        QuizHistory.objects.bulk_create(histories)
+        answers_recorded.send(sender=QuizHistory, histories=histories)
+
+    session.completed_at, session.answers, session.corrects = now, len(histories), corrects
+    return {
+        "session_id": session.pk,
+        "answers": len(histories),
+        "corrects": corrects,
+        "questions": len(session.quiz_ids),
+        "results": results,
+    }
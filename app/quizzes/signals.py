@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+
+from . import review
+from .models import Quiz, QuizChoice, QuizHistory
+
+# QuizHistory を bulk_create したとき（post_save が飛ばない）に送る。引数 histories
+answers_recorded = Signal()
+
+
+def invalidate_choice_payload(sender, instance, **kwargs):
+    Quiz.objects.filter(pk=instance.quiz_id).update(payload=None)
+
+
+def invalidate_term_payload(sender, instance, **kwargs):
+    # 問題文は用語から作るので、用語の編集でも作り直す
+    Quiz.objects.filter(term=instance).update(payload=None)
+
+
+def update_review_state(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        review.record(instance)
+
+
+def update_review_states(sender, histories, **kwargs):
+    review.record_many(histories)
+
+
+def connect():
+    post_save.connect(invalidate_choice_payload, sender=QuizChoice, dispatch_uid="quizzes-choice-save")
+    post_delete.connect(invalidate_choice_payload, sender=QuizChoice, dispatch_uid="quizzes-choice-delete")
+    term_model = Quiz._meta.get_field("term").related_model
+    post_save.connect(invalidate_term_payload, sender=term_model, dispatch_uid="quizzes-term-save")
+    post_save.connect(update_review_state, sender=QuizHistory, dispatch_uid="quizzes-history-review")
+    answers_recorded.connect(update_review_states, dispatch_uid="quizzes-answers-review")
@@ -1,3 +1,324 @@
+import random
+import time
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from django.core import signing
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.http import HttpResponse
 from django.test import TestCase
+from django.utils import timezone
+
+from dashboard.models import DailyStat
+from terms.models import Tag, Term
+from vocabularies.models import Term as VocabTerm, Vocabulary, VocabularyTerm
+from . import distractors, review, sessions
+from .models import Quiz, QuizHistory, QuizSession, ReviewState
+from .views import _load_result, _sign_result
+
+
+class SampleDistractorsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Term.objects.bulk_create([Term(term=f"term-{i}", definition=f"definition {i}") for i in range(200)])
+        cls.correct = Term.objects.order_by("pk")[100]
+
+    def test_excludes_correct_and_duplicates(self):
+        picked = distractors.sample_distractors(Term.objects.all(), self.correct, 3, rng=random.Random(1))
+        names = [t.term for t in picked]
+        self.assertEqual(len(names), 3)
+        self.assertEqual(len(set(names)), 3)
+        self.assertNotIn(self.correct.term, names)
+
+    def test_not_pk_neighbours(self):
+        # 1つの起点から連続した行を取っていたときは、ほぼ毎回 pk が連番になっていた
+        rng = random.Random(2)
+        consecutive = 0
+        for _ in range(50):
+            pks = sorted(t.pk for t in distractors.sample_distractors(Term.objects.all(), self.correct, 3, rng=rng))
+            consecutive += pks[-1] - pks[0] == len(pks) - 1
+        self.assertLess(consecutive, 5)
+
+    def test_small_pool_falls_back_to_scan(self):
+        pool = Term.objects.filter(pk__in=Term.objects.order_by("pk").values_list("pk", flat=True)[:3])
+        picked = distractors.sample_distractors(pool, None, 5, rng=random.Random(3))
+        self.assertEqual(len(picked), 3)
+
+    def test_unsupported_model(self):
+        with self.assertRaises(ValueError):
+            distractors.name_field(Term.tags.through)
+
+    def test_pick_from_pool(self):
+        pool = list(Term.objects.all())
+        with mock.patch.object(random.Random, "shuffle") as shuffle:
+            picked = distractors.pick_from(pool, self.correct, 3, rng=random.Random(4))
+        shuffle.assert_not_called()
+        names = {t.term for t in picked}
+        self.assertEqual(len(names), 3)
+        self.assertNotIn(self.correct.term, names)
+
+    def test_pick_from_duplicate_names(self):
+        same = [Term(pk=-i, term="same", definition="d") for i in range(1, 30)]
+        other = Term(pk=-100, term="other", definition="d")
+        picked = distractors.pick_from([*same, other, self.correct], self.correct, 3, rng=random.Random(5))
+        self.assertEqual(sorted(t.term for t in picked), ["other", "same"])
+
+
+class VocabularyTermsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("owner", password="pw")
+        self.vocabulary = Vocabulary.objects.create(user=self.user, title="network")
+
+    def _add(self, name, quiz_term=None):
+        vt = VocabTerm.objects.create(user=self.user, term_name=name, description=f"{name} desc", quiz_term=quiz_term)
+        VocabularyTerm.objects.create(user=self.user, vocabulary=self.vocabulary, term=vt)
+        return vt
+
+    def test_only_linked_terms(self):
+        linked = Term.objects.create(term="TCP", definition="transport")
+        Term.objects.create(term="TCP", definition="same name, unrelated")
+        self._add("TCP", quiz_term=linked)
+        self._add("UDP")
+        self.assertEqual(list(Quiz.terms_for_vocabulary(self.vocabulary)), [linked])
+
+    def test_make_for_vocabulary_links_missing_terms(self):
+        vt = self._add("UDP")
+        Term.objects.create(term="UDP", definition="unrelated")
+        Quiz.make_for_vocabulary(self.vocabulary, question_types=["DT"], choices=2)
+        vt.refresh_from_db()
+        self.assertEqual(vt.quiz_term.definition, "UDP desc")
+        self.assertEqual(list(Quiz.objects.values_list("term_id", flat=True)), [vt.quiz_term_id])
+
+    def test_link_is_batched(self):
+        entries = [self._add(f"term {i}") for i in range(20)]
+        with self.assertNumQueries(6):  # savepoint・未紐付けの取得・最大 pk・INSERT・UPDATE・release
+            self.assertEqual(Quiz.link_vocabulary_terms(self.vocabulary), 20)
+        for vt in entries:
+            vt.refresh_from_db()
+            self.assertEqual(vt.quiz_term.definition, vt.description)
+        self.assertEqual(Quiz.link_vocabulary_terms(self.vocabulary), 0)
+
+    def test_link_without_returned_pks(self):
+        # MySQL の bulk_create は pk を返さない
+        entries = [self._add(name) for name in ("TCP", "TCP", "UDP")]
+        Term.objects.create(term="TCP", definition="TCP desc")
+        bulk_create = type(Term.objects).bulk_create
+
+        def without_pks(manager, objs, *args, **kwargs):
+            created = bulk_create(manager, objs, *args, **kwargs)
+            for obj in created:
+                obj.pk = None
+            return created
+
+        with mock.patch.object(type(Term.objects), "bulk_create", autospec=True, side_effect=without_pks):
+            Quiz.link_vocabulary_terms(self.vocabulary)
+        ids = [VocabTerm.objects.get(pk=vt.pk).quiz_term_id for vt in entries]
+        self.assertEqual(len(set(ids)), 3)
+        self.assertEqual(Term.objects.filter(pk__in=ids).count(), 3)
+
+
+class ReviewRecordManyTests(TestCase):
+    FIELDS = ("term_id", "ease", "interval_days", "repetitions", "lapses", "due_at", "last_answered_at")
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("learner", password="pw")
+        self.quizzes = [
+            Quiz.objects.create(term=Term.objects.create(term=name, definition=f"{name} definition"))
+            for name in ("TCP", "UDP")
+        ]
+
+    def _states(self):
+        return list(ReviewState.objects.filter(user=self.user).order_by("term_id").values_list(*self.FIELDS))
+
+    def test_matches_replaying_history(self):
+        start = timezone.now() - timedelta(days=30)
+        answers = [(0, True), (1, False), (0, True), (0, False), (1, True), (0, True)]
+        histories = QuizHistory.objects.bulk_create([
+            QuizHistory(user=self.user, quiz=self.quizzes[q], is_correct=ok) for q, ok in answers
+        ])
+        # answered_at は auto_now_add なので、順番がはっきりするよう後から散らす
+        for i, h in enumerate(histories):
+            h.answered_at = start + timedelta(days=i)
+        QuizHistory.objects.bulk_update(histories, ["answered_at"])
+
+        # 2回に分けて反映しても、1回で反映しても、履歴の再生（rebuild）と同じ状態になる
+        review.record_many(list(reversed(histories[:3])))
+        review.record_many(histories[3:])
+        batched = self._states()
+        review.rebuild(user=self.user)
+        self.assertEqual(batched, self._states())
+
+        state = ReviewState.objects.get(user=self.user, term=self.quizzes[0].term)
+        self.assertEqual((state.repetitions, state.lapses, state.interval_days), (1, 1, 1))
+
+
+class GetOrMakeTests(TestCase):
+    def setUp(self):
+        for name in ("TCP", "UDP", "IP", "ARP"):
+            Term.objects.create(term=name, definition=f"{name} definition")
+        self.term = Term.objects.get(term="TCP")
+
+    def test_creates_once(self):
+        quiz = Quiz.get_or_make(self.term, "DT")
+        self.assertEqual(Quiz.get_or_make(self.term, "DT"), quiz)
+        self.assertEqual(quiz.choices.count(), 4)
+        self.assertEqual(Quiz.objects.count(), 1)
+
+    def test_lost_race_returns_winner(self):
+        # 同時に作った別のリクエストが先にコミットした → こちらの INSERT は一意制約で失敗する
+        winner = Quiz.make_from_term(self.term, question_type="DT")
+        not_yet = mock.Mock(**{"first.return_value": None})
+        with mock.patch.object(Quiz.objects, "filter", return_value=not_yet), \
+                mock.patch.object(Quiz, "make_from_term", side_effect=IntegrityError):
+            self.assertEqual(Quiz.get_or_make(self.term, "DT"), winner)
+
+
+class PayloadTests(TestCase):
+    def setUp(self):
+        for name in ("TCP", "UDP", "IP"):
+            Term.objects.create(term=name, definition=f"{name} definition")
+        self.term = Term.objects.get(term="TCP")
+        self.quiz = Quiz.make_from_term(self.term, question_type="DT", choices=3)
+
+    def test_stored_on_create_without_answers(self):
+        self.quiz.refresh_from_db()
+        payload = self.quiz.payload
+        self.assertEqual(payload["question"], "TCP definition")
+        self.assertEqual([c["order"] for c in payload["choices"]], [0, 1, 2])
+        self.assertNotIn("is_correct", payload["choices"][0])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.quiz.get_payload(), payload)
+
+    def test_invalidated_by_term_and_choice_edits(self):
+        self.term.definition = "Transmission Control Protocol"
+        self.term.save()
+        self.quiz.refresh_from_db()
+        self.assertIsNone(self.quiz.payload)
+        self.assertEqual(self.quiz.get_payload()["question"], "Transmission Control Protocol")
+
+        choice = self.quiz.choices.filter(is_correct=False).first()
+        choice.text = "renamed"
+        choice.save()
+        self.quiz.refresh_from_db()
+        self.assertIn("renamed", [c["text"] for c in self.quiz.get_payload()["choices"]])
+
+
+class SessionTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("learner", password="pw")
+        self.client.force_login(self.user)
+        self.tag = Tag.objects.create(name="net")
+        for name in ("TCP", "UDP", "IP", "ARP", "DNS"):
+            Term.objects.create(term=name, definition=f"{name} definition").tags.add(self.tag)
+
+    def _start(self, count=3):
+        response = self.client.post("/quizzes/sessions/", {"tag": self.tag.pk, "count": count})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _submit(self, session_id, answers):
+        return self.client.post(
+            f"/quizzes/sessions/{session_id}/answers/",
+            {"answers": [{"quiz_id": q, "choice_id": c} for q, c in answers]},
+            content_type="application/json",
+        )
+
+    def test_submit_records_all_answers_once(self):
+        data = self._start()
+        self.assertEqual(len(data["questions"]), 3)
+        answers = [(q["id"], q["choices"][0]["id"]) for q in data["questions"]]
+        result = self._submit(data["session_id"], answers).json()
+        self.assertEqual(result["answers"], 3)
+
+        corrects = QuizHistory.objects.filter(user=self.user, is_correct=True).count()
+        self.assertEqual(QuizHistory.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(result["corrects"], corrects)
+        self.assertEqual(list(DailyStat.objects.filter(user=self.user).values_list("answers", "corrects")),
+                         [(3, corrects)])
+        self.assertEqual(ReviewState.objects.filter(user=self.user).count(), 3)
+
+        self.assertEqual(self._submit(data["session_id"], answers).status_code, 409)
+        self.assertEqual(QuizHistory.objects.filter(user=self.user).count(), 3)
+
+    def test_rejects_answers_outside_the_session(self):
+        data = self._start(count=2)
+        first, second = data["questions"]
+        response = self._submit(data["session_id"], [(first["id"], second["choices"][0]["id"])])
+        self.assertEqual(response.status_code, 400)
+        with self.assertRaises(sessions.SessionError):
+            sessions.submit(QuizSession.objects.get(), [(0, 0)])
+        self.assertFalse(QuizHistory.objects.exists())
+
+    def test_unlinked_vocabulary_is_linked_first(self):
+        vocabulary = Vocabulary.objects.create(user=self.user, title="network")
+        for name in ("HTTP", "SMTP", "FTP"):
+            vt = VocabTerm.objects.create(user=self.user, term_name=name, description=f"{name} desc")
+            VocabularyTerm.objects.create(user=self.user, vocabulary=vocabulary, term=vt)
+        response = self.client.post("/quizzes/sessions/", {"vocabulary": vocabulary.pk, "count": 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["questions"]), 3)
+        self.assertFalse(VocabTerm.objects.filter(quiz_term__isnull=True).exists())
+
+    def test_no_questions(self):
+        empty = Vocabulary.objects.create(user=self.user, title="empty")
+        response = self.client.post("/quizzes/sessions/", {"vocabulary": empty.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(QuizSession.objects.exists())
+
+
+class PlayResultTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("learner", password="pw")
+        self.client.force_login(self.user)
+        for name in ("TCP", "UDP", "IP", "ARP"):
+            Term.objects.create(term=name, definition=f"{name} definition")
+        self.term = Term.objects.get(term="TCP")
+        self.quiz = Quiz.get_or_make(self.term, "DT")
+        self.url = f"/quizzes/play/{self.term.pk}/DT/"
+
+    def _choice(self, correct):
+        return self.quiz.choices.filter(is_correct=correct).first()
+
+    def _get(self, token):
+        # play.html はフロント側の担当なので、ビューが渡す context だけを見る
+        with mock.patch("quizzes.views.render", return_value=HttpResponse()) as render:
+            self.client.get(self.url, {"r": token})
+        return render.call_args.args[2]["last"]
+
+    def test_form_answer_round_trips_through_signed_redirect(self):
+        session_before = dict(self.client.session)
+        response = self.client.post(self.url, {"choice_id": self._choice(True).pk})
+        self.assertEqual(response.status_code, 302)
+        token = parse_qs(urlparse(response["Location"]).query)["r"][0]
+        self.assertFalse(response.wsgi_request.session.modified)
+        self.assertEqual(dict(self.client.session), session_before)
+        self.assertEqual(self._get(token), "correct")
+        self.assertEqual(QuizHistory.objects.get().is_correct, True)
+
+    def test_tampered_foreign_and_expired_tokens(self):
+        token = _sign_result(self.quiz, "wrong")
+        self.assertEqual(_load_result(self.quiz, token), "wrong")
+        tampered = token[:-1] + ("A" if token[-1] != "A" else "B")
+        self.assertIsNone(self._get(tampered))
+        forged = signing.dumps({"q": self.quiz.pk, "r": "correct"}, salt="another", compress=True)
+        self.assertIsNone(_load_result(self.quiz, forged))
+        other = Quiz.get_or_make(Term.objects.get(term="UDP"), "DT")
+        self.assertIsNone(_load_result(other, token))
+        later = time.time() + settings.QUIZ_RESULT_MAX_AGE + 1
+        with mock.patch("django.core.signing.time.time", return_value=later):
+            self.assertIsNone(_load_result(self.quiz, token))
+        self.assertIsNone(self._get(""))
 
-# Create your tests here.
+    def test_json_answer(self):
+        choice = self._choice(False)
+        response = self.client.post(f"{self.url}?format=json", {"choice_id": choice.pk})
+        self.assertEqual(response.json(), {
+            "result": "wrong", "quiz_id": self.quiz.pk, "choice_id": choice.pk, "is_correct": False,
+        })
+        self.assertFalse(response.wsgi_request.session.modified)
+        response = self.client.post(self.url, {"choice_id": "x"}, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["result"], "invalid")
@@ -10,4 +10,8 @@ app_name = "quizzes"
 urlpatterns = [
     path("play/<int:term_id>/<str:qtype>/", views.play, name="play"),  # qtype: DT or TD
     path("play/<int:term_id>/", views.play, {"qtype": "DT"}, name="play_default"),
+    path("play/<int:term_id>/<str:qtype>/json/", views.play_json, name="play_json"),
+    path("review/due/", views.review_due, name="review_due"),  # ?limit=20&qtype=DT
+    path("sessions/", views.session_start, name="session_start"),  # POST vocabulary|tag|source=review, count, qtype
+    path("sessions/<int:session_id>/answers/", views.session_submit, name="session_submit"),
 ]
@@ -1,15 +1,72 @@
 # quizzes/views.py
+import json
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_http_methods
-from .models import Quiz, QuizChoice, QuizHistory
-from terms.models import Term
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_http_methods
+from . import distractors, review, sessions
+from .models import Quiz, QuizChoice, QuizHistory, QuizSession
+from terms import hierarchy as term_hierarchy
+from terms.models import Tag, Term
+from vocabularies.models import Vocabulary
 
 def dummy_quizzes_view(request):
     
     return render(request, 'quizzes/index.html')
 
 
+def _get_or_make_quiz(term, qtype, user):
+    # クイズを取得、無ければ作成（同時アクセスでも1問だけ作る）
+    return Quiz.get_or_make(term, qtype, created_by=user, choices=4)
+
+
+RESULT_SALT = "quizzes.play.result"
+RESULTS = ("correct", "wrong", "invalid")
+
+
+def _wants_json(request):
+    return request.GET.get("format") == "json" or "application/json" in request.headers.get("Accept", "")
+
+
+def _sign_result(quiz, result):
+    return signing.dumps({"q": quiz.pk, "r": result}, salt=RESULT_SALT, compress=True)
+
+
+def _load_result(quiz, token):
+    """署名付きトークンから結果を戻す。別のクイズ用・期限切れ・改ざんは None"""
+    if not token:
+        return None
+    try:
+        data = signing.loads(token, salt=RESULT_SALT, max_age=settings.QUIZ_RESULT_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    if data.get("q") != quiz.pk or data.get("r") not in RESULTS:
+        return None
+    return data["r"]
+
+
+def _answer_response(request, quiz, term, qtype, result, choice=None):
+    """
+    回答結果を返す。セッションには書かない。
+    JSON（?format=json / Accept: application/json）ならそのまま、
+    フォーム送信なら結果を署名して ?r= に載せてリダイレクトする（PRG）。
+    """
+    if _wants_json(request):
+        data = {"result": result, "quiz_id": quiz.pk}
+        if choice is not None:
+            data["choice_id"] = choice.pk
+            data["is_correct"] = choice.is_correct
+        return JsonResponse(data, status=400 if result == "invalid" else 200)
+    url = reverse("quizzes:play", kwargs={"term_id": term.id, "qtype": qtype})
+    return redirect(f"{url}?{urlencode({'r': _sign_result(quiz, result)})}")
+
+
 @login_required
 @require_http_methods(["GET", "POST"])
 def play(request, term_id, qtype="DT"):
@@ -19,50 +76,14 @@ def play(request, term_id, qtype="DT"):
     """
     term = get_object_or_404(Term, id=term_id)
 
-    # クイズを取得、無ければ作成
-    quiz = term.quizzes.filter(question_type=qtype).first()
-    if not quiz:
-        if hasattr(Quiz, "make_from_term"):
-            quiz = Quiz.make_from_term(
-                term, created_by=request.user, question_type=qtype, choices=4
-            )
-        else:
-            # フェールセーフ: make_from_termが未実装の場合、簡易生成
-            quiz = Quiz.objects.create(
-                term=term,
-                question_type=qtype,
-                question_text=term.word,
-                created_by=request.user
-            )
-            # 誤選択肢を同じ用語帳から取得
-            distractors = list(
-                Term.objects.filter(vocabulary=term.vocabulary)
-                .exclude(id=term.id)
-                .values_list("word", flat=True)[:3]
-            )
-            from random import shuffle
-            answers = [term.word] + distractors
-            shuffle(answers)
-            for i, ans in enumerate(answers, start=1):
-                QuizChoice.objects.create(
-                    quiz=quiz,
-                    text=ans,
-                    is_correct=(ans == term.word),
-                    order=i
-                )
+    quiz = _get_or_make_quiz(term, qtype, request.user)
 
     # POST処理
     if request.method == "POST":
-        choice_id = request.POST.get("choice_id")
-        if not choice_id:
-            request.session["last_result"] = "invalid"
-            return redirect("quizzes:play", term_id=term.id, qtype=qtype)
-
         try:
-            choice_id = int(choice_id)
+            choice_id = int(request.POST.get("choice_id") or "")
         except ValueError:
-            request.session["last_result"] = "invalid"
-            return redirect("quizzes:play", term_id=term.id, qtype=qtype)
+            return _answer_response(request, quiz, term, qtype, "invalid")
 
         choice = get_object_or_404(QuizChoice, id=choice_id, quiz=quiz)
 
@@ -73,19 +94,133 @@ def play(request, term_id, qtype="DT"):
             is_correct=choice.is_correct
         )
 
-        request.session["last_result"] = "correct" if choice.is_correct else "wrong"
-        return redirect("quizzes:play", term_id=term.id, qtype=qtype)
+        return _answer_response(request, quiz, term, qtype, "correct" if choice.is_correct else "wrong", choice)
 
-    # GET時
-    last = request.session.pop("last_result", None)
-    choices_qs = getattr(quiz, "choices", None) or getattr(quiz, "quizchoice_set", None)
+    # GET時（選択肢は事前シリアライズ済みの payload から）
+    last = _load_result(quiz, request.GET.get("r"))
+    payload = quiz.get_payload()
 
     return render(
         request,
         "quizzes/play.html",
         {
             "quiz": quiz,
-            "choices": choices_qs.order_by("order") if hasattr(choices_qs, "order_by") else [],
+            "question": payload["question"],
+            "choices": payload["choices"],
             "last": last
         }
     )
+
+
+@login_required
+@require_GET
+def play_json(request, term_id, qtype="DT"):
+    """
+    play の JSON 版。(term, question_type) インデックスで payload 列だけを1回引いて返す。
+    クイズが未作成・payload が無効化済みのときだけ通常の経路で作る。
+    """
+    payload = (
+        Quiz.objects.filter(term_id=term_id, question_type=qtype)
+        .order_by("id").values_list("payload", flat=True).first()
+    )
+    if payload is None:
+        term = get_object_or_404(Term, id=term_id)
+        payload = _get_or_make_quiz(term, qtype, request.user).get_payload()
+    return JsonResponse(payload)
+
+
+@login_required
+@require_GET
+def review_due(request):
+    """
+    期限が来た復習を due_at の古い順に返す（?limit=20&qtype=DT）。
+    (user, due_at) インデックスを先頭から limit 行読むだけなので、履歴の長さに依存しない。
+    """
+    try:
+        limit = max(1, min(int(request.GET.get("limit", 20)), 100))
+    except ValueError:
+        limit = 20
+    qtype = request.GET.get("qtype", Quiz.QuestionType.DEF_TO_TERM)
+    if qtype not in Quiz.QuestionType.values:
+        return JsonResponse({"error": "invalid qtype"}, status=400)
+
+    items = [
+        {
+            "term_id": s.term_id,
+            "term": distractors.term_name(s.term),
+            "due_at": s.due_at.isoformat(),
+            "interval_days": s.interval_days,
+            "repetitions": s.repetitions,
+            "ease": round(s.ease, 2),
+            "play_url": reverse("quizzes:play_json", args=[s.term_id, qtype]),
+        }
+        for s in review.due(request.user, limit=limit)
+    ]
+    return JsonResponse({"count": len(items), "results": items})
+
+
+@login_required
+@require_http_methods(["POST"])
+def session_start(request):
+    """
+    複数問のクイズセッションを開始し、N 問ぶんの payload をまとめて返す。
+    POST vocabulary=<id> | tag=<id or name> | source=review, count=20, qtype=DT
+    """
+    qtype = request.POST.get("qtype", Quiz.QuestionType.DEF_TO_TERM)
+    if qtype not in Quiz.QuestionType.values:
+        return JsonResponse({"error": "invalid qtype"}, status=400)
+    try:
+        count = int(request.POST.get("count", 20))
+    except ValueError:
+        count = 20
+
+    kwargs = {"question_type": qtype, "count": count}
+    vocabulary_id, tag_key = request.POST.get("vocabulary"), request.POST.get("tag")
+    if request.POST.get("source") == "review":
+        kwargs["due_only"] = True
+    elif vocabulary_id:
+        vocabulary = (
+            Vocabulary.objects.filter(Q(user=request.user) | Q(is_public=True), pk=vocabulary_id).first()
+            if vocabulary_id.isdigit() else None
+        )
+        if vocabulary is None:
+            return JsonResponse({"error": "vocabulary not found"}, status=404)
+        # まだ terms.Term に紐付いていない用語があれば先に紐付ける（紐付け済みなら1クエリで終わる）
+        Quiz.link_vocabulary_terms(vocabulary)
+        kwargs.update(vocabulary=vocabulary, terms_qs=Quiz.terms_for_vocabulary(vocabulary))
+    elif tag_key:
+        tag = Tag.objects.filter(pk=tag_key).first() if tag_key.isdigit() else Tag.objects.filter(name=tag_key).first()
+        if tag is None:
+            return JsonResponse({"error": "tag not found"}, status=404)
+        # 子孫のタグが付いた用語も出題する
+        kwargs.update(tag=tag, terms_qs=term_hierarchy.subtree_terms([tag]))
+    else:
+        return JsonResponse({"error": "vocabulary, tag or source=review is required"}, status=400)
+
+    try:
+        session, questions = sessions.start(request.user, **kwargs)
+    except sessions.SessionError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"session_id": session.pk, "question_type": qtype, "questions": questions})
+
+
+@login_required
+@require_http_methods(["POST"])
+def session_submit(request, session_id):
+    """
+    セッションの回答をまとめて送る。
+    body(JSON): {"answers": [{"quiz_id": 1, "choice_id": 3}, ...]}
+    """
+    session = get_object_or_404(QuizSession, pk=session_id, user=request.user)
+    try:
+        body = json.loads(request.body or b"{}")
+        answers = [(int(a["quiz_id"]), int(a["choice_id"])) for a in body.get("answers", [])]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({"error": "invalid body"}, status=400)
+    try:
+        result = sessions.submit(session, answers)
+    except sessions.AlreadySubmitted as e:
+        return JsonResponse({"error": str(e)}, status=409)
+    except sessions.SessionError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse(result)
@@ -0,0 +1,86 @@
+"""
+共有リンクのアクセス記録（last_accessed_at / access_count）のバッファリング。
+
+open_share のたびに UPDATE すると読み取り API が書き込みのホットスポットになるので、
+プロセス内でトークンごとに「最終アクセス時刻・回数」をまとめておき、
+SHARE_ACCESS_FLUSH_INTERVAL 秒ごとに 1 本の UPDATE でまとめて書き込む。
+プロセス終了時にも残りを書き出す。interval=0 なら従来どおり即時 UPDATE。
+"""
+import atexit
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import ShareLink
+
+_lock = threading.Lock()
+_pending = {}  # token -> [hits, last_accessed_at]
+_timer = None
+
+
+def _interval():
+    return getattr(settings, "SHARE_ACCESS_FLUSH_INTERVAL", 10)
+
+
+def record(token):
+    """アクセスを1件記録する（DB には触れない）"""
+    global _timer
+    now = timezone.now()
+    if _interval() <= 0:
+        _write({token: [1, now]})
+        return
+    with _lock:
+        entry = _pending.get(token)
+        if entry:
+            entry[0] += 1
+            entry[1] = now
+        else:
+            _pending[token] = [1, now]
+        if _timer is None:
+            _timer = threading.Timer(_interval(), _flush_from_timer)
+            _timer.daemon = True
+            _timer.start()
+
+
+async def arecord(token):
+    """record の async 版（即時書き込みのときだけスレッドに逃がす）"""
+    if _interval() <= 0:
+        await sync_to_async(record)(token)
+    else:
+        record(token)
+
+
+def flush():
+    """溜まっているアクセスを書き出す。書き出したトークン数を返す"""
+    global _pending, _timer
+    with _lock:
+        batch, _pending = _pending, {}
+        _timer = None
+    if batch:
+        _write(batch)
+    return len(batch)
+
+
+def _flush_from_timer():
+    close_old_connections()
+    try:
+        flush()
+    finally:
+        close_old_connections()
+
+
+def _write(batch, chunk_size=500):
+    tokens = list(batch)
+    for i in range(0, len(tokens), chunk_size):
+        chunk = tokens[i:i + chunk_size]
+        ShareLink.objects.filter(token__in=chunk).update(
+            last_accessed_at=Case(*[When(token=t, then=Value(batch[t][1])) for t in chunk]),
+            access_count=F("access_count") + Case(*[When(token=t, then=Value(batch[t][0])) for t in chunk]),
+        )
+
+
+atexit.register(flush)
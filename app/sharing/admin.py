@@ -3,7 +3,7 @@ from .models import ShareLink
 
 @admin.register(ShareLink)
 class ShareLinkAdmin(admin.ModelAdmin):
-    list_display = ('token', 'content_type', 'object_id', 'creator', 'is_active', 'expires_at', 'created_at', 'last_accessed_at')
+    list_display = ('token', 'content_type', 'object_id', 'creator', 'is_active', 'expires_at', 'created_at', 'last_accessed_at', 'access_count')
     list_filter = ('is_active', 'content_type')
     search_fields = ('token',)
-    readonly_fields = ('token', 'created_at', 'last_accessed_at')
+    readonly_fields = ('token', 'created_at', 'last_accessed_at', 'access_count')
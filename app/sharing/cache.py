@@ -0,0 +1,87 @@
+"""
+共有リンク（open_share）の解決結果キャッシュ。
+
+トークン → レスポンス用ペイロードを CACHES[SHARE_CACHE_ALIAS] に保存する。
+- TTL は SHARE_CACHE_TIMEOUT と expires_at までの残り時間の短いほう
+- 存在しない/無効なトークンも短時間だけ覚えておき、総当たりで DB を叩かせない
+- ShareLink の保存（revoke 含む）と共有対象の保存/削除で無効化（signals.py）
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from core import metrics
+
+# 共有対象になりうるモデル（対象の編集時にキャッシュを消す）
+SHAREABLE_MODELS = ("vocabularies.Vocabulary", "vocabularies.Term", "terms.Term", "quizzes.Quiz")
+
+MISSING = {"missing": True}
+
+
+def _cache():
+    return caches[getattr(settings, "SHARE_CACHE_ALIAS", "default")]
+
+
+def _key(token):
+    return f"sharing:link:{token}"
+
+
+def _timeout(link):
+    timeout = getattr(settings, "SHARE_CACHE_TIMEOUT", 300)
+    if link.expires_at:
+        remaining = int((link.expires_at - timezone.now()).total_seconds())
+        timeout = min(timeout, remaining)
+    return timeout
+
+
+def _missing_timeout():
+    return getattr(settings, "SHARE_CACHE_MISSING_TIMEOUT", 30)
+
+
+def get_payload(token):
+    """キャッシュ済みペイロード。未キャッシュなら None、無効トークンなら MISSING"""
+    payload = _cache().get(_key(token))
+    metrics.cache_result("share", payload is not None)
+    return payload
+
+
+def set_payload(link, payload):
+    timeout = _timeout(link)
+    if timeout > 0:
+        _cache().set(_key(link.token), payload, timeout)
+
+
+def set_missing(token):
+    _cache().set(_key(token), MISSING, _missing_timeout())
+
+
+# ---- async 版（ASGI の open_share 用）----
+async def aget_payload(token):
+    payload = await _cache().aget(_key(token))
+    metrics.cache_result("share", payload is not None)
+    return payload
+
+
+async def aset_payload(link, payload):
+    timeout = _timeout(link)
+    if timeout > 0:
+        await _cache().aset(_key(link.token), payload, timeout)
+
+
+async def aset_missing(token):
+    await _cache().aset(_key(token), MISSING, _missing_timeout())
+
+
+def invalidate(*tokens):
+    if tokens:
+        _cache().delete_many([_key(t) for t in tokens])
+
+
+def invalidate_target(obj):
+    """共有対象オブジェクトを指す全リンクのキャッシュを消す"""
+    from django.contrib.contenttypes.models import ContentType
+    from .models import ShareLink
+
+    ct = ContentType.objects.get_for_model(obj)
+    tokens = ShareLink.objects.filter(content_type=ct, object_id=obj.pk).values_list("token", flat=True)
+    invalidate(*tokens)
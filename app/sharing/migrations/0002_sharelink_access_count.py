@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sharing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sharelink',
+            name='access_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
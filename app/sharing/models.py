@@ -32,6 +32,7 @@ class ShareLink(models.Model):
     # 監査
     created_at = models.DateTimeField(auto_now_add=True)
     last_accessed_at = models.DateTimeField(null=True, blank=True)
+    access_count = models.PositiveBigIntegerField(default=0)  # 分析用（sharing.access がまとめて加算）
 
     class Meta:
         indexes = [
@@ -50,5 +51,6 @@ class ShareLink(models.Model):
         return True
 
     def touch(self):
+        """即時に最終アクセスを書き込む（open_share は sharing.access でバッファリングする）"""
         self.last_accessed_at = timezone.now()
         self.save(update_fields=['last_accessed_at'])
@@ -0,0 +1,23 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache as share_cache
+from .models import ShareLink
+
+
+@receiver(post_save, sender=ShareLink)
+@receiver(post_delete, sender=ShareLink)
+def invalidate_link(sender, instance, **kwargs):
+    share_cache.invalidate(instance.token)
+
+
+def invalidate_target(sender, instance, **kwargs):
+    share_cache.invalidate_target(instance)
+
+
+def connect_targets():
+    for label in share_cache.SHAREABLE_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(invalidate_target, sender=model, dispatch_uid=f"sharing-save-{label}")
+        post_delete.connect(invalidate_target, sender=model, dispatch_uid=f"sharing-delete-{label}")
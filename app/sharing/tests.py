@@ -1,3 +1,54 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from terms.models import Term
+from . import access
+from .models import ShareLink
+
+
+@override_settings(SHARE_ACCESS_FLUSH_INTERVAL=0)
+class OpenShareTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("owner", password="pw")
+        term = Term.objects.create(term="TCP", definition="transport")
+        self.link = ShareLink.objects.create(
+            content_type=ContentType.objects.get_for_model(Term), object_id=term.pk, creator=self.user,
+        )
+        self.url = f"/sharing/{self.link.token}/"
+
+    def test_revalidated_every_time(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertNotIn("max-age", response["Cache-Control"])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        # 304 でも Django を通るのでアクセスは記録される
+        self.link.refresh_from_db()
+        self.assertEqual(self.link.access_count, 2)
+
+    def test_revoke_takes_effect_immediately(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.client.force_login(self.user)
+        self.client.post(f"/sharing/{self.link.token}/revoke/")
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+@override_settings(SHARE_ACCESS_FLUSH_INTERVAL=3600)
+class AccessBufferTests(TestCase):
+    def test_flush_writes_buffered_hits(self):
+        user = get_user_model().objects.create_user("owner", password="pw")
+        ct = ContentType.objects.get_for_model(Term)
+        a, b = (ShareLink.objects.create(content_type=ct, object_id=1, creator=user) for _ in range(2))
+        for token in (a.token, a.token, b.token):
+            access.record(token)
+        self.addCleanup(access.flush)
+        a.refresh_from_db()
+        self.assertEqual(a.access_count, 0)
+
+        self.assertEqual(access.flush(), 2)
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual((a.access_count, b.access_count), (2, 1))
+        self.assertIsNotNone(a.last_accessed_at)
+        self.assertEqual(access.flush(), 0)
@@ -1,3 +1,6 @@
+import json
+
+from asgiref.sync import sync_to_async
 from django.http import JsonResponse, Http404
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
@@ -6,6 +9,9 @@ from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from datetime import timedelta
 
+from core import conditional
+from . import access as share_access
+from . import cache as share_cache
 from .models import ShareLink
 
 def ping(request):
@@ -28,21 +34,40 @@ def _serialize_target(obj):
         data.update({"question": getattr(obj, "question_text", None)})
     return data
 
+def _build_payload(link):
+    # GenericForeignKey の解決は同期 ORM なので、async ビューからは sync_to_async 経由で呼ぶ
+    return {
+        "token": link.token,
+        "expires_at": link.expires_at.isoformat() if link.expires_at else None,
+        "data": _serialize_target(link.target),
+    }
+
+# 公開リンクは共有キャッシュに置かせず、毎回 Django で ETag を再検証させる（304 ならボディは送らない）。
+# アクセス記録を漏らさず、revoke や期限切れがすぐに効くようにするため
+SHARE_CACHE_CONTROL = {"public": True, "no_cache": True}
+
 @require_http_methods(["GET"])
-def open_share(request, token: str):
+async def open_share(request, token: str):
     """
     公開（認証不要）。トークンが有効なら対象の軽量データを返す。
+    解決結果はキャッシュし、ヒット時は ShareLink / 対象オブジェクトを読まない。
     """
-    link = get_object_or_404(ShareLink, token=token)
-    if not link.is_valid():
+    payload = await share_cache.aget_payload(token)
+    if payload == share_cache.MISSING:
         raise Http404("Link invalid or expired")
+    if payload is None:
+        link = await ShareLink.objects.select_related("content_type").filter(token=token).afirst()
+        if link is None or not link.is_valid():
+            await share_cache.aset_missing(token)
+            raise Http404("Link invalid or expired")
+        payload = await sync_to_async(_build_payload)(link)
+        await share_cache.aset_payload(link, payload)
 
-    link.touch()
-    return JsonResponse({
-        "token": link.token,
-        "expires_at": link.expires_at.isoformat() if link.expires_at else None,
-        "data": _serialize_target(link.target),
-    })
+    await share_access.arecord(token)
+    # ペイロード自体から ETag を作る（キャッシュヒット時も DB を読まずに 304 を返せる）
+    etag = conditional.make_etag(json.dumps(payload, sort_keys=True))
+    response = conditional.not_modified(request, etag) or JsonResponse(payload)
+    return conditional.apply(response, etag, cache_control=SHARE_CACHE_CONTROL)
 
 @login_required
 @require_http_methods(["POST"])
@@ -88,5 +113,5 @@ def create_share(request):
 def revoke_share(request, token: str):
     link = get_object_or_404(ShareLink, token=token, creator=request.user)
     link.is_active = False
-    link.save(update_fields=["is_active"])
+    link.save(update_fields=["is_active"])  # キャッシュは post_save で無効化される
     return JsonResponse({"revoked": True, "token": token})
@@ -1,16 +1,86 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.helpers import ActionForm
+from django.core.exceptions import ValidationError
+from . import hierarchy as term_hierarchy
+from . import search as term_search
+from . import tags as term_tags
 from .models import Term, Tag
 
 
+def _tag_tree():
+    """[(pk, 名前, 深さ), ...] を木の順（親の直後に子）で。モデルは作らず1クエリ"""
+    rows = list(Tag.objects.order_by('name').values_list('pk', 'name', 'parent_id'))
+    children = {}
+    for pk, name, parent_id in rows:
+        children.setdefault(parent_id, []).append((pk, name))
+    tree, stack = [], [(pk, name, 0) for pk, name in reversed(children.get(None, []))]
+    while stack:
+        pk, name, depth = stack.pop()
+        tree.append((pk, name, depth))
+        stack.extend((c, n, depth + 1) for c, n in reversed(children.get(pk, [])))
+    return tree
+
+
+class TagTreeFilter(admin.SimpleListFilter):
+    """タグで絞り込む（子孫のタグが付いた用語も含める）"""
+    title = 'タグ'
+    parameter_name = 'tag'
+
+    def lookups(self, request, model_admin):
+        return [(str(pk), f"{'　' * depth}{name}") for pk, name, depth in _tag_tree()]
+
+    def queryset(self, request, queryset):
+        if not (self.value() or '').isdigit():
+            return queryset
+        # term_tags → TagClosure の JOIN 1回（terms/hierarchy.py）
+        return queryset.filter(tags__ancestor_links__ancestor_id=int(self.value())).distinct()
+
+
 @admin.register(Term)
 class TermAdmin(admin.ModelAdmin):
     list_display = ('term', 'created_at', 'updated_at')  # 一覧表示に出す項目
     search_fields = ('term', 'definition')               # 検索可能なフィールド
-    list_filter = ('tags',)                              # 絞り込みフィルター
+    list_filter = (TagTreeFilter,)                       # 絞り込みフィルター（タグの部分木）
     filter_horizontal = ('tags',)                        # ManyToMany を横並びで編集
 
+    def get_search_results(self, request, queryset, search_term):
+        # LIKE '%q%' の全件走査ではなく全文検索（terms/search.py）を使う
+        if not search_term:
+            return queryset, False
+        hits = term_search.search('terms.Term', search_term, limit=1000)
+        return queryset.filter(pk__in=[t.pk for t in hits]), False
+
+
+class TagActionForm(ActionForm):
+    # 「親タグを変更」アクションの移動先（空ならルートへ）
+    parent = forms.ModelChoiceField(queryset=Tag.objects.order_by('name'), required=False, label='移動先の親タグ')
+
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
-    list_display = ('name', 'created_at')                # 一覧表示に出す項目
+    list_display = ('name', 'parent', 'term_count', 'created_at')  # 一覧表示に出す項目
+    list_select_related = ('parent',)
     search_fields = ('name',)
+    autocomplete_fields = ('parent',)
+    action_form = TagActionForm
+    actions = ('recount_terms', 'move_to_parent')
+
+    @admin.action(description='用語数を数え直す')
+    def recount_terms(self, request, queryset):
+        updated = term_tags.recount(list(queryset.values_list('pk', flat=True)))
+        self.message_user(request, f'{updated} 件の用語数を更新しました')
+
+    @admin.action(description='親タグを変更（部分木ごと移動）')
+    def move_to_parent(self, request, queryset):
+        try:
+            parent = TagActionForm.base_fields['parent'].clean(request.POST.get('parent'))
+        except ValidationError:
+            self.message_user(request, '移動先の親タグが不正です', level='error')
+            return
+        try:
+            moved = term_hierarchy.move_many(list(queryset), parent)
+        except ValueError:
+            self.message_user(request, '自分自身や子孫のタグの下には移動できません', level='error')
+            return
+        self.message_user(request, f'{moved} 件のタグを移動しました')
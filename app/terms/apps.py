@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class TermsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'terms'
+
+    def ready(self):
+        from . import hierarchy, search, tags
+        search.connect()
+        tags.connect()
+        hierarchy.connect()
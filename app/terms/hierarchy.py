@@ -0,0 +1,164 @@
+"""
+タグの階層（Tag.parent）と閉包テーブル（TagClosure）。
+
+TagClosure には祖先 → 子孫の全組を深さ付きで持つ（自分自身も depth=0）。
+「このタグ以下の全用語」は term_tags と TagClosure の JOIN 1回で引け、再帰は要らない。
+
+- 作成: 親の祖先の行をコピーして自分の行を足す
+- 親の変更（move）: 部分木と旧祖先の組を1回の DELETE で消し、部分木と新祖先の組を1回の INSERT で作る
+- 削除: 部分木の閉包は CASCADE で消える。子は SET_NULL でルートになるので、子孫と旧祖先の組を消す
+- Tag.save() で parent を変えた場合（管理画面など）も post_save で閉包を合わせる
+- bulk_create などシグナルを通らない作成の後は add_roots を呼ぶ。ずれたら rebuild で作り直せる
+"""
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save, pre_delete
+
+from .models import Tag, TagClosure, Term
+
+BATCH_SIZE = 1000
+
+
+# ---- 参照 ----
+def subtree_ids(tag):
+    """tag 以下（自分を含む）のタグ ID の QS（サブクエリとして使える）"""
+    return TagClosure.objects.filter(ancestor=tag).values("descendant")
+
+
+def ancestors(tag):
+    """tag の祖先（自分は含まない）。ルートから近い順"""
+    return (
+        Tag.objects.filter(descendant_links__descendant=tag, descendant_links__depth__gt=0)
+        .order_by("-descendant_links__depth")
+    )
+
+
+def subtree_terms(tag_ids, *, match_all=False):
+    """
+    tag_ids のどれか（match_all なら全て）の部分木に属するタグが付いた用語。
+    term_tags → TagClosure の JOIN 1回。閉包は (ancestor, descendant) の一意インデックスで引く。
+    """
+    tag_ids = list({getattr(t, "pk", t) for t in tag_ids})
+    qs = Term.objects.filter(tags__ancestor_links__ancestor__in=tag_ids)
+    if match_all and len(tag_ids) > 1:
+        # どの祖先の部分木に当たったかを数える
+        return (
+            qs.annotate(matched=Count("tags__ancestor_links__ancestor", distinct=True))
+            .filter(matched=len(tag_ids))
+        )
+    return qs.distinct()
+
+
+def _parent_in_closure(tag_id):
+    return (
+        TagClosure.objects.filter(descendant_id=tag_id, depth=1)
+        .values_list("ancestor_id", flat=True).first()
+    )
+
+
+# ---- 更新 ----
+def add_roots(tag_ids):
+    """閉包に自分自身の行が無いタグに足す（bulk_create で作ったタグ用。親は無いものとして扱う）"""
+    TagClosure.objects.bulk_create(
+        [TagClosure(ancestor_id=pk, descendant_id=pk, depth=0) for pk in tag_ids],
+        ignore_conflicts=True, batch_size=BATCH_SIZE,
+    )
+
+
+def _link(tag_id, parent_id):
+    rows = [TagClosure(ancestor_id=tag_id, descendant_id=tag_id, depth=0)]
+    if parent_id is not None:
+        rows += [
+            TagClosure(ancestor_id=ancestor_id, descendant_id=tag_id, depth=depth + 1)
+            for ancestor_id, depth in TagClosure.objects.filter(descendant_id=parent_id).values_list("ancestor_id", "depth")
+        ]
+    TagClosure.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def _relink(tag_id, parent_id):
+    """tag の部分木を parent の下に付け替える（閉包だけ）。部分木内への移動は ValueError"""
+    subtree = list(TagClosure.objects.filter(ancestor_id=tag_id).values_list("descendant_id", "depth"))
+    if parent_id is not None and any(pk == parent_id for pk, _ in subtree):
+        raise ValueError("cannot move a tag under itself or its descendant")
+
+    # 部分木 × 旧祖先（部分木の外）の組を消す
+    TagClosure.objects.filter(
+        descendant_id__in=[pk for pk, _ in subtree],
+        ancestor_id__in=TagClosure.objects.filter(descendant_id=tag_id, depth__gt=0).values("ancestor_id"),
+    ).delete()
+    if parent_id is None:
+        return
+    # 部分木 × 新祖先（親自身を含む）の組を作る
+    new_ancestors = list(TagClosure.objects.filter(descendant_id=parent_id).values_list("ancestor_id", "depth"))
+    TagClosure.objects.bulk_create(
+        [
+            TagClosure(ancestor_id=ancestor_id, descendant_id=pk, depth=up + down + 1)
+            for ancestor_id, up in new_ancestors
+            for pk, down in subtree
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def move(tag, parent):
+    """tag を（部分木ごと）parent の下へ移す。parent=None ならルートにする"""
+    parent_id = getattr(parent, "pk", parent)
+    with transaction.atomic():
+        # 同時に同じ木を動かすと閉包が壊れるので、動かすタグの行をロックして順番に
+        Tag.objects.select_for_update().filter(pk=tag.pk).first()
+        _relink(tag.pk, parent_id)
+        Tag.objects.filter(pk=tag.pk).update(parent_id=parent_id)
+    tag.parent_id = parent_id
+
+
+def move_many(tags, parent):
+    """複数のタグをまとめて parent の下へ移す（1トランザクション）。移したタグの数を返す"""
+    with transaction.atomic():
+        for tag in tags:
+            move(tag, parent)
+    return len(tags)
+
+
+def rebuild():
+    """Tag.parent から閉包を作り直す。作った行数を返す"""
+    parents = dict(Tag.objects.values_list("pk", "parent_id"))
+    rows = []
+    for pk in parents:
+        depth, node, seen = 0, pk, set()
+        while node is not None and node not in seen:
+            seen.add(node)
+            rows.append(TagClosure(ancestor_id=node, descendant_id=pk, depth=depth))
+            node, depth = parents.get(node), depth + 1
+    with transaction.atomic():
+        TagClosure.objects.all().delete()
+        TagClosure.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
+
+
+# ---- シグナル ----
+def _on_tag_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        _link(instance.pk, instance.parent_id)
+    elif _parent_in_closure(instance.pk) != instance.parent_id:
+        _relink(instance.pk, instance.parent_id)
+
+
+def _on_tag_pre_delete(sender, instance, **kwargs):
+    links = TagClosure.objects.filter(descendant_id=instance.pk, depth__gt=0).values_list("ancestor_id", flat=True)
+    below = TagClosure.objects.filter(ancestor_id=instance.pk, depth__gt=0).values_list("descendant_id", flat=True)
+    instance._closure_detach = (list(links), list(below))
+
+
+def _on_tag_deleted(sender, instance, **kwargs):
+    ancestor_ids, descendant_ids = instance.__dict__.pop("_closure_detach", ((), ()))
+    if ancestor_ids and descendant_ids:
+        # 子はルートになったので、旧祖先との組を消す
+        TagClosure.objects.filter(ancestor_id__in=ancestor_ids, descendant_id__in=descendant_ids).delete()
+
+
+def connect():
+    post_save.connect(_on_tag_saved, sender=Tag, dispatch_uid="tag-closure-save")
+    pre_delete.connect(_on_tag_pre_delete, sender=Tag, dispatch_uid="tag-closure-pre-delete")
+    post_delete.connect(_on_tag_deleted, sender=Tag, dispatch_uid="tag-closure-delete")
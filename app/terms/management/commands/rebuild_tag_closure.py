@@ -0,0 +1,19 @@
+"""
+タグ階層の閉包テーブル（TagClosure）を Tag.parent から作り直す。
+
+    python manage.py rebuild_tag_closure
+
+閉包は Tag の保存・削除・移動のたびに更新されるので、通常は不要。
+SQL で parent を直接書き換えた後や、データ投入でずれたときに使う。
+"""
+from django.core.management.base import BaseCommand
+
+from terms import hierarchy
+
+
+class Command(BaseCommand):
+    help = "Tag.parent からタグ階層の閉包テーブルを作り直す"
+
+    def handle(self, *args, **opts):
+        rows = hierarchy.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"closure_rows={rows}"))
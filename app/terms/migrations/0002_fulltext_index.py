@@ -0,0 +1,34 @@
+# 全文検索用の FULLTEXT インデックス（MySQL のみ。ngram パーサで日本語も分かち書きなしで検索できる）
+# それ以外の DB では何もしない（terms/search.py がプロセス内の転置インデックスで代替する）
+
+from django.db import migrations
+
+INDEXES = (
+    ("terms_term_ft", "term, definition"),
+    ("terms_term_name_ft", "term"),
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    for name, cols in INDEXES:
+        schema_editor.execute(f"ALTER TABLE terms_term ADD FULLTEXT INDEX {name} ({cols}) WITH PARSER ngram")
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f"ALTER TABLE terms_term DROP INDEX {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('terms', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:29
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_term_count(apps, schema_editor):
+    """既存のタグの用語数を1回の UPDATE で埋める"""
+    Tag = apps.get_model('terms', 'Tag')
+    Through = apps.get_model('terms', 'Term').tags.through
+    Tag.objects.update(term_count=Coalesce(
+        Subquery(
+            Through.objects.filter(tag=OuterRef('pk'))
+            .order_by().values('tag').annotate(n=Count('pk')).values('n')
+        ),
+        0,
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('terms', '0002_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='term_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='用語数'),
+        ),
+        migrations.RunPython(backfill_term_count, migrations.RunPython.noop),
+    ]
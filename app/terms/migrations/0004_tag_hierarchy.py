@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def add_self_links(apps, schema_editor):
+    """既存のタグは全てルート: 自分自身の行だけ作る"""
+    Tag = apps.get_model('terms', 'Tag')
+    TagClosure = apps.get_model('terms', 'TagClosure')
+    TagClosure.objects.bulk_create(
+        [TagClosure(ancestor_id=pk, descendant_id=pk, depth=0) for pk in Tag.objects.values_list('pk', flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('terms', '0003_tag_term_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='terms.tag', verbose_name='親タグ'),
+        ),
+        migrations.CreateModel(
+            name='TagClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField(verbose_name='深さ')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='terms.tag', verbose_name='祖先')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='terms.tag', verbose_name='子孫')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='terms_tagclosure_desc_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='terms_tagclosure_pair')],
+            },
+        ),
+        migrations.RunPython(add_self_links, migrations.RunPython.noop),
+    ]
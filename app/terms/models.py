@@ -1,13 +1,46 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 
 
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True, verbose_name='タグ名')
+    # 階層（例: ネットワーク > プロトコル > TCP）。祖先・子孫の関係は TagClosure に展開して持つ
+    parent = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='children', verbose_name='親タグ',
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='作成日')
+    # このタグの付いた用語の数（terms/tags.py が Term.tags の変更に合わせて更新する）
+    term_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='用語数')
 
     def __str__(self):
         return self.name
 
+    def clean(self):
+        # 自分の部分木の中を親にすると循環する
+        if self.pk and self.parent_id and TagClosure.objects.filter(ancestor_id=self.pk, descendant_id=self.parent_id).exists():
+            raise ValidationError({'parent': '自分自身や子孫のタグは親にできません'})
+
+
+class TagClosure(models.Model):
+    """
+    タグ階層の閉包テーブル: 祖先 → 子孫の全組（自分自身も depth=0 で持つ）。
+    terms/hierarchy.py が Tag の作成・親の変更・削除に合わせて更新する。
+    """
+    ancestor = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='descendant_links', verbose_name='祖先')
+    descendant = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='ancestor_links', verbose_name='子孫')
+    depth = models.PositiveSmallIntegerField(verbose_name='深さ')
+
+    class Meta:
+        constraints = [
+            # (ancestor, descendant) の順の一意インデックスで「この祖先の子孫全部」を引く
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='terms_tagclosure_pair'),
+        ]
+        indexes = [models.Index(fields=['descendant', 'depth'], name='terms_tagclosure_desc_idx')]
+
+    def __str__(self):
+        return f'{self.ancestor_id} > {self.descendant_id} ({self.depth})'
+
 
 class Term(models.Model):
     term = models.CharField(max_length=255, verbose_name='用語')
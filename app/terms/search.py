@@ -0,0 +1,261 @@
+"""
+用語の全文検索。
+
+- MySQL: FULLTEXT インデックス（ngram パーサ、日本語対応）に対する MATCH ... AGAINST（BOOLEAN MODE）
+- それ以外（SQLite / テスト）: プロセス内の転置インデックス（同じく英数字も日本語も2文字 ngram）。
+  初回に全件を読み込み、更新はシグナルで書き込んだプロセスにだけ反映される（他のワーカーは古いまま）。
+  そのため開発・テスト専用で、SEARCH_PYTHON_INDEX（dev.py で True）が無ければ使わず ImproperlyConfigured にする
+
+どちらも「用語名の一致を説明文の一致より重く」スコアを付け、クエリの全語を含むものだけを返す。
+前方一致（prefix=True）では各語の末尾に * を付けたのと同じ扱いになる。
+SEARCH_BACKEND=auto|mysql|python で切り替え（auto は DB が MySQL なら mysql）。
+"""
+import bisect
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+
+
+class SearchSpec:
+    """検索対象モデルと、重み付きの検索フィールド（先頭が用語名）"""
+
+    def __init__(self, label, fields):
+        self.label = label
+        self.fields = fields  # ((field_name, weight), ...)
+
+    @property
+    def model(self):
+        return apps.get_model(self.label)
+
+
+SPECS = {
+    "terms.Term": SearchSpec("terms.Term", (("term", 2.0), ("definition", 1.0))),
+    "vocabularies.Term": SearchSpec("vocabularies.Term", (("term_name", 2.0), ("description", 1.0))),
+}
+
+
+# ---- トークン化（MySQL の ngram_token_size=2 に合わせる）----
+# ngram パーサは英数字も日本語も区別せず、空白・記号で区切った連続部分を2文字ずつに分ける
+# （1文字だけの部分はそのまま）。"tcp" は "tc" "cp" になり、語の途中でも一致する。
+_WORD_RE = re.compile(r"[^\W_]+")
+_BOOLEAN_OPS = re.compile(r'[+\-<>()~*"@]')
+
+
+def tokenize(text):
+    tokens = []
+    for chunk in _WORD_RE.findall((text or "").lower()):
+        if len(chunk) == 1:
+            tokens.append(chunk)
+        else:
+            tokens.extend(chunk[i:i + 2] for i in range(len(chunk) - 1))
+    return tokens
+
+
+def _backend():
+    backend = getattr(settings, "SEARCH_BACKEND", "auto")
+    if backend == "auto":
+        backend = "mysql" if connection.vendor == "mysql" else "python"
+    if backend == "python" and not getattr(settings, "SEARCH_PYTHON_INDEX", False):
+        raise ImproperlyConfigured(
+            "the in-process search index is for development and tests only; "
+            "use MySQL (FULLTEXT) or set SEARCH_PYTHON_INDEX=True"
+        )
+    return backend
+
+
+# ---- MySQL FULLTEXT ----
+def boolean_query(query, prefix=True):
+    """入力を BOOLEAN MODE の式にする（全語必須、prefix なら語末に *）"""
+    words = _BOOLEAN_OPS.sub(" ", query or "").split()
+    return " ".join(f"+{w}*" if prefix else f"+{w}" for w in words)
+
+
+def _mysql_search(spec, queryset, query, prefix):
+    against = boolean_query(query, prefix)
+    if not against:
+        return queryset.none()
+    qn = connection.ops.quote_name
+    table = qn(spec.model._meta.db_table)
+    cols = [f"{table}.{qn(spec.model._meta.get_field(f).column)}" for f, _ in spec.fields]
+    match_all = f"MATCH({', '.join(cols)}) AGAINST (%s IN BOOLEAN MODE)"
+    match_name = f"MATCH({cols[0]}) AGAINST (%s IN BOOLEAN MODE)"
+    return (
+        queryset
+        .filter(RawSQL(match_all, (against,), output_field=BooleanField()))
+        .annotate(score=RawSQL(f"{match_all} + {match_name}", (against, against), output_field=FloatField()))
+        .order_by("-score", "pk")
+    )
+
+
+# ---- Python 転置インデックス ----
+class InvertedIndex:
+    def __init__(self, spec):
+        self.spec = spec
+        self.postings = defaultdict(dict)  # token -> {pk: 重み付き出現数}
+        self.doc_tokens = {}               # pk -> set(token)（更新・削除用）
+        self.vocab = []                    # 前方一致用のソート済みトークン
+        self._dirty = False
+        self.lock = threading.Lock()
+
+    def build(self):
+        fields = [f for f, _ in self.spec.fields]
+        with self.lock:
+            self.postings.clear()
+            self.doc_tokens.clear()
+            for row in self.spec.model.objects.values_list("pk", *fields).iterator(chunk_size=2000):
+                self._add(row[0], row[1:])
+            self._dirty = True
+
+    def _add(self, pk, values):
+        seen = set()
+        for (_, weight), value in zip(self.spec.fields, values):
+            for tok in tokenize(value):
+                self.postings[tok][pk] = self.postings[tok].get(pk, 0.0) + weight
+                seen.add(tok)
+        self.doc_tokens[pk] = seen
+
+    def _remove(self, pk):
+        for tok in self.doc_tokens.pop(pk, ()):
+            docs = self.postings.get(tok)
+            if docs is not None:
+                docs.pop(pk, None)
+                if not docs:
+                    del self.postings[tok]
+
+    def update(self, obj):
+        with self.lock:
+            self._remove(obj.pk)
+            self._add(obj.pk, [getattr(obj, f) for f, _ in self.spec.fields])
+            self._dirty = True
+
+    def remove(self, pk):
+        with self.lock:
+            self._remove(pk)
+            self._dirty = True
+
+    def _expand(self, tok, prefix):
+        if not prefix:
+            return [tok] if tok in self.postings else []
+        i = bisect.bisect_left(self.vocab, tok)
+        out = []
+        while i < len(self.vocab) and self.vocab[i].startswith(tok):
+            out.append(self.vocab[i])
+            i += 1
+        return out
+
+    def search(self, query, prefix=True):
+        """[(pk, score), ...] をスコア降順で返す"""
+        with self.lock:
+            if self._dirty:
+                self.vocab = sorted(self.postings)
+                self._dirty = False
+            n_docs = max(len(self.doc_tokens), 1)
+            scores = None
+            for qtok in dict.fromkeys(tokenize(query)):
+                hits = defaultdict(float)
+                for tok in self._expand(qtok, prefix):
+                    docs = self.postings[tok]
+                    idf = math.log(1 + n_docs / len(docs))
+                    for pk, tf in docs.items():
+                        hits[pk] += tf * idf
+                if scores is None:
+                    scores = hits
+                else:
+                    scores = {pk: s + hits[pk] for pk, s in scores.items() if pk in hits}
+                if not scores:
+                    return []
+        return sorted((scores or {}).items(), key=lambda kv: (-kv[1], kv[0]))
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(spec):
+    with _indexes_lock:
+        index = _indexes.get(spec.label)
+        if index is None:
+            index = _indexes[spec.label] = InvertedIndex(spec)
+            index.build()
+    return index
+
+
+def reset():
+    """プロセス内インデックスを破棄する（次の検索で作り直す）。一括インポート後など"""
+    with _indexes_lock:
+        _indexes.clear()
+
+
+def _python_search(spec, queryset, query, prefix, limit, offset):
+    """
+    スコア順の pk から queryset に含まれるものを offset + limit 件まで拾い、
+    そのページの分だけ in_bulk で読む（ヒットした全件は読み込まない）
+    """
+    ranked = get_index(spec).search(query, prefix)
+    if not ranked:
+        return []
+    want = offset + limit
+    matched = []
+    step = max(want, 200)
+    for i in range(0, len(ranked), step):
+        window = [pk for pk, _ in ranked[i:i + step]]
+        # queryset の絞り込み（ユーザー・タグ）に合うかは pk だけ引いて確かめる
+        allowed = set(queryset.filter(pk__in=window).values_list("pk", flat=True))
+        matched.extend(pk for pk in window if pk in allowed)
+        if len(matched) >= want:
+            break
+    page = matched[offset:want]
+    if not page:
+        return []
+    scores = dict(ranked)
+    objs = queryset.in_bulk(page)
+    results = []
+    for pk in page:
+        obj = objs.get(pk)
+        if obj is not None:
+            obj.score = scores[pk]
+            results.append(obj)
+    return results
+
+
+# ---- 公開 API ----
+def search(label, query, *, queryset=None, tags=(), prefix=True, limit=20, offset=0):
+    """
+    label のモデルを全文検索し、score 属性付きのオブジェクトをスコア順で返す。
+    queryset で対象を絞り込める（ユーザー単位など）。tags は全て付いているものだけ（AND）。
+    """
+    spec = SPECS[label]
+    qs = queryset if queryset is not None else spec.model.objects.all()
+    for tag in tags:
+        qs = qs.filter(tags__name=tag)
+    if _backend() == "mysql":
+        return list(_mysql_search(spec, qs, query, prefix)[offset:offset + limit])
+    return _python_search(spec, qs, query, prefix, limit, offset)
+
+
+def _on_save(sender, instance, **kwargs):
+    index = _indexes.get(sender._meta.label)
+    if index is not None:
+        index.update(instance)
+
+
+def _on_delete(sender, instance, **kwargs):
+    index = _indexes.get(sender._meta.label)
+    if index is not None:
+        index.remove(instance.pk)
+
+
+def connect():
+    """構築済みの転置インデックスを保存/削除に追従させる（TermsConfig.ready から）"""
+    for label, spec in SPECS.items():
+        post_save.connect(_on_save, sender=spec.model, dispatch_uid=f"search-save-{label}")
+        post_delete.connect(_on_delete, sender=spec.model, dispatch_uid=f"search-delete-{label}")
@@ -0,0 +1,127 @@
+"""
+タグごとの用語数（Tag.term_count）と、タグでの用語の絞り込み・タグクラウド。
+
+- Tag.term_count は Term.tags の m2m_changed で更新する。
+  用語側から add したときは追加された組だけ pk_set に入るので F() で +1、
+  remove / clear / タグ側からの変更は対象タグだけ数え直す（1回の UPDATE）
+- 用語の削除は中間テーブルの行が CASCADE で消えるだけで m2m_changed が出ないので、
+  pre_delete で付いていたタグを覚えておき post_delete で数え直す
+- タグクラウドは term_count をそのまま読むので GROUP BY は無い。結果はキャッシュに置き、
+  カウンタが変わったら消す（TAG_CLOUD_CACHE_TIMEOUT 秒で自然に切れもする）
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_delete, pre_delete
+
+from core import metrics
+from . import hierarchy
+from .models import Tag, Term
+
+CLOUD_KEY = "terms:tag-cloud"
+
+Through = Term.tags.through
+
+
+def _cache():
+    return caches[getattr(settings, "TAG_CLOUD_CACHE_ALIAS", "default")]
+
+
+def _invalidate():
+    # コミット前に消すと、他のリクエストが古い値で作り直してしまう
+    transaction.on_commit(lambda: _cache().delete(CLOUD_KEY))
+
+
+# ---- term_count の維持 ----
+def _term_count():
+    return Coalesce(
+        Subquery(
+            Through.objects.filter(tag=OuterRef("pk"))
+            .order_by().values("tag").annotate(n=Count("pk")).values("n")
+        ),
+        0,
+    )
+
+
+def recount(tag_ids=None):
+    """term_count を中間テーブルから数え直す（1回の UPDATE）。更新件数を返す"""
+    qs = Tag.objects.all() if tag_ids is None else Tag.objects.filter(pk__in=tag_ids)
+    updated = qs.update(term_count=_term_count())
+    _invalidate()
+    return updated
+
+
+def _on_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        # clear 後は何が付いていたか分からないので先に控えておく
+        instance._cleared_tag_ids = (
+            [instance.pk] if reverse else list(Through.objects.filter(term=instance).values_list("tag_id", flat=True))
+        )
+        return
+    if action == "post_clear":
+        recount(instance.__dict__.pop("_cleared_tag_ids", None) or [])
+        return
+    if action not in ("post_add", "post_remove") or not pk_set:
+        return
+    if reverse:
+        # タグ側から用語を付け外しした: そのタグだけ
+        recount([instance.pk])
+    elif action == "post_add":
+        Tag.objects.filter(pk__in=pk_set).update(term_count=F("term_count") + 1)
+        _invalidate()
+    else:
+        # remove の pk_set には付いていなかったタグも入りうるので数え直す
+        recount(pk_set)
+
+
+def _on_term_pre_delete(sender, instance, **kwargs):
+    instance._deleted_tag_ids = list(Through.objects.filter(term=instance).values_list("tag_id", flat=True))
+
+
+def _on_term_deleted(sender, instance, **kwargs):
+    tag_ids = instance.__dict__.pop("_deleted_tag_ids", None)
+    if tag_ids:
+        recount(tag_ids)
+
+
+def connect():
+    m2m_changed.connect(_on_tags_changed, sender=Through, dispatch_uid="tag-count-m2m")
+    pre_delete.connect(_on_term_pre_delete, sender=Term, dispatch_uid="tag-count-pre-delete")
+    post_delete.connect(_on_term_deleted, sender=Term, dispatch_uid="tag-count-delete")
+
+
+# ---- 絞り込み ----
+def terms_with_tags(tag_ids, *, match_all=True, subtree=False):
+    """
+    tag_ids の付いた用語（中間テーブルとの1回の JOIN）。
+    match_all=True なら全て付いているもの（AND）、False ならどれか（OR）。
+    subtree=True なら子孫のタグが付いたものも含める（terms/hierarchy.py）。
+    """
+    if subtree:
+        return hierarchy.subtree_terms(tag_ids, match_all=match_all)
+    tag_ids = list(set(tag_ids))
+    qs = Term.objects.filter(tags__in=tag_ids)
+    if len(tag_ids) <= 1:
+        return qs
+    if match_all:
+        # 絞り込んだ JOIN の行数 = 付いているタグの数
+        return qs.annotate(matched=Count("tags")).filter(matched=len(tag_ids))
+    return qs.distinct()
+
+
+# ---- タグクラウド ----
+def cloud(limit):
+    """[(name, term_count), ...]（用語数の多い順）。キャッシュには上限件数まで置く"""
+    data = _cache().get(CLOUD_KEY)
+    metrics.cache_result("tag_cloud", data is not None)
+    if data is None:
+        max_size = getattr(settings, "TAG_CLOUD_MAX_SIZE", 200)
+        data = list(
+            Tag.objects.filter(term_count__gt=0)
+            .order_by("-term_count", "name")
+            .values_list("name", "term_count")[:max_size]
+        )
+        _cache().set(CLOUD_KEY, data, getattr(settings, "TAG_CLOUD_CACHE_TIMEOUT", 300))
+    return data[:limit]
@@ -1,3 +1,149 @@
-from django.test import TestCase
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from . import hierarchy, search, tags
+from .models import Tag, TagClosure, Term
+
+
+@override_settings(SEARCH_BACKEND="python", SEARCH_PYTHON_INDEX=True)
+class PythonSearchTests(TestCase):
+    def setUp(self):
+        search.reset()
+        self.addCleanup(search.reset)
+
+    def test_tokenize_matches_ngram_parser(self):
+        self.assertEqual(search.tokenize("TCP/IP 通信"), ["tc", "cp", "ip", "通信"])
+        self.assertEqual(search.tokenize("a 字"), ["a", "字"])
+
+    def test_ascii_and_japanese_substrings(self):
+        tcp = Term.objects.create(term="TCP", definition="伝送制御プロトコル")
+        Term.objects.create(term="UDP", definition="datagram")
+        self.assertEqual([t.pk for t in search.search("terms.Term", "cp")], [tcp.pk])
+        self.assertEqual([t.pk for t in search.search("terms.Term", "制御")], [tcp.pk])
+
+    def test_pages_after_filtering(self):
+        terms = [Term.objects.create(term=f"proto {i}", definition="protocol") for i in range(30)]
+        allowed = Term.objects.filter(pk__in=[t.pk for t in terms[::3]])
+        first = search.search("terms.Term", "proto", queryset=allowed, limit=4)
+        rest = search.search("terms.Term", "proto", queryset=allowed, limit=20, offset=4)
+        pks = [t.pk for t in first + rest]
+        self.assertEqual(len(first), 4)
+        self.assertEqual(sorted(pks), sorted(t.pk for t in terms[::3]))
+        self.assertTrue(all(hasattr(t, "score") for t in first))
+
+    @override_settings(SEARCH_PYTHON_INDEX=False)
+    def test_python_index_is_development_only(self):
+        with self.assertRaises(ImproperlyConfigured):
+            search.search("terms.Term", "tcp")
+
+
+class TagCountTests(TestCase):
+    def setUp(self):
+        self.net, self.web = Tag.objects.create(name="net"), Tag.objects.create(name="web")
+        self.terms = [Term.objects.create(term=f"term {i}", definition="d") for i in range(3)]
+        # 他のテストがキャッシュに残したクラウドを読まないように消しておく
+        tags._cache().delete(tags.CLOUD_KEY)
+        self.addCleanup(tags._cache().delete, tags.CLOUD_KEY)
+
+    def _counts(self):
+        return dict(Tag.objects.values_list("name", "term_count"))
+
+    def _expected(self):
+        return {t.name: t.terms.count() for t in Tag.objects.all()}
+
+    def test_counts_follow_add_remove_clear(self):
+        a, b, c = self.terms
+        a.tags.add(self.net, self.web)
+        b.tags.add(self.net)
+        b.tags.add(self.net)  # 付いているタグをもう一度足しても増えない
+        self.assertEqual(self._counts(), {"net": 2, "web": 1})
+        a.tags.remove(self.net, self.web)
+        c.tags.remove(self.web)  # 付いていないタグを外しても減らない
+        self.assertEqual(self._counts(), {"net": 1, "web": 0})
+        self.web.terms.add(a, b, c)
+        self.assertEqual(self._counts(), {"net": 1, "web": 3})
+        b.tags.clear()
+        self.assertEqual(self._counts(), self._expected())
+        self.web.terms.clear()
+        c.tags.set([self.net])
+        self.assertEqual(self._counts(), {"net": 1, "web": 0})
+        a.delete()
+        self.assertEqual(self._counts(), self._expected())
+
+    def test_cloud_is_invalidated(self):
+        self.terms[0].tags.add(self.net)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(tags.cloud(10), [("net", 1)])
+            self.terms[1].tags.add(self.net, self.web)
+        self.assertEqual(tags.cloud(10), [("net", 2), ("web", 1)])
+
+    def test_cloud_view_revalidates_with_etag(self):
+        self.terms[0].tags.add(self.net)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get("/terms/tags/cloud/")
+        self.assertIn("public", response["Cache-Control"])
+        etag = response["ETag"]
+        self.assertEqual(self.client.get("/terms/tags/cloud/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.terms[1].tags.add(self.net)
+        self.assertEqual(self.client.get("/terms/tags/cloud/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class TagClosureTests(TestCase):
+    def setUp(self):
+        # net > proto > tcp、web はルート
+        self.net = Tag.objects.create(name="net")
+        self.proto = Tag.objects.create(name="proto", parent=self.net)
+        self.tcp = Tag.objects.create(name="tcp", parent=self.proto)
+        self.web = Tag.objects.create(name="web")
+
+    def _closure(self):
+        return set(TagClosure.objects.values_list("ancestor__name", "descendant__name", "depth"))
+
+    def _rebuilt(self):
+        current = self._closure()
+        hierarchy.rebuild()
+        return current, self._closure()
+
+    def test_create(self):
+        self.assertEqual(self._closure(), {
+            ("net", "net", 0), ("proto", "proto", 0), ("tcp", "tcp", 0), ("web", "web", 0),
+            ("net", "proto", 1), ("proto", "tcp", 1), ("net", "tcp", 2),
+        })
+
+    def test_reparent_moves_subtree(self):
+        hierarchy.move(self.proto, self.web)
+        self.assertEqual(self._closure(), {
+            ("net", "net", 0), ("proto", "proto", 0), ("tcp", "tcp", 0), ("web", "web", 0),
+            ("web", "proto", 1), ("proto", "tcp", 1), ("web", "tcp", 2),
+        })
+        current, rebuilt = self._rebuilt()
+        self.assertEqual(current, rebuilt)
+
+    def test_save_with_new_parent_and_root(self):
+        self.tcp.parent = self.web
+        self.tcp.save()
+        self.proto.parent = None
+        self.proto.save()
+        current, rebuilt = self._rebuilt()
+        self.assertEqual(current, rebuilt)
+        self.assertIn(("web", "tcp", 1), current)
+        self.assertNotIn(("net", "proto", 1), current)
+
+    def test_cannot_move_under_descendant(self):
+        with self.assertRaises(ValueError):
+            hierarchy.move(self.net, self.tcp)
+
+    def test_delete_detaches_children(self):
+        self.proto.delete()
+        current, rebuilt = self._rebuilt()
+        self.assertEqual(current, rebuilt)
+        self.assertNotIn(("net", "tcp", 2), current)
+
+    def test_subtree_terms(self):
+        term = Term.objects.create(term="TCP", definition="d")
+        term.tags.add(self.tcp)
+        self.assertEqual(list(hierarchy.subtree_terms([self.net])), [term])
+        hierarchy.move(self.proto, self.web)
+        self.assertEqual(list(hierarchy.subtree_terms([self.net])), [])
+        self.assertEqual(list(hierarchy.subtree_terms([self.web])), [term])
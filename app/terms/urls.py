@@ -5,4 +5,7 @@ app_name = 'terms'
 
 urlpatterns = [
     path('index/', views.dummy_terms_view, name='myterms'),
-]
\ No newline at end of file
+    path('search/', views.search, name='search'),  # ?q=&tags=&prefix=1&limit=20&offset=0
+    path('by-tags/', views.by_tags, name='by_tags'),  # ?tags=&tags=&match=all|any&subtree=1&limit=50&after=
+    path('tags/cloud/', views.tag_cloud, name='tag_cloud'),  # ?limit=100
+]
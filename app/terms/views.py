@@ -1,4 +1,133 @@
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.db.models import prefetch_related_objects
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_GET
+
+from core import conditional
+from . import search as term_search
+from . import tags as term_tags
+from .models import Tag
 
 def dummy_terms_view(request):
-    return render(request, 'terms/index.html')
\ No newline at end of file
+    return render(request, 'terms/index.html')
+
+
+def _as_int(value, default, min_value=None, max_value=None):
+    try:
+        n = int(value)
+    except (TypeError, ValueError):
+        return default
+    if min_value is not None and n < min_value:
+        n = min_value
+    if max_value is not None and n > max_value:
+        n = max_value
+    return n
+
+
+@login_required
+@require_GET
+def search(request):
+    """
+    用語の全文検索。
+    ?q=TCP&tags=network&tags=protocol&prefix=1&limit=20&offset=0
+    """
+    q = (request.GET.get('q') or '').strip()
+    limit = _as_int(request.GET.get('limit'), default=20, min_value=1, max_value=100)
+    offset = _as_int(request.GET.get('offset'), default=0, min_value=0)
+    prefix = request.GET.get('prefix', '1') not in ('0', 'false')
+    tags = [t for t in request.GET.getlist('tags') if t]
+    if not q:
+        return JsonResponse({"error": "q is required"}, status=400)
+
+    hits = term_search.search('terms.Term', q, tags=tags, prefix=prefix, limit=limit, offset=offset)
+    prefetch_related_objects(hits, 'tags')
+
+    return JsonResponse({
+        "q": q,
+        "offset": offset,
+        "limit": limit,
+        "results": [
+            {
+                "id": t.pk,
+                "term": t.term,
+                "definition": t.definition,
+                "tags": [tag.name for tag in t.tags.all()],
+                "score": round(float(t.score), 4),
+            }
+            for t in hits
+        ],
+    })
+
+
+@login_required
+@require_GET
+def by_tags(request):
+    """
+    タグで用語を絞り込む。
+    ?tags=network&tags=protocol&match=all|any&subtree=1&limit=50&after=<前ページ最後の id>
+    match=all は全てのタグが付いた用語、any はどれかが付いた用語。id 昇順。
+    subtree=1 なら子孫のタグ（ネットワーク > プロトコル > TCP など）が付いた用語も含める。
+    """
+    names = [t for t in request.GET.getlist('tags') if t]
+    if not names:
+        return JsonResponse({"error": "tags is required"}, status=400)
+    match = request.GET.get('match', 'all')
+    if match not in ('all', 'any'):
+        return JsonResponse({"error": "invalid match"}, status=400)
+    limit = _as_int(request.GET.get('limit'), default=50, min_value=1, max_value=200)
+    after = _as_int(request.GET.get('after'), default=0, min_value=0)
+    subtree = request.GET.get('subtree', '0') not in ('0', 'false')
+
+    tag_ids = list(Tag.objects.filter(name__in=names).values_list('pk', flat=True))
+    if not tag_ids or (match == 'all' and len(tag_ids) < len(set(names))):
+        # 存在しないタグを AND で含めば結果は空
+        return JsonResponse({"tags": names, "match": match, "subtree": subtree, "results": [], "next_after": None})
+
+    qs = (
+        term_tags.terms_with_tags(tag_ids, match_all=match == 'all', subtree=subtree)
+        .filter(pk__gt=after)
+        .order_by('pk')
+    )
+    page = list(qs[:limit + 1])
+    has_next = len(page) > limit
+    page = page[:limit]
+    prefetch_related_objects(page, 'tags')
+
+    return JsonResponse({
+        "tags": names,
+        "match": match,
+        "subtree": subtree,
+        "results": [
+            {
+                "id": t.pk,
+                "term": t.term,
+                "definition": t.definition,
+                "tags": [tag.name for tag in t.tags.all()],
+            }
+            for t in page
+        ],
+        "next_after": page[-1].pk if has_next else None,
+    })
+
+
+# 認証不要の一覧。nginx の edge_cache（infra/docker/nginx/conf.d）に短時間置かせる
+TAG_CLOUD_CACHE_CONTROL = {"public": True, "max_age": 60}
+
+
+@require_GET
+def tag_cloud(request):
+    """
+    タグごとの用語数（多い順）。?limit=100
+    数はタグの付け外しのたびに更新済みのカウンタをキャッシュから返す（terms/tags.py）。
+    ETag を付けるので、nginx やブラウザは max-age が切れても 304 で再検証できる。
+    """
+    limit = _as_int(request.GET.get('limit'), default=100, min_value=1,
+                    max_value=getattr(settings, 'TAG_CLOUD_MAX_SIZE', 200))
+    data = term_tags.cloud(limit)
+    etag = conditional.make_etag(*(f"{name}={count}" for name, count in data))
+    response = conditional.not_modified(request, etag) or JsonResponse({
+        "tags": [{"name": name, "count": count} for name, count in data],
+    })
+    return conditional.apply(response, etag, cache_control=TAG_CLOUD_CACHE_CONTROL)
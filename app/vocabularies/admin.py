@@ -1,15 +1,27 @@
 # Register your models here.
 from django.contrib import admin
+from . import ordering, popularity
 from .models import Vocabulary, VocabularyTerm, UserFavoriteVocabulary
 
 @admin.register(Vocabulary)
 class VocabularyAdmin(admin.ModelAdmin):
-    list_display = ('title', 'user', 'is_public', 'created_at', 'updated_at')
+    list_display = ('title', 'user', 'is_public', 'favorite_count', 'term_count', 'trending_score', 'created_at', 'updated_at')
     list_filter = ('is_public', 'created_at')
     search_fields = ('title', 'description')
     raw_id_fields = ('user',)
     date_hierarchy = 'created_at'
     ordering = ('-created_at',)
+    actions = ('rebalance_order', 'recount_popularity')
+
+    @admin.action(description='並び順を振り直す')
+    def rebalance_order(self, request, queryset):
+        updated = sum(ordering.rebalance(v) for v in queryset)
+        self.message_user(request, f'{updated} 件の並び順を更新しました')
+
+    @admin.action(description='お気に入り数・用語数を数え直す')
+    def recount_popularity(self, request, queryset):
+        updated = popularity.recount(queryset)
+        self.message_user(request, f'{updated} 件のカウンタを更新しました')
 
 
 @admin.register(VocabularyTerm)
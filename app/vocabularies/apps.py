@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class VocabulariesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'vocabularies'
+
+    def ready(self):
+        from . import popularity
+        popularity.connect()
@@ -0,0 +1,305 @@
+"""
+用語集の一括インポート（CSV / NDJSON）。
+
+入力は1行ずつ読み、chunk_size 行ごとに1トランザクションでまとめて書き込むので
+メモリ使用量はファイルサイズに依存しない。1チャンクあたりのクエリ数も行数に依存しない。
+
+列（CSV のヘッダ / NDJSON のキー）:
+    term (term_name)          用語名（必須）
+    definition (description)  定義
+    tags                      タグ名（| , ; 区切り、NDJSON ならリストでも可）
+    note                      用語集エントリのメモ
+    order (order_index)       用語集内の並び順（省略時はファイル順で末尾に ordering.STEP 間隔で追加）
+
+- terms.Term は用語名（大文字小文字は区別しない）で既存行を探して更新、無ければ作成
+- Tag はチャンク内の全タグ名を1回で引き、足りない分だけ作る
+- vocabulary を指定したときは、terms.Term に quiz_term で紐付いたユーザーの vocabularies.Term を
+  upsert し、VocabularyTerm を (vocabulary, term) で upsert
+"""
+import csv
+import io
+import json
+import re
+import time
+
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from quizzes.models import Quiz
+from terms import hierarchy as term_hierarchy
+from terms import search as term_search
+from terms import tags as term_tags
+from terms.models import Tag, Term
+from . import ordering, popularity
+from .models import Term as VocabTerm, VocabularyTerm
+
+_TAG_SPLIT = re.compile(r"[|,;]")
+
+
+# ---- 入力 ----
+def iter_csv(fileobj):
+    yield from csv.DictReader(fileobj)
+
+
+def iter_ndjson(fileobj):
+    for line in fileobj:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def open_text(binary_file):
+    """アップロード/バイナリのファイルを UTF-8（BOM 付き可）のテキストとして読む"""
+    return io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+
+
+def iter_rows(fileobj, fmt):
+    if fmt == "csv":
+        return iter_csv(fileobj)
+    if fmt in ("ndjson", "jsonl", "json"):
+        return iter_ndjson(fileobj)
+    raise ValueError(f"unsupported format: {fmt}")
+
+
+def _first(row, *keys, default=""):
+    for k in keys:
+        v = row.get(k)
+        if v not in (None, ""):
+            return v
+    return default
+
+
+def _clean(row):
+    """1行を正規化する。用語名が無い行・オブジェクトでない行（NDJSON の配列や数値など）は None"""
+    if not isinstance(row, dict):
+        return None
+    name = str(_first(row, "term", "term_name")).strip()
+    if not name:
+        return None
+    tags = _first(row, "tags", default=[])
+    if isinstance(tags, str):
+        tags = _TAG_SPLIT.split(tags)
+    elif not isinstance(tags, list):
+        tags = [str(tags)]
+    order = _first(row, "order", "order_index", default=None)
+    try:
+        order = int(order) if order is not None else None
+    except (TypeError, ValueError):
+        order = None
+    return {
+        "name": name,
+        "definition": str(_first(row, "definition", "description")).strip(),
+        "tags": [str(t).strip()[:50] for t in tags if t is not None and str(t).strip()],
+        "note": str(_first(row, "note")).strip(),
+        "order": order,
+    }
+
+
+def _key(name):
+    return name.strip().lower()
+
+
+def _filter_names(qs, field, names):
+    """
+    field が names のどれかと一致する行（大文字小文字は区別しない。_key と同じ）。
+    MySQL は照合順序が区別しないので IN のまま（インデックスが効く）、それ以外は LOWER() で比べる。
+    """
+    names = list(names)
+    if connection.vendor == "mysql":
+        return qs.filter(**{f"{field}__in": names})
+    return qs.alias(name_key=Lower(field)).filter(name_key__in={_key(n) for n in names})
+
+
+# ---- 書き込み ----
+class GlossaryImporter:
+    def __init__(self, user=None, vocabulary=None, chunk_size=1000):
+        if vocabulary is not None and user is None:
+            user = vocabulary.user
+        self.user = user
+        self.vocabulary = vocabulary
+        self.chunk_size = chunk_size
+        self.stats = {
+            "rows": 0, "skipped": 0,
+            "terms_created": 0, "terms_updated": 0,
+            "tags_created": 0, "entries": 0,
+            "seconds": 0.0, "rows_per_sec": 0.0,
+        }
+        self._next_order = None
+
+    def run(self, rows, progress=None):
+        started = time.perf_counter()
+        chunk = []
+        for raw in rows:
+            self.stats["rows"] += 1
+            row = _clean(raw)
+            if row is None:
+                self.stats["skipped"] += 1
+                continue
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self._write_chunk(chunk)
+                chunk = []
+                if progress:
+                    progress(self._finish(started))
+        if chunk:
+            self._write_chunk(chunk)
+        # 一括書き込みはシグナルを通らないので、プロセス内の検索インデックスは作り直させる
+        term_search.reset()
+        if self.vocabulary is not None:
+            popularity.refresh_term_count(self.vocabulary)
+        return self._finish(started)
+
+    def _finish(self, started):
+        elapsed = time.perf_counter() - started
+        self.stats["seconds"] = round(elapsed, 3)
+        self.stats["rows_per_sec"] = round(self.stats["rows"] / elapsed, 1) if elapsed else 0.0
+        return dict(self.stats)
+
+    def _write_chunk(self, rows):
+        # 同じチャンク内の重複は後勝ち（タグは足し合わせる）
+        merged = {}
+        for row in rows:
+            prev = merged.get(_key(row["name"]))
+            if prev:
+                row["tags"] = prev["tags"] + row["tags"]
+            merged[_key(row["name"])] = row
+        rows = list(merged.values())
+        now = timezone.now()
+
+        with transaction.atomic():
+            term_ids = self._upsert_by_name(
+                Term, "term", {},
+                {_key(r["name"]): (r["name"], {"definition": r["definition"]}) for r in rows},
+                now, "terms",
+            )
+            self._attach_tags(rows, term_ids)
+            if self.vocabulary is not None:
+                self._upsert_entries(rows, term_ids, now)
+
+    def _upsert_by_name(self, model, name_field, base, items, now, stat):
+        """items: {key: (名前, {更新フィールド})}。既存は bulk_update、新規は bulk_create。{key: pk} を返す"""
+        existing = {}
+        qs = _filter_names(model.objects.filter(**base), name_field, [n for n, _ in items.values()]).order_by("pk")
+        for obj in qs:
+            existing.setdefault(_key(getattr(obj, name_field)), obj)
+
+        to_update, to_create, fields = [], [], set()
+        for key, (name, values) in items.items():
+            obj = existing.get(key)
+            if obj is None:
+                to_create.append(model(**base, **{name_field: name}, **values))
+                continue
+            changed = {k: v for k, v in values.items() if v and getattr(obj, k) != v}
+            if changed:
+                for k, v in changed.items():
+                    setattr(obj, k, v)
+                obj.updated_at = now
+                fields.update(changed)
+                to_update.append(obj)
+        if to_update:
+            model.objects.bulk_update(to_update, sorted(fields) + ["updated_at"])
+            if model is Term:
+                # bulk_update ではシグナルが飛ばないので、出題データの無効化はここで行う
+                Quiz.objects.filter(term__in=to_update).update(payload=None)
+        if to_create:
+            created = model.objects.bulk_create(to_create)
+            if created[0].pk is None:
+                # MySQL は pk が返らないので名前で引き直す
+                names = [getattr(o, name_field) for o in created]
+                created = _filter_names(model.objects.filter(**base), name_field, names).order_by("-pk")
+            for obj in created:
+                existing.setdefault(_key(getattr(obj, name_field)), obj)
+
+        self.stats[f"{stat}_created"] = self.stats.get(f"{stat}_created", 0) + len(to_create)
+        self.stats[f"{stat}_updated"] = self.stats.get(f"{stat}_updated", 0) + len(to_update)
+        return {key: existing[key].pk for key in items if key in existing}
+
+    def _attach_tags(self, rows, term_ids):
+        names = list(dict.fromkeys(t for r in rows for t in r["tags"]))
+        if not names:
+            return
+        # 大文字小文字を区別せずに突き合わせるので小文字をキーにする
+        tags = {name.lower(): pk for name, pk in _filter_names(Tag.objects, "name", names).values_list("name", "pk")}
+        # 大文字小文字だけ違う名前は1つのタグにする（最初に出てきた表記で作る）
+        missing = {}
+        for n in names:
+            if n.lower() not in tags:
+                missing.setdefault(n.lower(), n)
+        if missing:
+            Tag.objects.bulk_create([Tag(name=n) for n in missing.values()], ignore_conflicts=True)
+            created = dict(
+                (name.lower(), pk)
+                for name, pk in _filter_names(Tag.objects, "name", missing.values()).values_list("name", "pk")
+            )
+            tags.update(created)
+            # bulk_create はシグナルを通らないので、新しいタグは階層のルートとして閉包に足す
+            term_hierarchy.add_roots(created.values())
+            self.stats["tags_created"] += len(missing)
+
+        through = Term.tags.through
+        links = {
+            (term_ids[_key(r["name"])], tags[t.lower()])
+            for r in rows for t in r["tags"] if t.lower() in tags and _key(r["name"]) in term_ids
+        }
+        through.objects.bulk_create(
+            [through(term_id=term_id, tag_id=tag_id) for term_id, tag_id in links],
+            ignore_conflicts=True,
+        )
+        # bulk_create は m2m_changed を通らないので、触ったタグの用語数はここで数え直す
+        term_tags.recount({tag_id for _, tag_id in links})
+
+    def _upsert_entries(self, rows, term_ids, now):
+        # VocabularyTerm は vocabularies.Term を指すので、インポートした terms.Term に quiz_term で
+        # 紐付いたこのユーザーの用語を探し、無ければ作る（名前では突き合わせない）
+        definitions = {
+            term_ids[_key(r["name"])]: (r["name"], r["definition"]) for r in rows if _key(r["name"]) in term_ids
+        }
+        linked = {}
+        for obj in VocabTerm.objects.filter(user=self.user, quiz_term_id__in=definitions).order_by("pk"):
+            linked.setdefault(obj.quiz_term_id, obj)
+
+        to_update = []
+        for term_id, obj in linked.items():
+            definition = definitions[term_id][1]
+            if definition and obj.description != definition:
+                obj.description, obj.updated_at = definition, now
+                to_update.append(obj)
+        if to_update:
+            VocabTerm.objects.bulk_update(to_update, ["description", "updated_at"])
+        missing = [term_id for term_id in definitions if term_id not in linked]
+        if missing:
+            created = VocabTerm.objects.bulk_create([
+                VocabTerm(user=self.user, term_name=definitions[t][0], description=definitions[t][1], quiz_term_id=t)
+                for t in missing
+            ])
+            if created[0].pk is None:
+                # MySQL は pk が返らないので紐付け先で引き直す
+                created = VocabTerm.objects.filter(user=self.user, quiz_term_id__in=missing).order_by("pk")
+            for obj in created:
+                linked.setdefault(obj.quiz_term_id, obj)
+        self.stats["vocabulary_terms_created"] = self.stats.get("vocabulary_terms_created", 0) + len(missing)
+        self.stats["vocabulary_terms_updated"] = self.stats.get("vocabulary_terms_updated", 0) + len(to_update)
+        entry_ids = {key: linked[term_id].pk for key, term_id in term_ids.items()}
+
+        if self._next_order is None:
+            self._next_order = ordering.next_index(self.vocabulary)
+
+        entries = []
+        for r in rows:
+            order = r["order"]
+            if order is None:
+                # 後から並べ替えても1行の更新で済むよう、間隔を空けて振る
+                order = self._next_order
+                self._next_order += ordering.STEP
+            entries.append(VocabularyTerm(
+                user=self.user, vocabulary=self.vocabulary, term_id=entry_ids[_key(r["name"])],
+                note=r["note"], order_index=order, created_at=now, updated_at=now,
+            ))
+        VocabularyTerm.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=["vocabulary", "term"],
+            update_fields=["note", "order_index", "updated_at"],
+        )
+        self.stats["entries"] += len(entries)
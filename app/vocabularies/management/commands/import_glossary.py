@@ -0,0 +1,61 @@
+"""
+用語集の一括インポート。
+
+    python manage.py import_glossary glossary.csv
+    python manage.py import_glossary glossary.ndjson --vocabulary 3
+    python manage.py import_glossary glossary.csv --user alice --vocabulary-title "ネットワーク用語"
+
+列の仕様は vocabularies/importer.py を参照。
+"""
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from vocabularies.importer import GlossaryImporter, iter_rows
+from vocabularies.models import Vocabulary
+
+
+class Command(BaseCommand):
+    help = "CSV / NDJSON から用語・タグ・用語集エントリを一括で取り込む"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "ndjson"], help="省略時は拡張子から判定")
+        parser.add_argument("--vocabulary", type=int, help="追加先の用語集ID")
+        parser.add_argument("--vocabulary-title", help="追加先の用語集名（無ければ --user で作成）")
+        parser.add_argument("--user", help="用語集の作成者（username）")
+        parser.add_argument("--chunk", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        path = Path(opts["path"])
+        if not path.exists():
+            raise CommandError(f"{path} not found")
+        fmt = opts["format"] or ("csv" if path.suffix.lower() == ".csv" else "ndjson")
+
+        user = None
+        if opts["user"]:
+            user = get_user_model().objects.filter(username=opts["user"]).first()
+            if user is None:
+                raise CommandError(f"user {opts['user']} not found")
+
+        vocabulary = None
+        if opts["vocabulary"]:
+            vocabulary = Vocabulary.objects.filter(pk=opts["vocabulary"]).first()
+            if vocabulary is None:
+                raise CommandError(f"vocabulary {opts['vocabulary']} not found")
+        elif opts["vocabulary_title"]:
+            if user is None:
+                raise CommandError("--vocabulary-title には --user が必要です")
+            vocabulary, _ = Vocabulary.objects.get_or_create(user=user, title=opts["vocabulary_title"])
+
+        importer = GlossaryImporter(user=user, vocabulary=vocabulary, chunk_size=opts["chunk"])
+        with path.open(encoding="utf-8-sig", newline="") as f:
+            stats = importer.run(iter_rows(f, fmt), progress=self._progress)
+        self.stdout.write(self.style.SUCCESS(self._format(stats)))
+
+    def _progress(self, stats):
+        self.stdout.write(self._format(stats))
+
+    def _format(self, stats):
+        return " ".join(f"{k}={v}" for k, v in stats.items())
@@ -0,0 +1,41 @@
+"""
+VocabularyTerm.order_index の振り直し（定期実行用）。
+
+    python manage.py rebalance_vocabulary_order              # 隙間が --min-gap 未満の用語集だけ
+    python manage.py rebalance_vocabulary_order --all
+    python manage.py rebalance_vocabulary_order --vocabulary 3
+
+並べ替えは前後の中間値を入れていくので、同じ位置に何度も挿入すると隙間が詰まる。
+詰まり切る前にここで振り直しておけば、移動時の同期的な振り直しはほぼ起きない。
+"""
+from django.core.management.base import BaseCommand
+
+from vocabularies import ordering
+from vocabularies.models import Vocabulary
+
+
+class Command(BaseCommand):
+    help = "用語集エントリの order_index を ordering.STEP 間隔で振り直す"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vocabulary", type=int, action="append", help="対象の用語集ID（複数可）")
+        parser.add_argument("--all", action="store_true", help="隙間に関係なく全て振り直す")
+        parser.add_argument("--min-gap", type=int, default=ordering.STEP // 64)
+
+    def handle(self, *args, **opts):
+        qs = Vocabulary.objects.order_by("pk")
+        if opts["vocabulary"]:
+            qs = qs.filter(pk__in=opts["vocabulary"])
+
+        checked = rebalanced = rows = 0
+        for vocabulary_id in qs.values_list("pk", flat=True).iterator(chunk_size=500):
+            checked += 1
+            if not opts["all"] and not opts["vocabulary"]:
+                gap = ordering.min_gap(vocabulary_id)
+                if gap is None or gap >= opts["min_gap"]:
+                    continue
+            rows += ordering.rebalance(vocabulary_id)
+            rebalanced += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"checked={checked} rebalanced={rebalanced} rows_updated={rows}"
+        ))
@@ -0,0 +1,29 @@
+"""
+公開用語集のトレンドスコアの更新（定期実行用、数分〜1時間おき）。
+
+    python manage.py refresh_vocabulary_stats
+    python manage.py refresh_vocabulary_stats --half-life 48 --window 7
+    python manage.py refresh_vocabulary_stats --recount   # favorite_count / term_count も数え直す
+
+favorite_count / term_count はお気に入り・エントリの追加削除のたびに更新されるので、
+--recount は一括投入やデータ修正の後にずれを直すときだけ使えばよい。
+"""
+from django.core.management.base import BaseCommand
+
+from vocabularies import popularity
+
+
+class Command(BaseCommand):
+    help = "用語集のトレンドスコアを直近のお気に入りから計算し直す"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--half-life", type=float, default=popularity.TRENDING_HALF_LIFE_HOURS, help="半減期（時間）")
+        parser.add_argument("--window", type=int, default=popularity.TRENDING_WINDOW_DAYS, help="対象期間（日）")
+        parser.add_argument("--recount", action="store_true", help="お気に入り数・用語数も数え直す")
+
+    def handle(self, *args, **opts):
+        if opts["recount"]:
+            counted = popularity.recount()
+            self.stdout.write(f"recounted={counted}")
+        updated = popularity.refresh_trending(half_life_hours=opts["half_life"], window_days=opts["window"])
+        self.stdout.write(self.style.SUCCESS(f"trending_updated={updated}"))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vocabularies', '0002_fulltext_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vocabularyterm',
+            index=models.Index(fields=['vocabulary', 'order_index'], name='vocab_term_order_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:27
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    """既存の用語集のお気に入り数・用語数を1回の UPDATE で埋める"""
+    Vocabulary = apps.get_model('vocabularies', 'Vocabulary')
+
+    def count(model_name):
+        model = apps.get_model('vocabularies', model_name)
+        return Coalesce(
+            Subquery(
+                model.objects.filter(vocabulary=OuterRef('pk'))
+                .order_by().values('vocabulary').annotate(n=Count('pk')).values('n')
+            ),
+            0,
+        )
+
+    Vocabulary.objects.update(
+        favorite_count=count('UserFavoriteVocabulary'),
+        term_count=count('VocabularyTerm'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vocabularies', '0003_order_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vocabulary',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='お気に入り数'),
+        ),
+        migrations.AddField(
+            model_name='vocabulary',
+            name='term_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='用語数'),
+        ),
+        migrations.AddField(
+            model_name='vocabulary',
+            name='trending_score',
+            field=models.FloatField(default=0.0, editable=False, verbose_name='トレンドスコア'),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='vocabulary',
+            index=models.Index(fields=['is_public', 'trending_score', 'id'], name='vocab_public_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vocabulary',
+            index=models.Index(fields=['is_public', 'favorite_count', 'id'], name='vocab_public_favorites_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vocabulary',
+            index=models.Index(fields=['is_public', 'created_at', 'id'], name='vocab_public_new_idx'),
+        ),
+    ]
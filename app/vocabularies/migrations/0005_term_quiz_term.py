@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('terms', '0004_tag_hierarchy'),
+        ('vocabularies', '0004_popularity_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='term',
+            name='quiz_term',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vocabulary_terms', to='terms.term', verbose_name='出題用の用語'),
+        ),
+    ]
@@ -9,6 +9,18 @@ class Vocabulary(models.Model):
      is_public = models.BooleanField(default=False, verbose_name='公開/非公開')
      created_at = models.DateTimeField(auto_now_add=True, verbose_name='作成日')
      updated_at = models.DateTimeField(auto_now=True, verbose_name='更新日')
+     # 公開一覧用の非正規化カウンタ（vocabularies.popularity が更新する）
+     favorite_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='お気に入り数')
+     term_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='用語数')
+     trending_score = models.FloatField(default=0.0, editable=False, verbose_name='トレンドスコア')
+
+     class Meta:
+         # 公開一覧のキーセットページング用（並び順ごとに (is_public, 値, id)）
+         indexes = [
+             models.Index(fields=['is_public', 'trending_score', 'id'], name='vocab_public_trending_idx'),
+             models.Index(fields=['is_public', 'favorite_count', 'id'], name='vocab_public_favorites_idx'),
+             models.Index(fields=['is_public', 'created_at', 'id'], name='vocab_public_new_idx'),
+         ]
 
      def __str__(self):
          return self.title
@@ -26,6 +38,8 @@ class VocabularyTerm(models.Model):
      class Meta:
          unique_together = ('vocabulary', 'term')  
          ordering = ['order_index']  
+         # 並べ替え（vocabularies/ordering.py）で前後のエントリを引くため
+         indexes = [models.Index(fields=['vocabulary', 'order_index'], name='vocab_term_order_idx')]
 
      def __str__(self):
          return f'{self.vocabulary.title} - {self.term.term}'
@@ -46,6 +60,11 @@ class Term(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='terms', verbose_name='作成者')
     term_name = models.CharField(max_length=255, verbose_name='用語名')
     description = models.TextField(blank=True, verbose_name='説明')
+    # クイズの出題に使う terms.Term（Quiz.term はこちらを指す）。未作成なら NULL
+    quiz_term = models.ForeignKey(
+        'terms.Term', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='vocabulary_terms', verbose_name='出題用の用語',
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='作成日')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新日')
 
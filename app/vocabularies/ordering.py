@@ -0,0 +1,142 @@
+"""
+VocabularyTerm.order_index の並べ替え（疎な整数キー）。
+
+order_index を STEP 間隔で振っておき、移動するときは前後のエントリの中間値を
+入れるだけにする。移動で更新されるのは移動したエントリ1行だけ。
+中間に空きが無くなったとき（同じ値が並んでいる古いデータを含む）だけ、
+その用語集を STEP 間隔で振り直す（rebalance）。定期的な振り直しは
+manage.py rebalance_vocabulary_order で行う。
+
+同じ用語集への並べ替えは Vocabulary 行のロックで直列化する。
+"""
+from django.db import transaction
+from django.db.models import Max, Q
+
+from .models import Vocabulary, VocabularyTerm
+
+STEP = 1024
+# PositiveIntegerField に収まる上限（MySQL の INT UNSIGNED / 他 DB の INT の小さい方）
+MAX_INDEX = 2**31 - 1
+
+
+def next_index(vocabulary, last=None):
+    """末尾に追加するときの order_index"""
+    if last is None:
+        last = VocabularyTerm.objects.filter(vocabulary=vocabulary).aggregate(m=Max("order_index"))["m"]
+    return STEP if last is None else last + STEP
+
+
+def _entries(vocabulary):
+    return VocabularyTerm.objects.filter(vocabulary=vocabulary)
+
+
+def _prev(vocabulary, anchor, exclude_pk):
+    """並び順（order_index, id）で anchor の直前のエントリ"""
+    return (
+        _entries(vocabulary)
+        .filter(Q(order_index__lt=anchor.order_index) | Q(order_index=anchor.order_index, id__lt=anchor.id))
+        .exclude(pk=exclude_pk)
+        .order_by("-order_index", "-id")
+        .only("id", "order_index")
+        .first()
+    )
+
+
+def _next(vocabulary, anchor, exclude_pk):
+    """並び順（order_index, id）で anchor の直後のエントリ"""
+    return (
+        _entries(vocabulary)
+        .filter(Q(order_index__gt=anchor.order_index) | Q(order_index=anchor.order_index, id__gt=anchor.id))
+        .exclude(pk=exclude_pk)
+        .order_by("order_index", "id")
+        .only("id", "order_index")
+        .first()
+    )
+
+
+def _between(lower, upper):
+    """lower < x < upper となる整数（無ければ None）。端は None で開区間"""
+    lo = -1 if lower is None else lower.order_index
+    if upper is None:
+        value = lo + STEP if lo >= 0 else STEP
+        return value if value <= MAX_INDEX else None
+    if upper.order_index - lo < 2:
+        return None
+    if lower is None and upper.order_index > STEP:
+        return upper.order_index - STEP
+    return (lo + upper.order_index) // 2
+
+
+def _target(vocabulary, entry, before, after, position):
+    """(lower, upper) の隣接エントリを求める"""
+    if before is not None:
+        return _prev(vocabulary, before, entry.pk), before
+    if after is not None:
+        return after, _next(vocabulary, after, entry.pk)
+    others = _entries(vocabulary).exclude(pk=entry.pk).only("id", "order_index")
+    if position == "first":
+        return None, others.order_by("order_index", "id").first()
+    return others.order_by("-order_index", "-id").first(), None
+
+
+def move(entry, *, before=None, after=None, position=None):
+    """
+    entry を before の直前 / after の直後 / position（"first" | "last"）へ移動する。
+    新しい order_index を返す。通常は entry の1行だけを UPDATE する。
+    """
+    if sum(x is not None for x in (before, after, position)) != 1:
+        raise ValueError("specify exactly one of before, after, position")
+    if position not in (None, "first", "last"):
+        raise ValueError(f"invalid position: {position}")
+    for anchor in (before, after):
+        if anchor is not None and (anchor.vocabulary_id != entry.vocabulary_id or anchor.pk == entry.pk):
+            raise ValueError("anchor must be another entry of the same vocabulary")
+
+    vocabulary_id = entry.vocabulary_id
+    with transaction.atomic():
+        Vocabulary.objects.select_for_update().filter(pk=vocabulary_id).values_list("pk").first()
+        # ロック取得後の値で計算する
+        if before is not None:
+            before.refresh_from_db(fields=["order_index"])
+        if after is not None:
+            after.refresh_from_db(fields=["order_index"])
+
+        lower, upper = _target(vocabulary_id, entry, before, after, position)
+        value = _between(lower, upper)
+        if value is None:
+            rebalance(vocabulary_id)
+            for obj in (before, after):
+                if obj is not None:
+                    obj.refresh_from_db(fields=["order_index"])
+            lower, upper = _target(vocabulary_id, entry, before, after, position)
+            value = _between(lower, upper)
+        VocabularyTerm.objects.filter(pk=entry.pk).update(order_index=value)
+    entry.order_index = value
+    return value
+
+
+def rebalance(vocabulary, batch_size=1000):
+    """
+    用語集のエントリを現在の並び順のまま STEP 間隔で振り直す。変わった行だけ更新し、更新件数を返す。
+    呼び出し側でトランザクション（と Vocabulary 行のロック）を取っていなければここで取る。
+    """
+    with transaction.atomic():
+        Vocabulary.objects.select_for_update().filter(pk=getattr(vocabulary, "pk", vocabulary)).values_list("pk").first()
+        changed = []
+        rows = _entries(vocabulary).order_by("order_index", "id").values_list("id", "order_index")
+        for i, (pk, current) in enumerate(rows.iterator(chunk_size=batch_size), start=1):
+            if current != i * STEP:
+                changed.append(VocabularyTerm(pk=pk, order_index=i * STEP))
+        VocabularyTerm.objects.bulk_update(changed, ["order_index"], batch_size=batch_size)
+    return len(changed)
+
+
+def min_gap(vocabulary):
+    """隣り合うエントリの order_index の最小差（振り直しが必要かの判定用）。2件未満なら None"""
+    values = _entries(vocabulary).order_by("order_index").values_list("order_index", flat=True)
+    gap, prev = None, None
+    for value in values.iterator(chunk_size=2000):
+        if prev is not None and (gap is None or value - prev < gap):
+            gap = value - prev
+        prev = value
+    return gap
@@ -0,0 +1,122 @@
+"""
+公開用語集の人気指標（お気に入り数・用語数・トレンドスコア）。
+
+- favorite_count / term_count: UserFavoriteVocabulary / VocabularyTerm の追加・削除時に
+  F() で加減算する（シグナルは書き込みと同じトランザクション内で動く）。
+  bulk_create などシグナルを通らない書き込みの後は refresh_term_count で数え直す
+- trending_score: 直近 TRENDING_WINDOW_DAYS 日のお気に入りを、半減期 TRENDING_HALF_LIFE_HOURS で
+  減衰させて足したもの。refresh_trending（manage.py refresh_vocabulary_stats）で定期的に更新する
+"""
+import math
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import UserFavoriteVocabulary, Vocabulary, VocabularyTerm
+
+TRENDING_HALF_LIFE_HOURS = 72
+TRENDING_WINDOW_DAYS = 14
+
+
+def _bump(vocabulary_id, field, delta):
+    qs = Vocabulary.objects.filter(pk=vocabulary_id)
+    if delta < 0:
+        # 数え直し前などで 0 を下回らないように
+        qs = qs.filter(**{f"{field}__gte": -delta})
+    qs.update(**{field: F(field) + delta})
+
+
+def _on_favorite_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _bump(instance.vocabulary_id, "favorite_count", 1)
+
+
+def _on_favorite_deleted(sender, instance, **kwargs):
+    _bump(instance.vocabulary_id, "favorite_count", -1)
+
+
+def _on_entry_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _bump(instance.vocabulary_id, "term_count", 1)
+
+
+def _on_entry_deleted(sender, instance, **kwargs):
+    _bump(instance.vocabulary_id, "term_count", -1)
+
+
+def connect():
+    post_save.connect(_on_favorite_saved, sender=UserFavoriteVocabulary, dispatch_uid="vocab-favorite-save")
+    post_delete.connect(_on_favorite_deleted, sender=UserFavoriteVocabulary, dispatch_uid="vocab-favorite-delete")
+    post_save.connect(_on_entry_saved, sender=VocabularyTerm, dispatch_uid="vocab-entry-save")
+    post_delete.connect(_on_entry_deleted, sender=VocabularyTerm, dispatch_uid="vocab-entry-delete")
+
+
+# ---- お気に入りの追加・解除 ----
+def favorite(user, vocabulary):
+    """お気に入りに追加（追加済みなら何もしない）。追加したら True"""
+    with transaction.atomic():
+        _, created = UserFavoriteVocabulary.objects.get_or_create(user=user, vocabulary=vocabulary)
+    return created
+
+
+def unfavorite(user, vocabulary):
+    """お気に入りを解除。解除したら True"""
+    with transaction.atomic():
+        fav = UserFavoriteVocabulary.objects.filter(user=user, vocabulary=vocabulary).first()
+        if fav is None:
+            return False
+        fav.delete()
+    return True
+
+
+# ---- 数え直し ----
+def _count(model, **filters):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(vocabulary=OuterRef("pk"), **filters)
+            .order_by().values("vocabulary").annotate(n=Count("pk")).values("n")
+        ),
+        0,
+    )
+
+
+def refresh_term_count(vocabulary):
+    Vocabulary.objects.filter(pk=getattr(vocabulary, "pk", vocabulary)).update(term_count=_count(VocabularyTerm))
+
+
+def recount(queryset=None):
+    """favorite_count / term_count を実データから数え直す（1回の UPDATE）。更新件数を返す"""
+    queryset = queryset if queryset is not None else Vocabulary.objects.all()
+    return queryset.update(
+        favorite_count=_count(UserFavoriteVocabulary),
+        term_count=_count(VocabularyTerm),
+    )
+
+
+def refresh_trending(now=None, half_life_hours=TRENDING_HALF_LIFE_HOURS, window_days=TRENDING_WINDOW_DAYS,
+                     batch_size=1000):
+    """直近のお気に入りからトレンドスコアを計算し直す。スコアが変わった件数を返す"""
+    now = now or timezone.now()
+    since = now - timedelta(days=window_days)
+    decay = math.log(2) / (half_life_hours * 3600)
+
+    scores = {}
+    rows = (
+        UserFavoriteVocabulary.objects
+        .filter(added_at__gte=since, vocabulary__is_public=True)
+        .values_list("vocabulary_id", "added_at")
+    )
+    for vocabulary_id, added_at in rows.iterator(chunk_size=batch_size):
+        age = max(0.0, (now - added_at).total_seconds())
+        scores[vocabulary_id] = scores.get(vocabulary_id, 0.0) + math.exp(-decay * age)
+
+    changed = [Vocabulary(pk=pk, trending_score=round(score, 6)) for pk, score in scores.items()]
+    with transaction.atomic():
+        # 窓から外れた用語集は 0 に戻す
+        reset = Vocabulary.objects.filter(trending_score__gt=0).exclude(pk__in=list(scores)).update(trending_score=0.0)
+        Vocabulary.objects.bulk_update(changed, ["trending_score"], batch_size=batch_size)
+    return len(changed) + reset
@@ -1,3 +1,209 @@
+import csv
+import io
+import json
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+
+from terms.models import Tag, Term
+from . import ordering, popularity
+from .importer import GlossaryImporter, _clean, iter_ndjson
+from .models import Term as VocabTerm, UserFavoriteVocabulary, Vocabulary, VocabularyTerm
+
+
+class GlossaryImporterTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("owner", password="pw")
+        self.vocabulary = Vocabulary.objects.create(user=self.user, title="network")
+
+    def _run(self, text):
+        return GlossaryImporter(vocabulary=self.vocabulary).run(iter_ndjson(io.StringIO(text)))
+
+    def test_non_object_rows_are_skipped(self):
+        self.assertIsNone(_clean(["TCP"]))
+        self.assertIsNone(_clean(3))
+        stats = self._run('[1, 2]\n"TCP"\n{"term": "TCP", "definition": "transport", "tags": 5}\n')
+        self.assertEqual((stats["rows"], stats["skipped"]), (3, 2))
+        self.assertEqual(list(Term.objects.get(term="TCP").tags.values_list("name", flat=True)), ["5"])
+
+    def test_names_match_case_insensitively(self):
+        Term.objects.create(term="TCP", definition="old")
+        Tag.objects.create(name="Net")
+        stats = self._run('{"term": "tcp", "definition": "new", "tags": ["net", "Proto", "proto"]}\n')
+        self.assertEqual((stats["terms_created"], stats["terms_updated"], stats["tags_created"]), (0, 1, 1))
+        term = Term.objects.get()
+        self.assertEqual(term.definition, "new")
+        self.assertEqual(sorted(term.tags.values_list("name", flat=True)), ["Net", "Proto"])
+        self.assertEqual(VocabTerm.objects.get(user=self.user).quiz_term, term)
+
+
+    def test_upload_is_staff_only(self):
+        Term.objects.create(term="TCP", definition="shared")
+
+        def upload():
+            body = io.BytesIO('{"term": "TCP", "definition": "overwritten"}\n'.encode())
+            body.name = "glossary.ndjson"
+            return self.client.post("/vocabularies/import/", {"file": body})
+
+        self.client.force_login(self.user)
+        self.assertEqual(upload().status_code, 302)
+        self.assertEqual(Term.objects.get().definition, "shared")
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(upload().status_code, 200)
+        self.assertEqual(Term.objects.get().definition, "overwritten")
+
+class OrderingTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("owner", password="pw")
+        self.vocabulary = Vocabulary.objects.create(user=self.user, title="network")
+
+    def _entries(self, indexes):
+        entries = []
+        for i, order_index in enumerate(indexes):
+            term = VocabTerm.objects.create(user=self.user, term_name=f"term {i}")
+            entries.append(VocabularyTerm.objects.create(
+                user=self.user, vocabulary=self.vocabulary, term=term, order_index=order_index,
+            ))
+        return entries
+
+    def _order(self):
+        return list(VocabularyTerm.objects.filter(vocabulary=self.vocabulary).order_by("order_index", "id")
+                    .values_list("pk", flat=True))
+
+    def test_move_updates_one_row(self):
+        a, b, c = self._entries([ordering.STEP, 2 * ordering.STEP, 3 * ordering.STEP])
+        ordering.move(c, before=b)
+        self.assertEqual(self._order(), [a.pk, c.pk, b.pk])
+        self.assertEqual(list(VocabularyTerm.objects.filter(pk__in=[a.pk, b.pk]).values_list("order_index", flat=True)),
+                         [ordering.STEP, 2 * ordering.STEP])
+
+    def test_forced_rebalance_keeps_order(self):
+        # 隙間が無い（古いデータで同じ値が並んでいる）ので振り直しが必要になる
+        a, b, c, d = self._entries([5, 5, 6, 7])
+        ordering.move(d, after=a)
+        self.assertEqual(self._order(), [a.pk, d.pk, b.pk, c.pk])
+        self.assertGreater(ordering.min_gap(self.vocabulary), 1)
+
+    def test_rebalance_preserves_order(self):
+        self._entries([9, 3, 3, 1])
+        before = self._order()
+        self.assertEqual(ordering.rebalance(self.vocabulary), 4)
+        self.assertEqual(self._order(), before)
+        self.assertEqual(ordering.rebalance(self.vocabulary), 0)
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create_user("owner", password="pw")
+        self.fan = get_user_model().objects.create_user("fan", password="pw")
+        self.vocabulary = Vocabulary.objects.create(user=self.owner, title="network", is_public=True)
+
+    def _counts(self):
+        return Vocabulary.objects.values_list("favorite_count", "term_count").get(pk=self.vocabulary.pk)
+
+    def test_follow_favorites_and_entries(self):
+        self.assertTrue(popularity.favorite(self.fan, self.vocabulary))
+        self.assertFalse(popularity.favorite(self.fan, self.vocabulary))
+        entries = [
+            VocabularyTerm.objects.create(
+                user=self.owner, vocabulary=self.vocabulary,
+                term=VocabTerm.objects.create(user=self.owner, term_name=name),
+            )
+            for name in ("TCP", "UDP")
+        ]
+        self.assertEqual(self._counts(), (1, 2))
+        entries[0].delete()
+        self.assertTrue(popularity.unfavorite(self.fan, self.vocabulary))
+        self.assertFalse(popularity.unfavorite(self.fan, self.vocabulary))
+        self.assertEqual(self._counts(), (0, 1))
+
+    def test_recount_repairs_drift(self):
+        popularity.favorite(self.fan, self.vocabulary)
+        Vocabulary.objects.update(favorite_count=7, term_count=3)
+        popularity.recount()
+        self.assertEqual(self._counts(), (1, 0))
+
+    def test_discover_pages_by_favorites(self):
+        for i in range(3):
+            Vocabulary.objects.create(user=self.owner, title=f"v{i}", is_public=True, favorite_count=5)
+        Vocabulary.objects.create(user=self.owner, title="private", favorite_count=9)
+        titles, cursor = [], None
+        while True:
+            params = {"sort": "favorites", "limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            data = self.client.get("/vocabularies/discover/", params).json()
+            titles += [v["title"] for v in data["results"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(titles, ["v2", "v1", "v0", "network"])
+
+
+    def test_discover_revalidates_with_etag(self):
+        response = self.client.get("/vocabularies/discover/")
+        self.assertIn("public", response["Cache-Control"])
+        etag = response["ETag"]
+        self.assertEqual(self.client.get("/vocabularies/discover/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        popularity.favorite(self.fan, self.vocabulary)
+        self.assertEqual(self.client.get("/vocabularies/discover/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+class TrendingTests(TestCase):
+    def test_recent_favorites_score_higher(self):
+        owner = get_user_model().objects.create_user("owner", password="pw")
+        fans = [get_user_model().objects.create_user(f"fan{i}", password="pw") for i in range(2)]
+        fresh, old, private = (
+            Vocabulary.objects.create(user=owner, title=title, is_public=public)
+            for title, public in (("fresh", True), ("old", True), ("private", False))
+        )
+        now = timezone.now()
+        for fan in fans:
+            for vocabulary in (fresh, old, private):
+                UserFavoriteVocabulary.objects.create(user=fan, vocabulary=vocabulary)
+        UserFavoriteVocabulary.objects.filter(vocabulary=old).update(added_at=now - timedelta(days=3))
+
+        popularity.refresh_trending(now=now)
+        scores = dict(Vocabulary.objects.values_list("title", "trending_score"))
+        self.assertGreater(scores["fresh"], scores["old"])
+        self.assertGreater(scores["old"], 0)
+        self.assertEqual(scores["private"], 0)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("owner", password="pw")
+        self.vocabulary = Vocabulary.objects.create(user=self.user, title="network")
+        self.entries = []
+        for i, name in enumerate(["TCP", "UDP", "用語"]):
+            term = VocabTerm.objects.create(user=self.user, term_name=name, description=f"{name} の説明")
+            self.entries.append(VocabularyTerm.objects.create(
+                user=self.user, vocabulary=self.vocabulary, term=term, order_index=i,
+            ))
+        self.client.force_login(self.user)
+
+    def _get(self, **params):
+        response = self.client.get(f"/vocabularies/{self.vocabulary.pk}/export/", params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_ndjson_resumes_after_id(self):
+        rows = [json.loads(line) for line in self._get().splitlines()]
+        self.assertEqual([r["term_name"] for r in rows], ["TCP", "UDP", "用語"])
+        rest = [json.loads(line) for line in self._get(after=rows[0]["id"]).splitlines()]
+        self.assertEqual([r["id"] for r in rest], [e.pk for e in self.entries[1:]])
+
+    def test_csv_starts_with_bom_and_header(self):
+        body = self._get(format="csv")
+        self.assertTrue(body.startswith("\ufeff"))
+        rows = list(csv.DictReader(io.StringIO(body.lstrip("\ufeff"))))
+        self.assertEqual([r["description"] for r in rows], ["TCP の説明", "UDP の説明", "用語 の説明"])
 
-# Create your tests here.
+    def test_private_vocabulary_of_someone_else(self):
+        other = get_user_model().objects.create_user("other", password="pw")
+        self.client.force_login(other)
+        response = self.client.get(f"/vocabularies/{self.vocabulary.pk}/export/")
+        self.assertEqual(response.status_code, 404)
@@ -5,4 +5,11 @@ app_name = 'vocabularies'
 
 urlpatterns = [
     path('index/', views.dummy_vocabularies_view, name='myvocabularies'),
-]
\ No newline at end of file
+    path('terms/search/', views.search_terms, name='search_terms'),  # ?q=&prefix=1&limit=20
+    path('discover/', views.discover, name='discover'),             # ?sort=trending|favorites|new&limit=&cursor=
+    path('import/', views.import_glossary, name='import'),           # POST file, format, vocabulary
+    path('<int:vocabulary_id>/export/', views.export_vocabulary, name='export'),  # ?format=ndjson|csv&after=<id>
+    path('<int:vocabulary_id>/entries/<int:entry_id>/move/', views.move_entry, name='move_entry'),  # POST before|after|position
+    path('<int:vocabulary_id>/favorite/', views.favorite_vocabulary, name='favorite'),
+    path('<int:vocabulary_id>/unfavorite/', views.unfavorite_vocabulary, name='unfavorite'),
+]
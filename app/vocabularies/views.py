@@ -1,4 +1,287 @@
+import json
+from datetime import datetime
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import login_required
+from django.db.models import Q
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.views.decorators.http import require_GET, require_http_methods
+
+from core import conditional, streaming
+from terms import search as term_search
+from . import ordering, popularity
+from .importer import GlossaryImporter, iter_rows, open_text
+from .models import Term, Vocabulary, VocabularyTerm
 
 def dummy_vocabularies_view(request):
-    return render(request, 'vocabularies/index.html')
\ No newline at end of file
+    return render(request, 'vocabularies/index.html')
+
+
+@login_required
+@require_GET
+def search_terms(request):
+    """
+    自分が作成した用語（vocabularies.Term）の全文検索。
+    ?q=...&prefix=1&limit=20
+    """
+    q = (request.GET.get('q') or '').strip()
+    if not q:
+        return JsonResponse({"error": "q is required"}, status=400)
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 100))
+    except ValueError:
+        limit = 20
+    prefix = request.GET.get('prefix', '1') not in ('0', 'false')
+
+    hits = term_search.search(
+        'vocabularies.Term', q,
+        queryset=Term.objects.filter(user=request.user), prefix=prefix, limit=limit,
+    )
+    return JsonResponse({
+        "q": q,
+        "results": [
+            {"id": t.pk, "term_name": t.term_name, "description": t.description, "score": round(float(t.score), 4)}
+            for t in hits
+        ],
+    })
+
+
+@staff_member_required
+@require_http_methods(["POST"])
+def import_glossary(request):
+    """
+    用語集ファイルのアップロード取り込み（POST multipart）。
+    パラメータ: file, format(csv|ndjson, 省略時は拡張子), vocabulary(optional, 自分の用語集ID)
+    全ユーザー共通の出題用の用語（terms.Term）とタグを名前で上書きするので、スタッフのみ。
+    """
+    upload = request.FILES.get("file")
+    if upload is None:
+        return JsonResponse({"error": "file is required"}, status=400)
+    fmt = request.POST.get("format") or ("csv" if upload.name.lower().endswith(".csv") else "ndjson")
+    if fmt not in ("csv", "ndjson"):
+        return JsonResponse({"error": "invalid format"}, status=400)
+
+    vocabulary = None
+    vocabulary_id = request.POST.get("vocabulary")
+    if vocabulary_id:
+        vocabulary = Vocabulary.objects.filter(pk=vocabulary_id, user=request.user).first()
+        if vocabulary is None:
+            return JsonResponse({"error": "vocabulary not found"}, status=404)
+
+    # 大きいファイルは一時ファイルに退避されるので、1行ずつ読めばメモリは一定
+    importer = GlossaryImporter(user=request.user, vocabulary=vocabulary)
+    try:
+        stats = importer.run(iter_rows(open_text(upload.file), fmt))
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({"error": f"invalid file: {e}", "stats": importer.stats}, status=400)
+    return JsonResponse(stats)
+
+
+EXPORT_FIELDS = ["id", "order_index", "term_id", "term_name", "description", "note", "updated_at"]
+
+
+def _export_row(entry):
+    return {
+        "id": entry.id,
+        "order_index": entry.order_index,
+        "term_id": entry.term_id,
+        "term_name": entry.term.term_name,
+        "description": entry.term.description,
+        "note": entry.note,
+        "updated_at": entry.updated_at,
+    }
+
+
+@login_required
+@require_GET
+def export_vocabulary(request, vocabulary_id):
+    """
+    用語集の全エントリを NDJSON / CSV でストリーミングする（自分の用語集か公開用語集のみ）。
+    ?format=ndjson|csv&after=<id>&until=<id>
+    列名は import_glossary の入力と同じなので、そのまま取り込み直せる。
+    """
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in streaming.FORMATS:
+        return JsonResponse({"error": "invalid format"}, status=400)
+    vocabulary = (
+        Vocabulary.objects
+        .filter(Q(user=request.user) | Q(is_public=True), pk=vocabulary_id)
+        .only('id')
+        .first()
+    )
+    if vocabulary is None:
+        return JsonResponse({"error": "vocabulary not found"}, status=404)
+
+    after, until = streaming.id_range(request)
+    qs = streaming.apply_range(
+        VocabularyTerm.objects.filter(vocabulary=vocabulary).select_related('term'),
+        after, until,
+    )
+    return streaming.stream_export(
+        request, qs, _export_row, EXPORT_FIELDS,
+        fmt=fmt, filename=f"vocabulary-{vocabulary.pk}",
+    )
+
+
+@login_required
+@require_http_methods(["POST"])
+def move_entry(request, vocabulary_id, entry_id):
+    """
+    用語集内のエントリを並べ替える（自分の用語集のみ）。
+    POST before=<entry_id> | after=<entry_id> | position=first|last のどれか1つ。
+    通常は移動したエントリ1行だけが更新される（vocabularies/ordering.py）。
+    """
+    entries = VocabularyTerm.objects.filter(vocabulary_id=vocabulary_id, vocabulary__user=request.user)
+    entry = entries.filter(pk=entry_id).first()
+    if entry is None:
+        return JsonResponse({"error": "entry not found"}, status=404)
+
+    anchors = {}
+    for key in ('before', 'after'):
+        value = request.POST.get(key)
+        if value:
+            anchors[key] = entries.filter(pk=value).only('id', 'vocabulary_id', 'order_index').first() if value.isdigit() else None
+            if anchors[key] is None:
+                return JsonResponse({"error": f"{key} entry not found"}, status=404)
+    try:
+        order_index = ordering.move(entry, position=request.POST.get('position') or None, **anchors)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"id": entry.pk, "order_index": order_index})
+
+
+# ---- 公開用語集の一覧（人気・トレンド・新着） ----
+# sort -> 並び順の列。どれも (is_public, 列, id) の複合インデックスがあるので、
+# カーソル以降の limit 件をインデックス順に読むだけで済む（件数やページ位置に依存しない）
+DISCOVER_SORTS = {
+    'trending': 'trending_score',
+    'favorites': 'favorite_count',
+    'new': 'created_at',
+}
+DISCOVER_MAX_LIMIT = 50
+
+
+def _encode_discover_cursor(vocabulary, field):
+    """(並び順の値, id) を不透明なカーソル文字列にする"""
+    value = getattr(vocabulary, field)
+    value = value.isoformat() if field == 'created_at' else repr(value)
+    return urlsafe_base64_encode(f"{value}|{vocabulary.id}".encode())
+
+
+def _decode_discover_cursor(value, field):
+    """カーソルを (並び順の値, id) に戻す。壊れていれば None"""
+    try:
+        raw, pk = urlsafe_base64_decode(value).decode().rsplit('|', 1)
+        pk = int(pk)
+        if field == 'created_at':
+            raw = datetime.fromisoformat(raw)
+            if timezone.is_naive(raw):
+                return None
+        elif field == 'favorite_count':
+            raw = int(raw)
+        else:
+            raw = float(raw)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    return raw, pk
+
+
+def _discover_item(v):
+    return {
+        "id": v.id,
+        "title": v.title,
+        "description": v.description,
+        "owner": v.user.username,
+        "favorite_count": v.favorite_count,
+        "term_count": v.term_count,
+        "trending_score": round(v.trending_score, 4),
+        "created_at": v.created_at.isoformat(),
+    }
+
+
+# 認証不要の一覧。nginx の edge_cache（infra/docker/nginx/conf.d）に短時間置かせる
+DISCOVER_CACHE_CONTROL = {"public": True, "max_age": 30}
+
+
+@require_GET
+def discover(request):
+    """
+    公開用語集の一覧。?sort=trending|favorites|new&limit=20&cursor=<前ページの next_cursor>
+    件数は非正規化カウンタ（vocabularies/popularity.py）をそのまま返すので集計クエリは無い。
+    """
+    sort = request.GET.get('sort', 'trending')
+    field = DISCOVER_SORTS.get(sort)
+    if field is None:
+        return JsonResponse({"error": "invalid sort"}, status=400)
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), DISCOVER_MAX_LIMIT))
+    except ValueError:
+        limit = 20
+
+    qs = (
+        Vocabulary.objects.filter(is_public=True)
+        .select_related('user')
+        .only('id', 'title', 'description', 'favorite_count', 'term_count', 'trending_score',
+              'created_at', 'user__username')
+        .order_by(f'-{field}', '-id')
+    )
+    cursor = request.GET.get('cursor')
+    if cursor:
+        decoded = _decode_discover_cursor(cursor, field)
+        if decoded is None:
+            return JsonResponse({"error": "invalid cursor"}, status=400)
+        value, last_id = decoded
+        qs = qs.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': last_id}))
+
+    page = list(qs[:limit + 1])
+    has_next = len(page) > limit
+    page = page[:limit]
+    data = {
+        "sort": sort,
+        "results": [_discover_item(v) for v in page],
+        "next_cursor": _encode_discover_cursor(page[-1], field) if has_next else None,
+    }
+    # nginx の edge_cache が期限切れ後に 304 で再検証できるよう ETag を付ける
+    etag = conditional.make_etag(json.dumps(data, sort_keys=True))
+    response = conditional.not_modified(request, etag) or JsonResponse(data)
+    return conditional.apply(response, etag, cache_control=DISCOVER_CACHE_CONTROL)
+
+
+def _favorite_target(request, vocabulary_id):
+    # 公開用語集か自分の用語集だけお気に入りにできる
+    return (
+        Vocabulary.objects
+        .filter(Q(user=request.user) | Q(is_public=True), pk=vocabulary_id)
+        .only('id')
+        .first()
+    )
+
+
+def _favorite_response(vocabulary, favorited, changed):
+    count = Vocabulary.objects.filter(pk=vocabulary.pk).values_list('favorite_count', flat=True).first()
+    return JsonResponse({"id": vocabulary.pk, "favorited": favorited, "changed": changed, "favorite_count": count})
+
+
+@login_required
+@require_http_methods(["POST"])
+def favorite_vocabulary(request, vocabulary_id):
+    """お気に入りに追加（追加済みなら何もしない）。favorite_count は同じトランザクションで +1"""
+    vocabulary = _favorite_target(request, vocabulary_id)
+    if vocabulary is None:
+        return JsonResponse({"error": "vocabulary not found"}, status=404)
+    changed = popularity.favorite(request.user, vocabulary)
+    return _favorite_response(vocabulary, True, changed)
+
+
+@login_required
+@require_http_methods(["POST"])
+def unfavorite_vocabulary(request, vocabulary_id):
+    """お気に入りを解除（未登録なら何もしない）。favorite_count は同じトランザクションで -1"""
+    vocabulary = Vocabulary.objects.filter(pk=vocabulary_id).only('id').first()
+    if vocabulary is None:
+        return JsonResponse({"error": "vocabulary not found"}, status=404)
+    changed = popularity.unfavorite(request.user, vocabulary)
+    return _favorite_response(vocabulary, False, changed)
@@ -0,0 +1,166 @@
+"""
+主要な利用の流れ（ログイン → 出題 → 回答 → ダッシュボード → 共有リンク）を並列に繰り返し、
+ステップごとの RPS とレイテンシ（p50 / p95 / p99）を出す負荷テスト（標準ライブラリのみ）。
+
+データとログイン済みセッションは seed_scale で用意する:
+    python app/manage.py seed_scale --sessions 64 --manifest /tmp/seed.json
+    python infra/loadtest/journey.py --base-url http://localhost:8000 --manifest /tmp/seed.json \\
+        --concurrency 1 16 64 --duration 30
+
+仮想ユーザーはそれぞれ manifest のセッションを1つ使い、keep-alive の接続で次を繰り返す:
+    login      GET  /accounts/login/（認証自体は manifest のセッション Cookie）
+    play       GET  /quizzes/play/<term>/<qtype>/json/
+    answer     POST /quizzes/play/<term>/<qtype>/?format=json   choice_id=<payload の選択肢>
+    dashboard  GET  /dashboard/summary?days=30
+    share      GET  /sharing/<token>/
+POST の CSRF は、仮想ユーザーごとに作ったトークンを Cookie とヘッダの両方に付けて通す。
+"""
+import argparse
+import json
+import random
+import secrets
+import string
+import threading
+import time
+from urllib.parse import urlencode
+
+from throughput import Client, percentile
+
+STEPS = ("login", "play", "answer", "dashboard", "share")
+
+
+def _csrf_token():
+    alphabet = string.ascii_letters + string.digits
+    return "".join(secrets.choice(alphabet) for _ in range(32))
+
+
+class VirtualUser:
+    def __init__(self, base_url, manifest, session_key, qtype, rng):
+        self.csrf = _csrf_token()
+        cookie = f"{manifest['session_cookie_name']}={session_key}; {manifest['csrf_cookie_name']}={self.csrf}"
+        self.client = Client(base_url, {"Cookie": cookie})
+        self.term_ids = manifest["term_ids"]
+        self.share_tokens = manifest["share_tokens"]
+        self.qtype = qtype
+        self.rng = rng
+
+    def journey(self, record):
+        """1周分。record(step, status, 秒)"""
+        status, _, elapsed, _ = self.client.request("GET", "/accounts/login/")
+        record("login", status, elapsed)
+
+        term_id = self.rng.choice(self.term_ids)
+        status, body, elapsed, _ = self.client.request("GET", f"/quizzes/play/{term_id}/{self.qtype}/json/")
+        record("play", status, elapsed)
+        if status == 200:
+            choices = json.loads(body).get("choices") or []
+            if choices:
+                form = urlencode({"choice_id": self.rng.choice(choices)["id"]})
+                status, _, elapsed, _ = self.client.request(
+                    "POST", f"/quizzes/play/{term_id}/{self.qtype}/?format=json", body=form,
+                    headers={
+                        "Content-Type": "application/x-www-form-urlencoded",
+                        "Accept": "application/json",
+                        "X-CSRFToken": self.csrf,
+                    },
+                )
+                record("answer", status, elapsed)
+
+        status, _, elapsed, _ = self.client.request("GET", "/dashboard/summary?days=30")
+        record("dashboard", status, elapsed)
+
+        if self.share_tokens:
+            status, _, elapsed, _ = self.client.request("GET", f"/sharing/{self.rng.choice(self.share_tokens)}/")
+            record("share", status, elapsed)
+
+    def close(self):
+        self.client.close()
+
+
+def run(base_url, manifest, concurrency, duration, qtype, seed=None):
+    sessions = manifest["sessions"]
+    if not sessions:
+        raise SystemExit("manifest にセッションがありません（seed_scale --sessions N で作る）")
+    latencies = {step: [] for step in STEPS}
+    errors = {step: 0 for step in STEPS}
+    journeys = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(n):
+        user = VirtualUser(base_url, manifest, sessions[n % len(sessions)], qtype, random.Random(f"{seed}-{n}"))
+        local = {step: [] for step in STEPS}
+        bad = {step: 0 for step in STEPS}
+        done = 0
+
+        def record(step, status, elapsed):
+            if 200 <= status < 400:
+                local[step].append(elapsed)
+            else:
+                bad[step] += 1
+
+        while time.perf_counter() < deadline:
+            user.journey(record)
+            done += 1
+        user.close()
+        with lock:
+            for step in STEPS:
+                latencies[step].extend(local[step])
+                errors[step] += bad[step]
+            journeys[0] += done
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    results = {}
+    for step in STEPS:
+        values = sorted(latencies[step])
+        results[step] = {
+            "requests": len(values),
+            "errors": errors[step],
+            "rps": len(values) / wall if wall else 0.0,
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+        }
+    return {"journeys": journeys[0], "journeys_per_sec": journeys[0] / wall if wall else 0.0, "steps": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--manifest", required=True, help="seed_scale --manifest で書き出した JSON")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 16, 64], help="仮想ユーザー数")
+    parser.add_argument("--duration", type=float, default=30.0, help="各計測の秒数")
+    parser.add_argument("--qtype", default="DT", choices=["DT", "TD"])
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出す")
+    args = parser.parse_args()
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+
+    reports = []
+    for c in args.concurrency:
+        r = run(args.base_url, manifest, c, args.duration, args.qtype, args.seed)
+        reports.append({"concurrency": c, **r})
+        if args.json:
+            continue
+        print(f"\nconcurrency={c}  journeys={r['journeys']}  journeys/s={r['journeys_per_sec']:.1f}")
+        print(f"{'step':<10} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for step, s in r["steps"].items():
+            print(
+                f"{step:<10} {s['rps']:>9.1f} {s['p50'] * 1000:>8.1f} "
+                f"{s['p95'] * 1000:>8.1f} {s['p99'] * 1000:>8.1f} {s['errors']:>7}"
+            )
+    if args.json:
+        print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+同時接続数を変えながら GET を投げ続け、RPS とレイテンシを比べる負荷テスト（標準ライブラリのみ）。
+
+WSGI と ASGI の比較例:
+    # 別々のポートで起動しておく
+    APP_SERVER=wsgi GUNICORN_BIND=0.0.0.0:8000 gunicorn -c gunicorn.conf.py
+    APP_SERVER=asgi GUNICORN_BIND=0.0.0.0:8001 gunicorn -c gunicorn.conf.py
+
+    python infra/loadtest/throughput.py \\
+        --target wsgi=http://localhost:8000 --target asgi=http://localhost:8001 \\
+        --path /health/ --path /sharing/<token>/ --path "/dashboard/summary?days=30" \\
+        --concurrency 1 16 64 --duration 10 --cookie sessionid=<ログイン済みのセッションID>
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class Client:
+    """keep-alive で使い回す HTTP 接続（スレッドごとに1つ）"""
+
+    def __init__(self, base_url, headers=None, timeout=30):
+        parts = urlsplit(base_url)
+        conn_cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self._factory = lambda: conn_cls(parts.netloc, timeout=timeout)
+        self.prefix = parts.path.rstrip("/")
+        self.headers = dict(headers or {})
+        self.conn = self._factory()
+
+    def request(self, method, path, body=None, headers=None):
+        """(status, 本文, 秒, レスポンス) を返す。接続が切れていたら1回だけ張り直す"""
+        merged = {**self.headers, **(headers or {})}
+        for attempt in (0, 1):
+            started = time.perf_counter()
+            try:
+                self.conn.request(method, self.prefix + path, body=body, headers=merged)
+                resp = self.conn.getresponse()
+                data = resp.read()
+                return resp.status, data, time.perf_counter() - started, resp
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = self._factory()
+                if attempt:
+                    return 0, b"", time.perf_counter() - started, None
+
+    def close(self):
+        self.conn.close()
+
+
+def run(base_url, paths, concurrency, duration, headers):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(n):
+        client = Client(base_url, headers)
+        local, bad, i = [], 0, n
+        while time.perf_counter() < deadline:
+            status, _, elapsed, _ = client.request("GET", paths[i % len(paths)])
+            i += 1
+            if 200 <= status < 400:
+                local.append(elapsed)
+            else:
+                bad += 1
+        client.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += bad
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / wall if wall else 0.0,
+        "mean": statistics.fmean(latencies) if latencies else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", required=True, help="name=URL（複数指定で比較）")
+    parser.add_argument("--path", action="append", default=None, help="叩くパス（複数指定で順番に）")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="各計測の秒数")
+    parser.add_argument("--cookie", help="ログインが必要な API 用（例: sessionid=...）")
+    args = parser.parse_args()
+
+    headers = {"Cookie": args.cookie} if args.cookie else {}
+    paths = args.path or ["/health/"]
+    print(f"{'target':<10} {'conc':>5} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for target in args.target:
+        name, _, url = target.partition("=")
+        url = url or name
+        for c in args.concurrency:
+            r = run(url, paths, c, args.duration, headers)
+            print(
+                f"{name:<10} {c:>5} {r['rps']:>9.1f} {r['p50'] * 1000:>8.1f} "
+                f"{r['p95'] * 1000:>8.1f} {r['p99'] * 1000:>8.1f} {r['errors']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()